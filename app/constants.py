@@ -11,3 +11,44 @@ class EnvConfig(Enum):
     CELERY_BROKER_CONNECTION = "CELERY_BROKER_CONNECTION"
     CELERY_BACKEND_CONNECTION = "CELERY_BACKEND_CONNECTION"
     CELERY_DEFAULT_QUEUE = "CELERY_DEFAULT_QUEUE"
+    CELERY_CLIENT_THREADS = "CELERY_CLIENT_THREADS"
+    CELERY_DISPATCH_TIMEOUT = "CELERY_DISPATCH_TIMEOUT"
+    CELERY_PREDICTION_QUEUE = "CELERY_PREDICTION_QUEUE"
+    CELERY_TRAINING_QUEUE = "CELERY_TRAINING_QUEUE"
+    CELERY_PAYLOAD_ENCODING = "CELERY_PAYLOAD_ENCODING"
+    ADMISSION_MAX_QUEUE_DEPTH = "ADMISSION_MAX_QUEUE_DEPTH"
+    ADMISSION_MAX_INFLIGHT = "ADMISSION_MAX_INFLIGHT"
+    ADMISSION_SAMPLE_INTERVAL_S = "ADMISSION_SAMPLE_INTERVAL_S"
+    ADMISSION_INFLIGHT_TTL_S = "ADMISSION_INFLIGHT_TTL_S"
+    ADMISSION_INFLIGHT_FALLBACK_TTL_S = "ADMISSION_INFLIGHT_FALLBACK_TTL_S"
+    TRAINING_DEDUP_TTL_S = "TRAINING_DEDUP_TTL_S"
+    TRAINING_MAX_RUNTIME_S = "TRAINING_MAX_RUNTIME_S"
+    TRAINING_PENDING_TTL_S = "TRAINING_PENDING_TTL_S"
+    PREDICTION_BATCH_MAX_ROWS = "PREDICTION_BATCH_MAX_ROWS"
+    PREDICTION_BATCH_WINDOW_MS = "PREDICTION_BATCH_WINDOW_MS"
+    PREDICTION_BATCH_MAX_SIZE = "PREDICTION_BATCH_MAX_SIZE"
+    PREDICTION_CACHE_SIZE = "PREDICTION_CACHE_SIZE"
+    PREDICTION_CACHE_TTL_S = "PREDICTION_CACHE_TTL_S"
+    FEEDBACK_COMPACTION_INTERVAL_S = "FEEDBACK_COMPACTION_INTERVAL_S"
+    FEEDBACK_COMPACTION_MIN_SEGMENTS = "FEEDBACK_COMPACTION_MIN_SEGMENTS"
+    FEEDBACK_SEGMENT_RETENTION_S = "FEEDBACK_SEGMENT_RETENTION_S"
+    FEEDBACK_BUFFER_MAX_ROWS = "FEEDBACK_BUFFER_MAX_ROWS"
+    FEEDBACK_BUFFER_MAX_PENDING_ROWS = "FEEDBACK_BUFFER_MAX_PENDING_ROWS"
+    FEEDBACK_BUFFER_FLUSH_INTERVAL_S = "FEEDBACK_BUFFER_FLUSH_INTERVAL_S"
+    FEEDBACK_WAL_PATH = "FEEDBACK_WAL_PATH"
+    DATAFRAME_FORMAT = "DATAFRAME_FORMAT"
+    UPLOAD_MAX_BYTES = "UPLOAD_MAX_BYTES"
+    S3_MULTIPART_CHUNKSIZE = "S3_MULTIPART_CHUNKSIZE"
+    S3_TRANSFER_CONCURRENCY = "S3_TRANSFER_CONCURRENCY"
+    S3_TRANSFER_MAX_MEMORY = "S3_TRANSFER_MAX_MEMORY"
+    S3_MAX_POOL_CONNECTIONS = "S3_MAX_POOL_CONNECTIONS"
+    S3_CONNECT_TIMEOUT = "S3_CONNECT_TIMEOUT"
+    S3_READ_TIMEOUT = "S3_READ_TIMEOUT"
+    S3_MAX_ATTEMPTS = "S3_MAX_ATTEMPTS"
+    DISK_CACHE_DIR = "DISK_CACHE_DIR"
+    DISK_CACHE_MAX_BYTES = "DISK_CACHE_MAX_BYTES"
+    TASK_STATUS_CACHE_SIZE = "TASK_STATUS_CACHE_SIZE"
+    TASK_STATUS_PENDING_TTL_S = "TASK_STATUS_PENDING_TTL_S"
+    TASK_EVENTS_ENABLED = "TASK_EVENTS_ENABLED"
+    TASK_WAIT_MAX_TIMEOUT_S = "TASK_WAIT_MAX_TIMEOUT_S"
+    TASK_CHECK_MAX_BATCH = "TASK_CHECK_MAX_BATCH"
@@ -0,0 +1,230 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PREDICTION = "prediction"
+TRAINING = "training"
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of dispatching when a lane is saturated"""
+
+    def __init__(self, lane: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"{lane} lane is saturated: {reason}")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+@dataclass
+class Lane:
+    name: str
+    queue: str
+    # Unfinished tasks dispatched by this process, by id, with admission time.
+    # Admitted tasks that aren't published yet hold a slot under their token.
+    inflight: Dict[str, float] = field(default_factory=dict)
+    admitted: int = 0
+    rejected: int = 0
+
+
+@dataclass
+class QueueSample:
+    depth: int = 0
+    sampled_at: float = 0.0
+    # Messages published by this process since the depth was sampled
+    published: int = 0
+    # Messages taken off the queue per second, smoothed over samples
+    drain_rate: float = 0.0
+
+
+class AdmissionController:
+    """Rejects dispatches while the queue of a lane or its in-flight tasks are full.
+
+    Every kind of work is dispatched through a lane with its own broker queue, so
+    a backlog of training runs doesn't hold up predictions once the lanes are
+    routed to different queues (and workers). Queue depths are sampled with a
+    passive `queue_declare` every `sample_interval` seconds, publishes in between
+    are added to the last sample. A task takes its slot when it's admitted and
+    counts as in flight until a task event reports it finished or `inflight_ttl`
+    passed. Tasks the API itself sees finished (e.g. polling their status) are
+    released as well. While no events arrive (`events_alive`, disabled or
+    disconnected), slots already expire after `fallback_ttl` seconds. Thresholds
+    of 0 disable the
+    respective check, stale samples (e.g. broker unreachable) are ignored.
+    """
+
+    def __init__(
+        self,
+        app,
+        queues: Dict[str, str],
+        max_queue_depth: int = 0,
+        max_inflight: int = 0,
+        sample_interval: float = 2.0,
+        inflight_ttl: float = 600.0,
+        fallback_ttl: float = 30.0,
+        default_retry_after: int = 5,
+    ) -> None:
+        self.app = app
+        self.lanes = {name: Lane(name, queue) for name, queue in queues.items()}
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight = max_inflight
+        # Sampling is only needed to enforce a depth limit
+        self.sample_interval = sample_interval if max_queue_depth > 0 else 0
+        self.inflight_ttl = inflight_ttl
+        self.fallback_ttl = fallback_ttl
+        self.default_retry_after = default_retry_after
+        # Whether finish events arrive, set once they are consumed
+        self.events_alive: Callable[[], bool] = lambda: False
+        self._events_were_alive = True
+
+        self._samples = {queue: QueueSample() for queue in queues.values()}
+        self._lock = threading.Lock()
+
+    def queue(self, lane: str) -> str:
+        return self.lanes[lane].queue
+
+    def admit(self, lane_name: str) -> str:
+        """Reserves a slot of the lane for a task about to be dispatched
+
+        Concurrent admissions see the slots reserved by each other, so they can't
+        overshoot the limits together.
+
+        Returns:
+            str: Token holding the slot until `dispatched` or `release`.
+
+        Raises:
+            AdmissionRejected: The lane can't take another task.
+        """
+        lane = self.lanes[lane_name]
+        with self._lock:
+            self._expire(lane)
+            if self.max_inflight and len(lane.inflight) >= self.max_inflight:
+                lane.rejected += 1
+                raise AdmissionRejected(
+                    lane.name,
+                    f"{len(lane.inflight)} tasks in flight",
+                    self.default_retry_after,
+                )
+
+            sample = self._samples[lane.queue]
+            if self.max_queue_depth and self._fresh(sample):
+                depth = sample.depth + sample.published
+                if depth >= self.max_queue_depth:
+                    lane.rejected += 1
+                    raise AdmissionRejected(
+                        lane.name,
+                        f"{depth} tasks queued",
+                        self._retry_after(sample, depth - self.max_queue_depth + 1),
+                    )
+            token = f"admitted-{uuid.uuid4()}"
+            lane.inflight[token] = time.monotonic()
+            sample.published += 1
+            lane.admitted += 1
+        return token
+
+    def dispatched(self, lane_name: str, token: str, task_id: str) -> None:
+        """Moves the slot held by `token` (an admission token or a task id) to
+        `task_id`, whose finish event frees it"""
+        lane = self.lanes[lane_name]
+        with self._lock:
+            # Still counted if `token` finished meanwhile, `task_id` didn't
+            lane.inflight[task_id] = lane.inflight.pop(token, time.monotonic())
+
+    def release(self, lane_name: str, token: str) -> None:
+        """Frees the slot of an admitted task that wasn't published"""
+        lane = self.lanes[lane_name]
+        with self._lock:
+            if lane.inflight.pop(token, None) is not None:
+                sample = self._samples[lane.queue]
+                sample.published = max(sample.published - 1, 0)
+
+    def finished(self, task_id: str, status: Optional[str] = None) -> None:
+        """Task event (or observed state) callback, the task no longer counts as
+        in flight"""
+        with self._lock:
+            for lane in self.lanes.values():
+                lane.inflight.pop(task_id, None)
+
+    def sample(self) -> None:
+        """Reads the depth of every lane queue from the broker (blocking)"""
+        with self.app.connection_for_write() as connection:
+            for queue in self._samples:
+                # A missing queue closes the channel (AMQP), one channel per queue
+                channel = connection.channel()
+                try:
+                    _, depth, _ = channel.queue_declare(queue=queue, passive=True)
+                except connection.channel_errors:
+                    # Not declared yet, nothing has been queued
+                    depth = 0
+                finally:
+                    try:
+                        channel.close()
+                    except Exception:
+                        pass
+                self._record(queue, depth, time.monotonic())
+
+    def _record(self, queue: str, depth: int, now: float) -> None:
+        with self._lock:
+            sample = self._samples[queue]
+            if sample.sampled_at:
+                # Published messages were either consumed or are part of `depth`
+                drained = sample.depth + sample.published - depth
+                rate = max(drained, 0) / max(now - sample.sampled_at, 1e-3)
+                sample.drain_rate = 0.5 * sample.drain_rate + 0.5 * rate
+            sample.depth, sample.sampled_at, sample.published = depth, now, 0
+
+    def _fresh(self, sample: QueueSample) -> bool:
+        return time.monotonic() - sample.sampled_at < 3 * self.sample_interval
+
+    def _retry_after(self, sample: QueueSample, excess: int) -> int:
+        """Seconds until the queue drained below the limit at the observed rate"""
+        if sample.drain_rate <= 0:
+            return self.default_retry_after
+        return min(max(math.ceil(excess / sample.drain_rate), 1), 60)
+
+    def _expire(self, lane: Lane) -> None:
+        alive = self.events_alive()
+        if alive != self._events_were_alive:
+            self._events_were_alive = alive
+            if self.max_inflight and not alive:
+                logger.warning(
+                    "No task events, tasks in flight expire after "
+                    f"{self.fallback_ttl}s instead of {self.inflight_ttl}s"
+                )
+        ttl = self.inflight_ttl if alive else self.fallback_ttl
+        deadline = time.monotonic() - ttl
+        for task_id in [t for t, at in lane.inflight.items() if at < deadline]:
+            del lane.inflight[task_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            lanes = {}
+            for lane in self.lanes.values():
+                self._expire(lane)
+                sample = self._samples[lane.queue]
+                lanes[lane.name] = {
+                    "queue": lane.queue,
+                    "inflight": len(lane.inflight),
+                    "admitted": lane.admitted,
+                    "rejected": lane.rejected,
+                    "queue_depth": sample.depth + sample.published
+                    if sample.sampled_at
+                    else None,
+                    "sample_age_s": now - sample.sampled_at
+                    if sample.sampled_at
+                    else None,
+                    "drain_rate": sample.drain_rate,
+                }
+        return {
+            "max_queue_depth": self.max_queue_depth,
+            "max_inflight": self.max_inflight,
+            "lanes": lanes,
+        }
@@ -1,10 +1,23 @@
+import asyncio
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from celery import Celery
+from celery import Celery, states
+from celery.backends.base import KeyValueStoreBackend
+from celery.backends.database import DatabaseBackend, session_cleanup
 from celery.result import AsyncResult
+from kombu.serialization import dumps
 
 from app.constants import EnvConfig
+from app.core import telemetry
+from app.core.admission import PREDICTION, TRAINING, AdmissionController
+from app.core.cache import MISSING, TTLCache
+from app.core.dataset_schema import DatasetSchema
+from app.core.payload_codec import PayloadCodec
+from app.schemas import UserInputRequest
 
 
 logger = logging.getLogger(__name__)
@@ -13,6 +26,7 @@ logger.setLevel(logging.INFO)
 
 class CeleryClient:
     _instance = None
+    _initialized = False
 
     def __new__(cls):
         """Returns the singleton instance or creates a new one if not existend"""
@@ -22,6 +36,9 @@ class CeleryClient:
 
     def __init__(self):
         """Init class variables needed to establish a connection to the database"""
+        if self._initialized:
+            return
+
         self._app = Celery(
             "orchestrator",
             broker=os.getenv(EnvConfig.CELERY_BROKER_CONNECTION.value),
@@ -31,7 +48,59 @@ class CeleryClient:
             result_extended=True,
             worker_send_task_events=True,
             task_send_sent_events=True,
+            accept_content=["json", "msgpack"],
+            result_accept_content=["json", "msgpack"],
+        )
+        # Compact payloads are sent as msgpack with categorical inputs as codes
+        self.codec = None
+        if os.getenv(EnvConfig.CELERY_PAYLOAD_ENCODING.value, "json") == "compact":
+            self._app.conf.task_serializer = "msgpack"
+            self.codec = PayloadCodec(DatasetSchema.from_model(UserInputRequest))
+        # Broker and result backend calls are blocking, so they are offloaded
+        # to a dedicated pool instead of running on the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv(EnvConfig.CELERY_CLIENT_THREADS.value, "16")),
+            thread_name_prefix="celery-client",
+        )
+        self._dispatch_timeout = float(
+            os.getenv(EnvConfig.CELERY_DISPATCH_TIMEOUT.value, "30")
+        )
+        # Finished tasks never change their state again and are cached until
+        # evicted, unfinished ones only briefly to absorb aggressive polling.
+        self._status_cache = TTLCache(
+            maxsize=int(os.getenv(EnvConfig.TASK_STATUS_CACHE_SIZE.value, "10000"))
+        )
+        self._pending_ttl = float(
+            os.getenv(EnvConfig.TASK_STATUS_PENDING_TTL_S.value, "1")
+        )
+        # Predictions and training runs are dispatched through separate lanes,
+        # routed to the default queue unless given their own.
+        default_queue = os.getenv(EnvConfig.CELERY_DEFAULT_QUEUE.value, "tasks")
+        self.admission = AdmissionController(
+            self._app,
+            queues={
+                PREDICTION: os.getenv(
+                    EnvConfig.CELERY_PREDICTION_QUEUE.value, default_queue
+                ),
+                TRAINING: os.getenv(
+                    EnvConfig.CELERY_TRAINING_QUEUE.value, default_queue
+                ),
+            },
+            max_queue_depth=int(
+                os.getenv(EnvConfig.ADMISSION_MAX_QUEUE_DEPTH.value, "0")
+            ),
+            max_inflight=int(os.getenv(EnvConfig.ADMISSION_MAX_INFLIGHT.value, "0")),
+            sample_interval=float(
+                os.getenv(EnvConfig.ADMISSION_SAMPLE_INTERVAL_S.value, "2")
+            ),
+            inflight_ttl=float(
+                os.getenv(EnvConfig.ADMISSION_INFLIGHT_TTL_S.value, "600")
+            ),
+            fallback_ttl=float(
+                os.getenv(EnvConfig.ADMISSION_INFLIGHT_FALLBACK_TTL_S.value, "30")
+            ),
         )
+        self._initialized = True
 
     def get_app(self):
         return self._app
@@ -39,8 +108,229 @@ class CeleryClient:
     def get_task(self, name: str, queue, *args, **kwargs):
         return self._app.signature(name, queue=queue, *args, **kwargs)
 
+    def get_state(self, task_id: str) -> Tuple[str, Any]:
+        """Returns status and result of a task with at most one backend query
+
+        Args:
+            task_id (str): Id of the task.
+
+        Returns:
+            Tuple[str, Any]: Status and result (None while not finished).
+        """
+        if (state := self._status_cache.get(task_id)) is not MISSING:
+            return state
+
+        with telemetry.measure(
+            telemetry.BACKEND_DURATION, "celery.backend.get", operation="get"
+        ):
+            meta = self._app.backend.get_task_meta(task_id)
+        return self._cache_state(task_id, meta["status"], meta.get("result"))
+
+    def get_states(self, task_ids: List[str]) -> Dict[str, Tuple[str, Any]]:
+        """Returns status and result of many tasks with at most one backend query
+
+        The database backend is read with a single SELECT over the task table and
+        key-value backends (e.g. Redis) with a single MGET. Other backends are
+        queried per task.
+
+        Args:
+            task_ids (List[str]): Ids of the tasks.
+
+        Returns:
+            Dict[str, Tuple[str, Any]]: Status and result per task id.
+        """
+        found = {}
+        missing = []
+        for task_id in dict.fromkeys(task_ids):
+            if (state := self._status_cache.get(task_id)) is not MISSING:
+                found[task_id] = state
+            else:
+                missing.append(task_id)
+
+        if missing:
+            with telemetry.measure(
+                telemetry.BACKEND_DURATION, "celery.backend.get", operation="get_many"
+            ):
+                metas = self._fetch_task_metas(missing)
+            for task_id, meta in metas.items():
+                found[task_id] = self._cache_state(
+                    task_id, meta["status"], meta.get("result")
+                )
+        return found
+
+    def _fetch_task_metas(self, task_ids: List[str]) -> Dict[str, dict]:
+        backend = self._app.backend
+        pending = {"status": states.PENDING, "result": None}
+
+        if isinstance(backend, DatabaseBackend):
+            task_cls = backend.task_cls
+            session = backend.ResultSession()
+            with session_cleanup(session):
+                rows = (
+                    session.query(task_cls.task_id, task_cls.status, task_cls.result)
+                    .filter(task_cls.task_id.in_(task_ids))
+                    .all()
+                )
+            metas = {
+                task_id: backend.meta_from_decoded(
+                    {"task_id": task_id, "status": status, "result": result}
+                )
+                for task_id, status, result in rows
+            }
+        elif isinstance(backend, KeyValueStoreBackend):
+            keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+            values = backend.mget(keys)
+            if hasattr(values, "get"):
+                # Some clients (e.g. memcached) answer with a mapping by key
+                values = [values.get(key) for key in keys]
+            metas = {
+                task_id: backend.decode_result(value)
+                for task_id, value in zip(task_ids, values)
+                if value
+            }
+        else:
+            metas = {task_id: backend.get_task_meta(task_id) for task_id in task_ids}
+        return {task_id: metas.get(task_id, pending) for task_id in task_ids}
+
+    def _cache_state(self, task_id: str, status: str, result: Any) -> Tuple[str, Any]:
+        if status in states.READY_STATES:
+            state = (status, result)
+            self._status_cache.set(task_id, state)
+            # Also without (or before) its finish event
+            self.admission.finished(task_id, status)
+        else:
+            state = (status, None)
+            self._status_cache.set(task_id, state, ttl=self._pending_ttl)
+        return state
+
+    def forget_state(self, task_id: str) -> None:
+        """Drops a cached state, e.g. once a task is known to have finished"""
+        self._status_cache.pop(task_id)
+
     def get_status(self, task_id: str):
-        return AsyncResult(task_id, app=self._app).status
+        return self.get_state(task_id)[0]
 
     def get_result(self, task_id: str):
-        return AsyncResult(task_id, app=self._app).result
+        return self.get_state(task_id)[1]
+
+    def cache_stats(self) -> dict:
+        return self._status_cache.stats()
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
+        )
+
+    async def submit(self, name: str, queue, **kwargs) -> AsyncResult:
+        """Publishes a task without blocking the event loop
+
+        Args:
+            name (str): Registered name of the task (e.g. workflows.make_prediction).
+            queue (str): Queue the task is routed to.
+            **kwargs: Passed on to the task signature (args, kwargs, options).
+
+        Returns:
+            AsyncResult: Handle of the published task.
+        """
+        task = self.get_task(name, queue, **kwargs)
+        return await self._run(self._publish, task, name, queue)
+
+    def _publish(self, task, name: str, queue) -> AsyncResult:
+        if telemetry.enabled():
+            # Serialized a second time, only while telemetry is exported
+            _, _, payload = dumps(
+                [task.args, task.kwargs], serializer=self._app.conf.task_serializer
+            )
+            telemetry.record(telemetry.PAYLOAD_SIZE, len(payload), task=name)
+        with telemetry.measure(
+            telemetry.DISPATCH_DURATION, "celery.dispatch", task=name, queue=queue
+        ):
+            return task.apply_async()
+
+    async def wait_for(
+        self, async_result: AsyncResult, timeout: Optional[float] = None
+    ) -> Any:
+        """Awaits the return value of a task, polling the backend in the thread pool
+
+        Args:
+            async_result (AsyncResult): Handle returned by `submit`.
+            timeout (float, optional): Seconds to wait before
+                `celery.exceptions.TimeoutError` is raised. Defaults to the
+                CELERY_DISPATCH_TIMEOUT setting.
+
+        Returns:
+            Any: The value returned by the task.
+        """
+        if timeout is None:
+            timeout = self._dispatch_timeout
+        return await self._run(self._wait, async_result, timeout)
+
+    def _wait(self, async_result: AsyncResult, timeout: float) -> Any:
+        with telemetry.measure(
+            telemetry.BACKEND_DURATION, "celery.backend.wait", operation="wait"
+        ):
+            value = async_result.get(timeout=timeout)
+        self._cache_state(async_result.id, states.SUCCESS, value)
+        return value
+
+    async def get_state_async(self, task_id: str) -> Tuple[str, Any]:
+        return await self._run(self.get_state, task_id)
+
+    async def get_states_async(self, task_ids: List[str]) -> Dict[str, Tuple[str, Any]]:
+        return await self._run(self.get_states, task_ids)
+
+    async def get_status_async(self, task_id: str) -> str:
+        return await self._run(self.get_status, task_id)
+
+    def model_inputs(self, data: Dict[str, Any], **fields: Any) -> dict:
+        """Body of a prediction workflow, `data` is encoded with compact payloads
+
+        Args:
+            data (Dict[str, Any]): Model inputs by column, of a row or a batch.
+            **fields: Further entries of the body.
+
+        Returns:
+            dict: Workflow body.
+        """
+        if self.codec is None:
+            return {"data": data, **fields}
+        return {
+            "data": self.codec.encode(data),
+            "codebook": self.codec.version,
+            **fields,
+        }
+
+    async def start_workflow(self, name: str, lane: str, body: dict, wait: bool) -> str:
+        """Dispatches an orchestrator workflow and returns the id to track it by
+
+        Args:
+            name (str): Registered name of the workflow.
+            lane (str): Admission lane (`PREDICTION`, `TRAINING`), selects the
+                queue the workflow is routed to.
+            body (dict): Payload passed to the workflow as `body`.
+            wait (bool): Await the orchestrator reply and return the id of the task
+                carrying the actual result. Otherwise the orchestrator task id is
+                returned right away; its result holds `result_task_id`.
+
+        Returns:
+            str: Task id.
+
+        Raises:
+            AdmissionRejected: The lane is saturated, nothing was dispatched.
+        """
+        token = self.admission.admit(lane)
+        try:
+            workflow_start = await self.submit(
+                name=name, queue=self.admission.queue(lane), kwargs={"body": body}
+            )
+        except BaseException:
+            self.admission.release(lane, token)
+            raise
+        self.admission.dispatched(lane, token, workflow_start.id)
+        if not wait:
+            return workflow_start.id
+
+        reply = await self.wait_for(workflow_start)
+        self.admission.dispatched(lane, workflow_start.id, reply["result_task_id"])
+        return reply["result_task_id"]
@@ -1,23 +1,140 @@
 import os
 import logging
+from dataclasses import dataclass
 from io import BytesIO
-from typing import Union, Dict
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from app.core import telemetry
+from app.core.dataset_schema import DatasetSchema
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+@dataclass
+class MergeReport:
+    """Outcome of a merge: rows kept as new and rows dropped as duplicates"""
+
+    added: int = 0
+    dropped: int = 0
+
+
+class HashIndex:
+    """Sorted set of 64-bit hashes of the key columns of already merged rows.
+
+    Only the hashes are held (8 bytes per row), so the index of a history far
+    larger than memory stays small and can be persisted next to it. Distinct keys
+    colliding on their hash are treated as duplicates, which is negligible below
+    billions of rows.
+    """
+
+    def __init__(self, hashes: Optional[np.ndarray] = None) -> None:
+        self._hashes = (
+            np.unique(hashes).astype(np.uint64)
+            if hashes is not None
+            else np.empty(0, dtype=np.uint64)
+        )
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @staticmethod
+    def hash_rows(df: pd.DataFrame, key: Optional[List[str]] = None) -> np.ndarray:
+        """Hashes the `key` columns (all if not given) of every row"""
+        if key is not None:
+            if missing := [column for column in key if column not in df.columns]:
+                raise ValueError(f"Missing key columns: {missing}")
+            df = df[key]
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Returns a mask of the hashes already in the index"""
+        if not len(self._hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(self._hashes, hashes)
+        positions[positions == len(self._hashes)] = 0
+        return self._hashes[positions] == hashes
+
+    def add(self, hashes: np.ndarray) -> None:
+        # Both parts are sorted, the stable sort merges such runs in linear time.
+        self._hashes = np.sort(
+            np.concatenate([self._hashes, np.unique(hashes)]), kind="stable"
+        )
+
+    def dumps(self) -> bytes:
+        sink = pa.BufferOutputStream()
+        pq.write_table(pa.table({"hash": self._hashes}), sink, compression="zstd")
+        return sink.getvalue().to_pybytes()
+
+    @classmethod
+    def loads(cls, data: bytes) -> "HashIndex":
+        table = pq.read_table(pa.BufferReader(data), columns=["hash"])
+        index = cls()
+        index._hashes = table.column("hash").to_numpy()
+        return index
+
+
 class DataFactory:
     @staticmethod
-    def merge_dfs(*args) -> pd.DataFrame:
-        try:
-            return pd.concat([*args], ignore_index=True).drop_duplicates()
-        except Exception as e:
-            logger.exception(e)
-        return args[0]
+    def merge_dfs(
+        *args: pd.DataFrame,
+        key: Optional[List[str]] = None,
+        index: Optional[HashIndex] = None,
+        report: Optional[MergeReport] = None,
+    ) -> pd.DataFrame:
+        """
+        Concatenate DataFrames, keeping the first row of every key.
+
+        :param args: DataFrames to merge, earlier ones take precedence
+        :param key: Columns identifying a row, defaults to all columns
+        :param index: Hashes of rows merged before, updated with the new rows
+        :param report: Filled with the number of added and dropped rows
+        :return: Merged DataFrame without duplicates
+        """
+        chunks = list(DataFactory.iter_merge(args, key=key, index=index, report=report))
+        if not chunks:
+            return pd.concat(args, ignore_index=True).iloc[:0]
+        return pd.concat(chunks, ignore_index=True)
+
+    @staticmethod
+    def iter_merge(
+        chunks: Iterable[pd.DataFrame],
+        key: Optional[List[str]] = None,
+        index: Optional[HashIndex] = None,
+        report: Optional[MergeReport] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Lazily drop the rows of chunks whose key was seen before.
+
+        Rows are checked against `index` only, never against the merged history
+        itself, so memory is bounded by one chunk plus the index.
+
+        :param chunks: DataFrames to merge, e.g. from `iter_chunks`
+        :param key: Columns identifying a row, defaults to all columns
+        :param index: Hashes of rows merged before, updated with the new rows
+        :param report: Filled with the number of added and dropped rows
+        :return: Iterator of the non-empty deduplicated chunks
+        """
+        index = index if index is not None else HashIndex()
+        report = report if report is not None else MergeReport()
+
+        for chunk in chunks:
+            hashes = HashIndex.hash_rows(chunk, key)
+            new = ~index.contains(hashes) & ~pd.Series(hashes).duplicated().to_numpy()
+            index.add(hashes[new])
+
+            added = int(new.sum())
+            report.added += added
+            report.dropped += len(chunk) - added
+            if added:
+                yield chunk[new].reset_index(drop=True)
 
     @staticmethod
     def from_dict(d: Dict) -> Union[pd.DataFrame, None]:
@@ -28,29 +145,187 @@ class DataFactory:
         return
 
     @staticmethod
-    def from_bytes(filename: str, file_bytes: bytes) -> Union[pd.DataFrame, None]:
+    def from_records(records: List[Dict]) -> Union[pd.DataFrame, None]:
+        try:
+            return pd.DataFrame.from_records(records)
+        except Exception as e:
+            logger.exception(f"Couldn't make df from python records: {e}")
+        return
+
+    @staticmethod
+    def to_columns(df: pd.DataFrame) -> Dict[str, List[Any]]:
+        """Converts a DataFrame into a column oriented, JSON serializable dict."""
+        return df.to_dict(orient="list")
+
+    @staticmethod
+    def from_bytes(
+        filename: str,
+        file_bytes: bytes,
+        schema: Optional[DatasetSchema] = None,
+        as_arrow: bool = False,
+    ) -> Union[pd.DataFrame, pa.Table, None]:
         """
         Create a pandas DataFrame from file bytes based on file extension.
 
-        Supports CSV, Excel, JSON, and Parquet formats.
+        Supports CSV, Excel, JSON, and Parquet formats. CSV and Parquet are parsed
+        by pyarrow, with the columns of `schema` read as their final type.
 
         :param filename: Original filename (used for format detection)
         :param file_bytes: File content in bytes
-        :return: Pandas DataFrame or None if unsupported file format provided.
+        :param schema: Types of known columns, e.g. `DatasetSchema.from_model`
+        :param as_arrow: Return an Arrow table instead of a DataFrame
+        :return: Pandas DataFrame (or Arrow table) or None if unsupported file
+            format provided.
         """
         file_stream = BytesIO(file_bytes)
         filename, extension = os.path.splitext(filename)
 
+        with telemetry.measure(
+            telemetry.SERIALIZATION_DURATION, "dataframe.parse", format=extension
+        ):
+            data = _read(file_stream, extension, schema)
+        return None if data is None else _convert(data, schema, as_arrow)
+
+    @staticmethod
+    def iter_chunks(
+        filename: str,
+        file: IO[bytes],
+        chunksize: int = 100_000,
+        schema: Optional[DatasetSchema] = None,
+        as_arrow: bool = False,
+    ) -> Union[Iterator[Union[pd.DataFrame, pa.Table]], None]:
+        """
+        Lazily parse a file object into DataFrames of at most `chunksize` rows.
+
+        CSV, JSON lines and Parquet are read incrementally, so memory stays bounded
+        by the chunk size. Excel and plain JSON documents can't be split and are
+        yielded as a single chunk. CSV chunks hold at least `chunksize` rows plus
+        at most one parsed block (except the last one).
+
+        :param filename: Original filename (used for format detection)
+        :param file: Readable binary file object
+        :param chunksize: Maximum number of rows per chunk
+        :param schema: Types of known columns, e.g. `DatasetSchema.from_model`
+        :param as_arrow: Yield Arrow tables instead of DataFrames
+        :return: Iterator of DataFrames or None if unsupported file format provided.
+        """
+        _, extension = os.path.splitext(filename)
+
         if extension == ".csv":
-            return pd.read_csv(file_stream)  # type: ignore
+            chunks = _iter_csv(file, chunksize, schema)
+        elif extension in [".jsonl", ".ndjson"]:
+            chunks = iter(pd.read_json(file, lines=True, chunksize=chunksize))
+        elif extension == ".parquet":
+            chunks = (
+                pa.Table.from_batches([batch])
+                for batch in pq.ParquetFile(file).iter_batches(batch_size=chunksize)
+            )
         elif extension in [".xls", ".xlsx"]:
-            return pd.read_excel(file_stream, engine="openpyxl")
+            chunks = iter([pd.read_excel(file, engine="openpyxl")])
         elif extension == ".json":
-            return pd.read_json(file_stream)
-        elif extension == ".parquet":
-            return pd.read_parquet(file_stream, engine="pyarrow")
+            chunks = iter([pd.read_json(file)])
+        else:
+            logger.exception(
+                "Unsupported file format. Supported formats: CSV, Excel, JSON, Parquet."
+            )
+            return
+        return telemetry.measure_iter(
+            telemetry.SERIALIZATION_DURATION,
+            "dataframe.parse",
+            (_convert(chunk, schema, as_arrow) for chunk in chunks),
+            format=extension,
+        )
+
+
+def _read(
+    file: IO[bytes], extension: str, schema: Optional[DatasetSchema]
+) -> Union[pd.DataFrame, pa.Table, None]:
+    if extension == ".csv":
+        try:
+            return pa_csv.read_csv(
+                file, convert_options=schema.csv_convert_options() if schema else None
+            )
+        except pa.ArrowInvalid as e:
+            if schema is None or not _is_conversion_error(e):
+                raise
+            file.seek(0)
+            return pa_csv.read_csv(
+                file, convert_options=schema.csv_convert_options(numeric_as_text=True)
+            )
+    if extension in [".xls", ".xlsx"]:
+        return pd.read_excel(file, engine="openpyxl")
+    if extension == ".json":
+        return pd.read_json(file)
+    if extension == ".parquet":
+        return pq.read_table(file)
+    logger.exception(
+        "Unsupported file format. Supported formats: CSV, Excel, JSON, Parquet."
+    )
+    return None
+
 
-        logger.exception(
-            "Unsupported file format. Supported formats: CSV, Excel, JSON, Parquet."
+def _iter_csv(
+    file: IO[bytes], chunksize: int, schema: Optional[DatasetSchema]
+) -> Iterator[pa.Table]:
+    start = file.tell() if schema is not None and file.seekable() else None
+    yielded = 0
+    try:
+        for table in _iter_csv_tables(
+            file, chunksize, schema.csv_convert_options() if schema else None
+        ):
+            yield table
+            yielded += table.num_rows
+    except pa.ArrowInvalid as e:
+        if start is None or not _is_conversion_error(e):
+            raise
+        # A value doesn't parse as the type of its column. The remaining rows are
+        # read with numeric columns as text, `DatasetSchema.apply_arrow` turns
+        # unparsable values into missing ones for validation to report.
+        file.seek(start)
+        yield from _iter_csv_tables(
+            file,
+            chunksize,
+            schema.csv_convert_options(numeric_as_text=True),
+            skip_rows=yielded,
         )
-        return
+
+
+def _iter_csv_tables(
+    file: IO[bytes],
+    chunksize: int,
+    convert_options: Optional[pa_csv.ConvertOptions],
+    skip_rows: int = 0,
+) -> Iterator[pa.Table]:
+    reader = pa_csv.open_csv(
+        file,
+        read_options=pa_csv.ReadOptions(skip_rows_after_names=skip_rows),
+        convert_options=convert_options,
+    )
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunksize:
+            yield pa.Table.from_batches(batches)
+            batches, rows = [], 0
+    if batches:
+        yield pa.Table.from_batches(batches)
+
+
+def _is_conversion_error(error: pa.ArrowInvalid) -> bool:
+    """Tells a value not matching its column type apart from malformed CSV"""
+    return "conversion error" in str(error)
+
+
+def _convert(
+    data: Union[pd.DataFrame, pa.Table],
+    schema: Optional[DatasetSchema],
+    as_arrow: bool,
+) -> Union[pd.DataFrame, pa.Table]:
+    if isinstance(data, pa.Table):
+        if as_arrow:
+            return schema.apply_arrow(data) if schema else data
+        data = data.to_pandas()
+    if schema:
+        data = schema.apply(data)
+    return pa.Table.from_pandas(data, preserve_index=False) if as_arrow else data
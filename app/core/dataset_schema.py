@@ -0,0 +1,124 @@
+"""Column types of datasets, derived from the request schemas.
+
+`Literal` fields become categoricals with their allowed values as fixed
+categories, numeric fields keep their `ge`/`le` bounds. Parsers use the schema to
+read columns with their final type right away instead of inferring object
+columns first.
+"""
+
+import typing
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Type
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from annotated_types import Ge, Le
+from pydantic import BaseModel
+
+
+CATEGORY = "category"
+FLOAT = "float"
+INT = "int"
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    kind: str
+    categories: Optional[Tuple[str, ...]] = None
+    ge: Optional[float] = None
+    le: Optional[float] = None
+
+    @property
+    def arrow_type(self) -> pa.DataType:
+        if self.kind == CATEGORY:
+            return pa.dictionary(pa.int32(), pa.string())
+        return pa.int64() if self.kind == INT else pa.float64()
+
+
+class DatasetSchema:
+    """Types of the columns of a dataset. Columns not in the schema are inferred."""
+
+    def __init__(self, columns: List[ColumnSpec]) -> None:
+        self.columns = {column.name: column for column in columns}
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def from_model(cls, model: Type[BaseModel]) -> "DatasetSchema":
+        columns = []
+        for name, field in model.model_fields.items():
+            name = field.serialization_alias or name
+            if typing.get_origin(field.annotation) is typing.Literal:
+                columns.append(
+                    ColumnSpec(
+                        name, CATEGORY, categories=typing.get_args(field.annotation)
+                    )
+                )
+                continue
+            if field.annotation not in (int, float):
+                continue
+
+            ge = next((m.ge for m in field.metadata if isinstance(m, Ge)), None)
+            le = next((m.le for m in field.metadata if isinstance(m, Le)), None)
+            kind = INT if field.annotation is int else FLOAT
+            columns.append(ColumnSpec(name, kind, ge=ge, le=le))
+        return cls(columns)
+
+    def csv_convert_options(
+        self, numeric_as_text: bool = False
+    ) -> pa_csv.ConvertOptions:
+        """Reads known columns with their types, numeric ones as text if asked to"""
+        return pa_csv.ConvertOptions(
+            column_types={
+                name: pa.string()
+                if numeric_as_text and column.kind != CATEGORY
+                else column.arrow_type
+                for name, column in self.columns.items()
+            }
+        )
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Casts the known columns of a DataFrame to their types
+
+        Values outside the categories of a column and non-numeric values in
+        numeric columns become missing, so validation reports them.
+        """
+        casts: Dict[str, pd.Series] = {}
+        for name in df.columns.intersection(list(self.columns)):
+            column, series = self.columns[name], df[name]
+            if column.kind == CATEGORY:
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    casts[name] = series.cat.set_categories(column.categories)
+                else:
+                    casts[name] = pd.Series(
+                        pd.Categorical(series, categories=column.categories),
+                        index=series.index,
+                    )
+                continue
+
+            series = pd.to_numeric(series, errors="coerce")
+            if column.kind == INT and not series.isna().any():
+                series = series.astype("int64")
+            casts[name] = series.astype("float64") if column.kind == FLOAT else series
+        return df.assign(**casts) if casts else df
+
+    def apply_arrow(self, table: pa.Table) -> pa.Table:
+        """Casts the known columns of an Arrow table to their types
+
+        Tables with values that can't be cast (e.g. text in a numeric column) are
+        converted like DataFrames by `apply` instead.
+        """
+        fields = [
+            pa.field(field.name, self.columns[field.name].arrow_type)
+            if field.name in self.columns
+            else field
+            for field in table.schema
+        ]
+        try:
+            return table.cast(pa.schema(fields))
+        except pa.ArrowInvalid:
+            return pa.Table.from_pandas(
+                self.apply(table.to_pandas()), preserve_index=False
+            )
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DiskCache:
+    """Size-bounded LRU cache of S3 objects on local disk.
+
+    Every object is kept in one file named after its bucket/key and ETag, so a
+    changed object never matches an outdated copy. Files are written to a
+    temporary name and renamed, several processes can share a directory. The
+    least recently used files are removed once `max_bytes` is exceeded. Objects
+    are downloaded into `temp_path` files, which `commit` moves into the cache.
+    Readers `pin` the files they read, so eviction doesn't pull them away.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "bytes_saved": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self) -> None:
+        files = []
+        for entry in os.scandir(self.directory):
+            name, _, etag = entry.name.partition(".")
+            if entry.is_file() and etag and not name.startswith("tmp"):
+                files.append((entry.stat().st_mtime, name, etag, entry.stat().st_size))
+        for _, name, etag, size in sorted(files):
+            self._entries[name] = (etag, size)
+            self.size += size
+        self._evict()
+
+    @staticmethod
+    def _name(bucket: str, key: str) -> str:
+        return hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()[:32]
+
+    def _path(self, name: str, etag: str) -> str:
+        return os.path.join(self.directory, f"{name}.{etag}")
+
+    def lookup(self, bucket: str, key: str) -> Optional[Tuple[str, str]]:
+        """Returns the ETag and path of the cached copy of an object, if any"""
+        name = self._name(bucket, key)
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            return None
+        path = self._path(name, entry[0])
+        if not os.path.exists(path):
+            # Evicted by another process sharing the directory
+            self._discard(name)
+            return None
+        return f'"{entry[0]}"', path
+
+    def hit(self, bucket: str, key: str, revalidated: bool = False) -> None:
+        name = self._name(bucket, key)
+        with self._lock:
+            if (entry := self._entries.get(name)) is None:
+                return
+            self._entries.move_to_end(name)
+            self._stats["hits"] += 1
+            self._stats["revalidated"] += revalidated
+            self._stats["bytes_saved"] += entry[1]
+        try:
+            os.utime(self._path(name, entry[0]))
+        except OSError:
+            pass
+
+    def temp_path(self) -> str:
+        """Path of a new, empty file to download an object into before `commit`"""
+        descriptor, path = tempfile.mkstemp(prefix="tmp", dir=self.directory)
+        os.close(descriptor)
+        return path
+
+    def pin(self, path: str) -> Optional[str]:
+        """Hard link to a cached file, readable until removed even once evicted
+
+        Returns None if the file is gone already.
+        """
+        pinned = self.temp_path()
+        os.remove(pinned)
+        try:
+            os.link(path, pinned)
+        except FileNotFoundError:
+            return None
+        return pinned
+
+    def miss(self) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def commit(self, bucket: str, key: str, etag: str, path: str) -> Optional[str]:
+        """Moves a downloaded object into the cache and returns its new path
+
+        Objects larger than the whole cache aren't stored, None is returned and
+        the file is left where it is.
+        """
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return None
+
+        name = self._name(bucket, key)
+        etag = re.sub(r"[^A-Za-z0-9-]", "", etag)
+        os.replace(path, self._path(name, etag))
+
+        self._discard(name, keep=etag)
+        with self._lock:
+            self._entries[name] = (etag, size)
+            self.size += size
+        self._evict()
+        return self._path(name, etag)
+
+    def _discard(self, name: str, keep: Optional[str] = None) -> None:
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is None:
+                return
+            self.size -= entry[1]
+        if entry[0] != keep:
+            self._remove(self._path(name, entry[0]))
+
+    def _evict(self) -> None:
+        while True:
+            with self._lock:
+                if self.size <= self.max_bytes or not self._entries:
+                    return
+                name, (etag, size) = self._entries.popitem(last=False)
+                self.size -= size
+            self._remove(self._path(name, etag))
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "size_bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
@@ -1,24 +1,80 @@
 import os
-import io
+import json
+import uuid
+import asyncio
+import hashlib
 import logging
 import tempfile
-from typing import Any, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
 
 import boto3
-import joblib
-from botocore.exceptions import ClientError, NoCredentialsError
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
 
 from app.constants import EnvConfig
+from app.core import serializers, telemetry
+from app.core.data_factory import DataFactory, HashIndex, MergeReport
+from app.core.disk_cache import DiskCache
+from app.core.multipart import MultipartWriter, RangeReader, download_ranges
+from app.core.payload_codec import PayloadCodec
+from app.core.profile import DatasetProfile
+from app.core.serializers import Serializer
+from app.utils import get_metadata
 
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+PROFILE_SUFFIX = ".profile.json"
+POINTER_SUFFIX = ".pointer.json"
+
+
+@dataclass(frozen=True)
+class DatasetVersion:
+    md5: str
+    key: str
+    bucket: str
+    size: int
+    # False if identical content was stored before
+    created: bool = True
+
+
+CACHE_PREFIX = "files/md5/"
+
+
+class NoRowsError(ValueError):
+    """Raised instead of storing chunks without any rows"""
+
+
+def cache_key(md5: str) -> str:
+    """Content-addressed key of an object, laid out like the DVC cache"""
+    return f"{CACHE_PREFIX}{md5[:2]}/{md5[2:]}"
+
 
 class DVCClient:
-    """Handles DVC operations with S3-like remote, using temporary files."""
+    """Handles DVC operations with S3-like remote."""
 
     _instance = None
+    _initialized = False
 
     def __new__(cls):
         """Returns the singleton instance or creates a new one if not existend"""
@@ -27,6 +83,11 @@ class DVCClient:
         return cls._instance
 
     def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        pool_size = int(os.getenv(EnvConfig.S3_MAX_POOL_CONNECTIONS.value, "32"))
+        self._known_buckets: set = set()
         self.client = boto3.client(
             "s3",
             aws_access_key_id=os.environ[EnvConfig.S3_ACCESS_KEY_ID.value],
@@ -34,15 +95,137 @@ class DVCClient:
             endpoint_url=os.environ[
                 EnvConfig.S3_ENDPOINT_URL.value
             ],  # Use None for AWS S3, set URL for MinIO
+            config=Config(
+                max_pool_connections=pool_size,
+                connect_timeout=float(
+                    os.getenv(EnvConfig.S3_CONNECT_TIMEOUT.value, "5")
+                ),
+                read_timeout=float(os.getenv(EnvConfig.S3_READ_TIMEOUT.value, "60")),
+                retries={
+                    "mode": "standard",
+                    "total_max_attempts": int(
+                        os.getenv(EnvConfig.S3_MAX_ATTEMPTS.value, "5")
+                    ),
+                },
+            ),
+        )
+        telemetry.instrument_s3(self.client)
+        # boto3 is blocking, async callers are served from a pool as large as the
+        # connection pool so no request waits for a connection.
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="dvc-client"
+        )
+        cache_bytes = int(os.getenv(EnvConfig.DISK_CACHE_MAX_BYTES.value, str(1024**3)))
+        self._disk_cache = (
+            DiskCache(
+                os.getenv(
+                    EnvConfig.DISK_CACHE_DIR.value,
+                    os.path.join(tempfile.gettempdir(), "pipeline-api-cache"),
+                ),
+                max_bytes=cache_bytes,
+            )
+            if cache_bytes > 0
+            else None
+        )
+
+        # Large objects are moved in parts, `concurrency` at a time but never more
+        # than `S3_TRANSFER_MAX_MEMORY` bytes of parts in flight.
+        self.part_size = int(
+            os.getenv(EnvConfig.S3_MULTIPART_CHUNKSIZE.value, str(8 * 1024**2))
+        )
+        concurrency = int(os.getenv(EnvConfig.S3_TRANSFER_CONCURRENCY.value, "8"))
+        max_memory = int(
+            os.getenv(EnvConfig.S3_TRANSFER_MAX_MEMORY.value, str(256 * 1024**2))
+        )
+        self.max_inflight = max(1, min(concurrency, max_memory // self.part_size))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=self.part_size,
+            multipart_chunksize=self.part_size,
+            max_concurrency=self.max_inflight,
+        )
+        # Parts get their own pool, transfers started from `_executor` would
+        # otherwise wait for workers of the pool they are occupying.
+        self._transfer_executor = ThreadPoolExecutor(
+            max_workers=self.max_inflight, thread_name_prefix="dvc-transfer"
+        )
+        self._initialized = True
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(func, *args, **kwargs)
         )
 
-    def read_data_from(self, source: str, bucket_name=None) -> Union[Any, None]:
+    async def save_version_async(
+        self,
+        chunks: Iterable[Union[pd.DataFrame, pa.Table]],
+        name: str,
+        **kwargs,
+    ) -> Union[DatasetVersion, None]:
+        return await self._run(self.save_version, chunks, name, **kwargs)
+
+    async def read_pointer_async(
+        self, name: str, **kwargs
+    ) -> Union[Dict[str, Any], None]:
+        return await self._run(self.read_pointer, name, **kwargs)
+
+    async def write_manifest_async(self, prefix: str, **kwargs) -> Union[str, None]:
+        return await self._run(self.write_manifest, prefix, **kwargs)
+
+    async def provision_async(self, **kwargs) -> bool:
+        return await self._run(self.provision, **kwargs)
+
+    async def import_legacy_log_async(self, source: str, prefix: str, **kwargs) -> int:
+        return await self._run(self.import_legacy_log, source, prefix, **kwargs)
+
+    async def import_legacy_dataset_async(
+        self, source: str, name: str, **kwargs
+    ) -> Union[DatasetVersion, None]:
+        return await self._run(self.import_legacy_dataset, source, name, **kwargs)
+
+    async def publish_codebook_async(self, codec: PayloadCodec, **kwargs) -> bool:
+        return await self._run(self.publish_codebook, codec, **kwargs)
+
+    async def get_metadata_async(
+        self, source: str, **kwargs
+    ) -> Union[Dict[str, Any], None]:
+        return await self._run(self.get_metadata, source, **kwargs)
+
+    async def write_profile_async(
+        self, profile: DatasetProfile, source: str, **kwargs
+    ) -> bool:
+        return await self._run(self.write_profile, profile, source, **kwargs)
+
+    async def read_profile_async(
+        self, source: str, **kwargs
+    ) -> Union[DatasetProfile, None]:
+        return await self._run(self.read_profile, source, **kwargs)
+
+    async def read_log_profile_async(self, prefix: str, **kwargs) -> DatasetProfile:
+        return await self._run(self.read_log_profile, prefix, **kwargs)
+
+    def read_data_from(
+        self,
+        source: str,
+        bucket_name=None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Union[Any, None]:
         """Reads an object from a S3 bucket
 
+        The format is detected from the object itself, so Parquet and joblib
+        objects can be read alike. Objects are downloaded to local disk with
+        parallel ranged GETs and deserialized from there. Without a disk cache,
+        Parquet reads of some `columns` or `filters` fetch only the byte ranges
+        they need.
+
         Args:
             source (str): Path under the object is available.
             bucket_name (str, optional): Bucket name to upload to. Defaults to None.
                 If not provided, a default name from the environment space will be used.
+            columns (List[str], optional): Only read these columns of a DataFrame.
+            filters (List, optional): Only read Parquet rows matching these pyarrow
+                filter expressions, e.g. [("age", ">", 30)].
 
         Returns:
             Union[Any, None]: Downloaded (python) object.
@@ -52,15 +235,102 @@ class DVCClient:
             bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
 
         try:
-            response = self.client.get_object(Bucket=bucket_name, Key=source)
-            buffer = io.BytesIO(response["Body"].read())  # Read data into buffer
-            obj = joblib.load(buffer)  # Deserialize object
-            logger.info(f"Downloaded {source}")
+            if self._disk_cache is None and (columns or filters):
+                file = RangeReader(self.client, bucket_name, source)
+                serializer = serializers.detect(file.read(4), file.content_type)
+                file.seek(0)
+                with self._measure_serialization(serializer, "loads"):
+                    obj = serializer.load_file(file, columns=columns, filters=filters)
+            else:
+                with self._read_through(bucket_name, source) as path:
+                    with open(path, "rb") as file:
+                        serializer = serializers.detect(file.read(4))
+                    with self._measure_serialization(serializer, "loads"):
+                        obj = serializer.load_file(
+                            path, columns=columns, filters=filters
+                        )
+            logger.info(f"Read {source} ({serializer.name})")
         except ClientError as e:
             logger.error(f"Error in downloading file: {e}")
+        except serializers.UnknownFormatError as e:
+            logger.error(f"Error in reading {source}: {e}")
         return obj
 
-    def save_data_to(self, obj: Any, destination: str, bucket_name=None) -> bool:
+    @staticmethod
+    def _measure_serialization(serializer: Serializer, direction: str):
+        return telemetry.measure(
+            telemetry.SERIALIZATION_DURATION,
+            f"serialization.{direction}",
+            format=serializer.name,
+            direction=direction,
+        )
+
+    @contextmanager
+    def _read_through(self, bucket_name: str, key: str) -> Iterator[str]:
+        """Local copy of an object, served from the disk cache if it didn't change
+
+        Cached copies are revalidated with a conditional GET, which transfers
+        nothing while the ETag matches. Content-addressed objects never change and
+        are served without any request. Objects that aren't cached (the cache is
+        disabled or they are too large) are downloaded to a temporary file. The
+        yielded path stays readable until exit, even if the object is evicted.
+        """
+        cache = self._disk_cache
+        cached = cache.lookup(bucket_name, key) if cache else None
+        # Cached files are read through a hard link, evicting them meanwhile (by
+        # another thread or process) only removes their name.
+        pinned = cache.pin(cached[1]) if cached else None
+        if pinned is None:
+            # Evicted since the lookup, downloaded again
+            cached = None
+        if cache:
+            path = cache.temp_path()
+        else:
+            descriptor, path = tempfile.mkstemp(prefix="dvc-")
+            os.close(descriptor)
+        try:
+            if cached and key.startswith(CACHE_PREFIX):
+                cache.hit(bucket_name, key)
+                yield pinned
+                return
+
+            with open(path, "r+b") as file:
+                info = download_ranges(
+                    self.client,
+                    bucket_name,
+                    key,
+                    file,
+                    part_size=self.part_size,
+                    executor=self._transfer_executor,
+                    max_inflight=self.max_inflight,
+                    if_none_match=cached[0] if cached else None,
+                )
+            if info is None:
+                cache.hit(bucket_name, key, revalidated=True)
+                yield pinned
+                return
+
+            if cache:
+                cache.miss()
+                # Moved into the cache, the download stays readable as `pinned`
+                if pinned:
+                    os.remove(pinned)
+                pinned = cache.pin(path)
+                cache.commit(bucket_name, key, info["ETag"], path)
+            yield pinned or path
+        finally:
+            for local in (path, pinned):
+                # Gone if it was moved into the cache
+                if local and os.path.exists(local):
+                    os.remove(local)
+
+    def save_data_to(
+        self,
+        obj: Any,
+        destination: str,
+        bucket_name=None,
+        serializer: Optional[Serializer] = None,
+    ) -> bool:
         """Upload an object to a S3 bucket
 
         Args:
@@ -68,44 +338,920 @@ class DVCClient:
             bucket_name (str, optional): Bucket name to upload to. Defaults to None.
                 If not provided, a default name from the environment space will be used.
             destination (str): Location under the object should be saved.
+            serializer (Serializer, optional): Format to store the object in.
+                Defaults to Parquet for DataFrames and joblib for anything else.
 
         Returns:
            bool: True if file was uploaded, else False.
         """
         if not bucket_name:
             bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+        if serializer is None:
+            serializer = serializers.for_object(obj)
 
         try:
-            # Check if the bucket exists
-            existing_buckets = self.client.list_buckets()
-            bucket_names = [
-                bucket["Name"] for bucket in existing_buckets.get("Buckets", [])
-            ]
+            with self._measure_serialization(serializer, "dumps"):
+                body = serializer.dumps(obj)
+            self._put_object(
+                bucket_name,
+                key=destination,
+                body=body,
+                content_type=serializer.content_type,
+            )
+            logger.info(f"Uploaded {destination} to {bucket_name}")
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in file upload: {e}")
+            return False
+        return True
+
+    def save_chunks_to(
+        self,
+        chunks: Iterable[Union[pd.DataFrame, pa.Table]],
+        destination: str,
+        bucket_name=None,
+        digest=None,
+    ) -> Union[int, None]:
+        """Streams DataFrame chunks as one Parquet object to a S3 bucket
+
+        Each chunk is written as a Parquet row group and sent on as multipart
+        upload parts, uploaded in parallel while the next chunks are written, so
+        memory is bounded by one chunk plus the parts in flight regardless of the
+        total size. All chunks are cast to the schema of the first one.
+        Nothing is stored if the chunks can't be read or the upload fails.
+
+        Args:
+            chunks (Iterable[Union[pd.DataFrame, pa.Table]]): DataFrames or Arrow
+                tables to store, e.g. from `DataFactory.iter_chunks`.
+            destination (str): Location under the object should be saved.
+            bucket_name (str, optional): Bucket name to upload to. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+            digest (optional): hashlib object updated with the stored bytes.
+
+        Returns:
+            Union[int, None]: Number of rows written or None if the upload failed.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+        parquet = serializers.SERIALIZERS["parquet"]
+
+        try:
+            self.ensure_bucket(bucket_name)
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in file upload: {e}")
+            return None
+
+        sink = MultipartWriter(
+            self.client,
+            bucket=bucket_name,
+            key=destination,
+            part_size=self.part_size,
+            extra_args={"ContentType": parquet.content_type},
+            digest=digest,
+            executor=self._transfer_executor,
+            max_inflight=self.max_inflight,
+        )
+        writer = None
+        rows = 0
+        try:
+            for chunk in chunks:
+                if not isinstance(chunk, pa.Table):
+                    table = pa.Table.from_pandas(
+                        chunk,
+                        schema=writer.schema if writer else None,
+                        preserve_index=False,
+                    )
+                elif writer is not None and chunk.schema != writer.schema:
+                    table = chunk.cast(writer.schema)
+                else:
+                    table = chunk
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        sink, table.schema, compression=parquet.compression
+                    )
+                writer.write_table(table)
+                rows += len(chunk)
+
+            if writer is None:
+                raise NoRowsError("No rows to store")
+            writer.close()
+            sink.close()
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in file upload: {e}")
+            sink.abort()
+            return None
+        except Exception:
+            sink.abort()
+            raise
+
+        logger.info(f"Uploaded {rows} rows to {destination} in {bucket_name}")
+        return rows
+
+    def save_version(
+        self,
+        chunks: Iterable[Union[pd.DataFrame, pa.Table]],
+        name: str,
+        bucket_name=None,
+    ) -> Union[DatasetVersion, None]:
+        """Stores DataFrame chunks as an immutable, content-addressed dataset version
+
+        The chunks are streamed to a staging key while their md5 is computed. The
+        content is kept under `files/md5/<2>/<30>` (the DVC cache layout) unless an
+        identical version exists already. Finally the pointer `<name>.pointer.json`
+        is set to the version, so the same name always resolves to the latest one.
+
+        Args:
+            chunks (Iterable[Union[pd.DataFrame, pa.Table]]): Data of the version.
+            name (str): Name of the dataset (e.g. data.parquet).
+            bucket_name (str, optional): Bucket name to upload to. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            Union[DatasetVersion, None]: Stored version or None if the upload failed.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
 
-            if bucket_name not in bucket_names:
-                self.client.create_bucket(Bucket=bucket_name)
-                logger.info(f"Created bucket: {bucket_name}")
+        digest = hashlib.md5(usedforsecurity=False)
+        staging_key = f"staging/{uuid.uuid4().hex}-{os.path.basename(name)}"
+        rows = self.save_chunks_to(
+            chunks, staging_key, bucket_name=bucket_name, digest=digest
+        )
+        if rows is None:
+            return None
 
-                # Enable versioning
-                self.client.put_bucket_versioning(
-                    Bucket=bucket_name, VersioningConfiguration={"Status": "Enabled"}
+        md5 = digest.hexdigest()
+        key = cache_key(md5)
+        try:
+            created = not self._exists(bucket_name, key)
+            if created:
+                self.client.copy(
+                    {"Bucket": bucket_name, "Key": staging_key},
+                    bucket_name,
+                    key,
+                    ExtraArgs={
+                        "ContentType": serializers.SERIALIZERS["parquet"].content_type
+                    },
+                    Config=self.transfer_config,
                 )
-                logger.info(f"Enabled versioning on {bucket_name}")
-            else:
-                logger.info(f"Bucket {bucket_name} already exists")
-
-            with tempfile.NamedTemporaryFile(mode="wb+", delete=True) as tmp:
-                joblib.dump(obj, tmp.name)
-                response = self.client.upload_file(
-                    Filename=tmp.name,
-                    Bucket=bucket_name,
-                    Key=destination,
+            size = self.client.head_object(Bucket=bucket_name, Key=key)["ContentLength"]
+            version = DatasetVersion(
+                md5=md5, key=key, bucket=bucket_name, size=size, created=created
+            )
+            self._put_object(
+                bucket_name,
+                key=f"{name}{POINTER_SUFFIX}",
+                body=json.dumps(
+                    {
+                        "md5": md5,
+                        "path": key,
+                        "bucket": bucket_name,
+                        "size": size,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                    }
+                ).encode(),
+                content_type="application/json",
+            )
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in storing version of {name}: {e}")
+            return None
+        finally:
+            try:
+                self.client.delete_object(Bucket=bucket_name, Key=staging_key)
+            except ClientError as e:
+                logger.error(f"Error in deleting {staging_key}: {e}")
+
+        logger.info(
+            f"{name} points to {key} ({rows} rows, "
+            f"{'new' if created else 'deduplicated'})"
+        )
+        return version
+
+    def read_pointer(self, name: str, bucket_name=None) -> Union[Dict[str, Any], None]:
+        """Returns the current version a dataset name points to, if any"""
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            response = self.client.get_object(
+                Bucket=bucket_name, Key=f"{name}{POINTER_SUFFIX}"
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                logger.error(f"Error in reading pointer of {name}: {e}")
+            return None
+        return json.loads(response["Body"].read())
+
+    def _exists(self, bucket_name: str, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def ensure_bucket(self, bucket_name: str) -> None:
+        """Creates the bucket with versioning enabled if it doesn't exist yet
+
+        Buckets are checked once per process, later calls return without a request.
+        """
+        if bucket_name in self._known_buckets:
+            return
+
+        try:
+            self.client.head_bucket(Bucket=bucket_name)
+            logger.info(f"Bucket {bucket_name} already exists")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchBucket"):
+                raise
+            self.client.create_bucket(Bucket=bucket_name)
+            logger.info(f"Created bucket: {bucket_name}")
+
+            # Enable versioning
+            self.client.put_bucket_versioning(
+                Bucket=bucket_name, VersioningConfiguration={"Status": "Enabled"}
+            )
+            logger.info(f"Enabled versioning on {bucket_name}")
+        self._known_buckets.add(bucket_name)
+
+    def provision(self, bucket_name=None) -> bool:
+        """Makes sure the (default) bucket exists, meant to run once on startup
+
+        Args:
+            bucket_name (str, optional): Bucket name to provision. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            bool: True if the bucket is available, else False.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            self.ensure_bucket(bucket_name)
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Error in provisioning bucket {bucket_name}: {e}")
+            return False
+        return True
+
+    def publish_codebook(self, codec: PayloadCodec, bucket_name=None) -> bool:
+        """Stores the codebook of compact payloads for workers, once per version
+
+        Args:
+            codec (PayloadCodec): Codec the payloads are encoded with.
+            bucket_name (str, optional): Bucket name to store it in. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            bool: True if the codebook is available.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            # Versions are content hashes, an existing one never changes
+            if not self._exists(bucket_name, codec.key):
+                self._put_object(
+                    bucket_name,
+                    key=codec.key,
+                    body=codec.content,
+                    content_type="application/json",
                 )
-                logger.warning(f"Response: {response}")
-                tmp.close()
+                logger.info(f"Published payload codebook {codec.version}")
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in publishing codebook {codec.version}: {e}")
+            return False
+        return True
 
-            logger.info(f"Uploaded {destination} to {bucket_name}")
+    def _put_object(
+        self, bucket_name: str, key: str, body: bytes, content_type: str
+    ) -> None:
+        """Uploads in a single request, creating the bucket only if it is missing"""
+        try:
+            self.client.put_object(
+                Bucket=bucket_name, Key=key, Body=body, ContentType=content_type
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "NoSuchBucket":
+                raise
+            self._known_buckets.discard(bucket_name)
+            self.ensure_bucket(bucket_name)
+            self.client.put_object(
+                Bucket=bucket_name, Key=key, Body=body, ContentType=content_type
+            )
+
+    def append_segment(
+        self, df: pd.DataFrame, prefix: str, segment_id: str, bucket_name=None
+    ) -> Union[str, None]:
+        """Appends rows to a log as a new, immutable Parquet segment
+
+        Writes never touch existing objects, so concurrent appends can't overwrite
+        each other and the cost of a write doesn't grow with the log.
+
+        Args:
+            df (pd.DataFrame): Rows to append.
+            prefix (str): Location of the log (e.g. feedback).
+            segment_id (str): Identifier making the segment key unique (e.g. task id).
+            bucket_name (str, optional): Bucket name to upload to. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            Union[str, None]: Key of the written segment or None if the upload failed.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        now = datetime.now(timezone.utc)
+        key = (
+            f"{prefix}/segments/date={now:%Y-%m-%d}/{now:%H%M%S%f}-{segment_id}.parquet"
+        )
+        parquet = serializers.SERIALIZERS["parquet"]
+
+        try:
+            self._put_object(
+                bucket_name,
+                key=key,
+                body=parquet.dumps(df),
+                content_type=parquet.content_type,
+            )
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Error in segment upload: {e}")
+            return None
+
+        # Segments aren't profiled, compaction adds their rows to the log profile.
+        logger.info(f"Appended {len(df)} rows as {key}")
+        return key
+
+    def import_legacy_log(self, source: str, prefix: str, bucket_name=None) -> int:
+        """Moves the rows of a log stored as one object into the segments of `prefix`
+
+        Logs used to be rewritten as a whole into a single object (e.g.
+        retrain.joblib). Its rows are appended as one segment and the object is
+        deleted, so this is meant to run on startup and is a no-op afterwards.
+        Should the process die between append and delete, the rows are appended
+        again on the next start and dropped as duplicates by compaction.
+
+        Args:
+            source (str): Key of the single-object log.
+            prefix (str): Location of the log (e.g. feedback).
+            bucket_name (str, optional): Bucket name of the log. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            int: Number of rows moved, 0 if there was nothing to move.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            if not self._exists(bucket_name, source):
+                return 0
         except (NoCredentialsError, ClientError) as e:
-            logger.error(f"Error in file upload: {e}")
+            logger.error(f"Error in looking up {source}: {e}")
+            return 0
+
+        df = self.read_data_from(source, bucket_name=bucket_name)
+        if not isinstance(df, pd.DataFrame):
+            logger.error(f"{source} doesn't hold a DataFrame, left in place")
+            return 0
+        if not df.empty and (
+            self.append_segment(df, prefix, "legacy", bucket_name=bucket_name) is None
+        ):
+            return 0
+
+        try:
+            self.client.delete_object(Bucket=bucket_name, Key=source)
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in deleting {source}: {e}")
+            return 0
+        self.write_manifest(prefix, bucket_name=bucket_name)
+        logger.info(f"Moved {len(df)} rows of {source} into the log {prefix}")
+        return len(df)
+
+    def import_legacy_dataset(
+        self, source: str, name: str, bucket_name=None
+    ) -> Union[DatasetVersion, None]:
+        """Stores a dataset kept in a single object as the first version of `name`
+
+        Datasets used to be stored under a fixed key (e.g. data.joblib) instead of
+        versions. As long as `name` has no version yet, the object is saved as one
+        and left in place, so this is meant to run on startup and is a no-op once
+        a version exists.
+
+        Args:
+            source (str): Key of the unversioned dataset.
+            name (str): Name of the dataset (e.g. data.parquet).
+            bucket_name (str, optional): Bucket name of the dataset. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            Union[DatasetVersion, None]: Stored version or None if nothing was moved.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        if self.read_pointer(name, bucket_name=bucket_name) is not None:
+            return None
+        try:
+            if not self._exists(bucket_name, source):
+                return None
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in looking up {source}: {e}")
+            return None
+
+        df = self.read_data_from(source, bucket_name=bucket_name)
+        if not isinstance(df, pd.DataFrame) or df.empty:
+            logger.error(f"{source} doesn't hold any rows, not versioned")
+            return None
+        version = self.save_version([df], name, bucket_name=bucket_name)
+        if version is None:
+            return None
+        if version.created:
+            self.write_profile(
+                DatasetProfile().update(df), version.key, bucket_name=bucket_name
+            )
+        logger.info(f"Stored {len(df)} rows of {source} as {name} {version.md5}")
+        return version
+
+    def list_segments(self, prefix: str, bucket_name=None) -> List[str]:
+        """Lists the keys of all segments (compacted and not) of a log
+
+        Segments retired by compaction are left out, their rows are part of a
+        compacted segment.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        retired = self._load_retired(prefix, bucket_name)
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for folder in ("compacted", "segments"):
+            for page in paginator.paginate(
+                Bucket=bucket_name, Prefix=f"{prefix}/{folder}/"
+            ):
+                keys.extend(
+                    obj["Key"]
+                    for obj in page.get("Contents", [])
+                    if obj["Key"].endswith(".parquet") and obj["Key"] not in retired
+                )
+        return keys
+
+    def write_manifest(self, prefix: str, bucket_name=None) -> Union[str, None]:
+        """Writes the list of segments making up a log as an immutable manifest
+
+        The manifest is stored under `<prefix>/manifests/<md5>.json`, hashed over
+        its content, so an unchanged log always yields the same key. Segments are
+        immutable, so the key identifies the content of the log. The latest one is
+        also written to `<prefix>/manifest.json`.
+
+        Args:
+            prefix (str): Location of the log (e.g. feedback).
+            bucket_name (str, optional): Bucket name to upload to. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            Union[str, None]: Key of the manifest or None if it couldn't be written.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            manifest = {
+                "format": "parquet",
+                "bucket": bucket_name,
+                "segments": sorted(self.list_segments(prefix, bucket_name=bucket_name)),
+            }
+            body = json.dumps(manifest, sort_keys=True).encode()
+            md5 = hashlib.md5(body, usedforsecurity=False).hexdigest()
+            key = f"{prefix}/manifests/{md5}.json"
+            if not self._exists(bucket_name, key):
+                self._put_object(
+                    bucket_name, key=key, body=body, content_type="application/json"
+                )
+            self._put_object(
+                bucket_name,
+                key=f"{prefix}/manifest.json",
+                body=json.dumps(
+                    {
+                        **manifest,
+                        "md5": md5,
+                        "path": key,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                    }
+                ).encode(),
+                content_type="application/json",
+            )
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in writing manifest: {e}")
+            return None
+
+        logger.info(f"Wrote manifest of {len(manifest['segments'])} segments")
+        return key
+
+    def compact_segments(
+        self,
+        prefix: str,
+        min_segments: int = 2,
+        subset: Optional[List[str]] = None,
+        retention: float = 172800,
+        lease_ttl: float = 3600,
+        bucket_name=None,
+    ) -> int:
+        """Merges the small segments of a log into one compacted segment
+
+        Rows whose `subset` was already compacted before are dropped. Instead of
+        re-reading the history, their hashes are kept in `<prefix>/index.parquet`,
+        and segments are streamed one at a time into the compacted segment. It is
+        written, followed by the index, before the merged segments are retired in
+        `<prefix>/retired.json`, so readers never miss rows (at worst they see
+        some twice for a short moment). Retired segments are no longer listed but
+        only deleted `retention` seconds later, manifests written before still
+        refer to them. The profile of the compacted rows is added to the profile
+        of the log. If the upload fails nothing else is written, unreadable
+        segments are skipped and kept.
+
+        Compactions of a log are serialized by a lease in
+        `<prefix>/compaction.lease`, taken with a conditional write, so every
+        process may call this periodically. A lease not released within
+        `lease_ttl` seconds (the holder died) is taken over.
+
+        Args:
+            prefix (str): Location of the log (e.g. feedback).
+            min_segments (int, optional): Don't compact fewer segments. Defaults to 2.
+            subset (List[str], optional): Columns identifying a row for
+                deduplication. Defaults to None (all columns).
+            retention (float, optional): Seconds merged segments are kept.
+                Defaults to 2 days.
+            lease_ttl (float, optional): Seconds a compaction may take. Defaults
+                to an hour.
+            bucket_name (str, optional): Bucket name of the log. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            int: Number of segments merged.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        lease_key = f"{prefix}/compaction.lease"
+        try:
+            lease = self._acquire_lease(bucket_name, lease_key, lease_ttl)
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Error in taking the compaction lease of {prefix}: {e}")
+            return 0
+        if lease is None:
+            logger.info(f"Segments of {prefix} are compacted by another process")
+            return 0
+        try:
+            return self._compact_segments(
+                prefix, min_segments, subset, retention, bucket_name
+            )
+        finally:
+            self._release_lease(bucket_name, lease_key, lease)
+
+    def _compact_segments(
+        self,
+        prefix: str,
+        min_segments: int,
+        subset: Optional[List[str]],
+        retention: float,
+        bucket_name: str,
+    ) -> int:
+        try:
+            retired = self._load_retired(prefix, bucket_name)
+            expired = [
+                key for key, at in retired.items() if at < time.time() - retention
+            ]
+            if expired:
+                self._delete_objects(
+                    bucket_name,
+                    [
+                        expired_key
+                        for key in expired
+                        for expired_key in (key, f"{key}{PROFILE_SUFFIX}")
+                    ],
+                )
+                for key in expired:
+                    del retired[key]
+                self._write_retired(retired, prefix, bucket_name)
+
+            keys = [
+                key
+                for key in self.list_segments(prefix, bucket_name=bucket_name)
+                if key.startswith(f"{prefix}/segments/")
+            ]
+            if len(keys) < min_segments:
+                return 0
+
+            index = self._load_index(prefix, subset, bucket_name)
+            log_profile = self._load_log_profile(prefix, bucket_name)
+            report = MergeReport()
+            profile = DatasetProfile()
+            unreadable: List[str] = []
+            now = datetime.now(timezone.utc)
+            compacted_key = f"{prefix}/compacted/{now:%Y%m%dT%H%M%S%f}.parquet"
+            try:
+                rows = self.save_chunks_to(
+                    profile.observe(
+                        DataFactory.iter_merge(
+                            self._iter_objects(keys, bucket_name, unreadable),
+                            key=subset,
+                            index=index,
+                            report=report,
+                        )
+                    ),
+                    destination=compacted_key,
+                    bucket_name=bucket_name,
+                )
+            except NoRowsError:
+                # Every row was compacted before, only the segments are left over.
+                rows, compacted_key = 0, None
+            if rows is None:
+                # Neither the index nor the segments were touched, retried next run
+                logger.error(f"Error in compacting segments of {prefix}, kept them")
+                return 0
+            if compacted_key:
+                self.write_profile(profile, compacted_key, bucket_name=bucket_name)
+
+            self._put_object(
+                bucket_name,
+                key=f"{prefix}/index.parquet",
+                body=index.dumps(),
+                content_type=serializers.SERIALIZERS["parquet"].content_type,
+            )
+            if compacted_key:
+                log_profile.merge(profile)
+                self._write_log_profile(log_profile, prefix, bucket_name)
+
+            keys = [key for key in keys if key not in unreadable]
+            retired.update(dict.fromkeys(keys, time.time()))
+            self._write_retired(retired, prefix, bucket_name)
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in compacting segments: {e}")
+            return 0
+
+        logger.info(
+            f"Compacted {len(keys)} segments into {compacted_key}: "
+            f"{report.added} rows added, {report.dropped} duplicates dropped"
+        )
+        self.write_manifest(prefix, bucket_name=bucket_name)
+        return len(keys)
+
+    def _load_retired(self, prefix: str, bucket_name: str) -> Dict[str, float]:
+        """Segments merged by compaction but kept, with the time they were merged"""
+        try:
+            response = self.client.get_object(
+                Bucket=bucket_name, Key=f"{prefix}/retired.json"
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                raise
+            return {}
+        return json.loads(response["Body"].read())["segments"]
+
+    def _write_retired(
+        self, retired: Dict[str, float], prefix: str, bucket_name: str
+    ) -> None:
+        self._put_object(
+            bucket_name,
+            key=f"{prefix}/retired.json",
+            body=json.dumps({"segments": retired}, sort_keys=True).encode(),
+            content_type="application/json",
+        )
+
+    def _delete_objects(self, bucket_name: str, keys: List[str]) -> None:
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=bucket_name,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[start : start + 1000]],
+                    "Quiet": True,
+                },
+            )
+
+    def _acquire_lease(
+        self, bucket_name: str, key: str, ttl: float
+    ) -> Union[str, None]:
+        """Takes the lease stored at `key` unless another holder's is unexpired
+
+        The lease is created if absent and replaced if expired, both with
+        conditional writes, so only one of concurrent callers succeeds.
+
+        Returns:
+            Union[str, None]: ETag of the taken lease, None if it is held.
+        """
+        body = json.dumps({"expires_at": time.time() + ttl}).encode()
+        try:
+            response = self.client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=body,
+                ContentType="application/json",
+                IfNoneMatch="*",
+            )
+            return response["ETag"]
+        except ClientError as e:
+            if not _precondition_failed(e):
+                raise
+
+        try:
+            current = self.client.get_object(Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                raise
+            # Released and removed meanwhile, taken next time
+            return None
+        if json.loads(current["Body"].read())["expires_at"] > time.time():
+            return None
+        try:
+            response = self.client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=body,
+                ContentType="application/json",
+                IfMatch=current["ETag"],
+            )
+        except ClientError as e:
+            if not _precondition_failed(e):
+                raise
+            return None
+        return response["ETag"]
+
+    def _release_lease(self, bucket_name: str, key: str, etag: str) -> None:
+        """Expires the lease, unless it was taken over meanwhile"""
+        try:
+            self.client.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=json.dumps({"expires_at": 0}).encode(),
+                ContentType="application/json",
+                IfMatch=etag,
+            )
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Lease {key} couldn't be released, it expires: {e}")
+
+    def _iter_objects(
+        self, keys: List[str], bucket_name: str, unreadable: List[str]
+    ) -> Iterator[Any]:
+        """Yields the objects of `keys`, skipping (and listing) corrupt ones"""
+        for key in keys:
+            response = self.client.get_object(Bucket=bucket_name, Key=key)
+            data = response["Body"].read()
+            try:
+                serializer = serializers.detect(data, response.get("ContentType"))
+                with self._measure_serialization(serializer, "loads"):
+                    obj = serializer.loads(data)
+            except (pa.ArrowException, serializers.UnknownFormatError) as e:
+                logger.error(f"Skipping unreadable object {key}: {e}")
+                unreadable.append(key)
+                continue
+            yield obj
+
+    def _load_index(
+        self, prefix: str, subset: Optional[List[str]], bucket_name: str
+    ) -> HashIndex:
+        """Loads the hash index of a log, rebuilt from compacted segments if absent"""
+        try:
+            response = self.client.get_object(
+                Bucket=bucket_name, Key=f"{prefix}/index.parquet"
+            )
+            return HashIndex.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                raise
+
+        index = HashIndex()
+        parquet = serializers.SERIALIZERS["parquet"]
+        for key in self.list_segments(prefix, bucket_name=bucket_name):
+            if key.startswith(f"{prefix}/compacted/"):
+                response = self.client.get_object(Bucket=bucket_name, Key=key)
+                df = parquet.loads(response["Body"].read(), columns=subset)
+                index.add(HashIndex.hash_rows(df, subset))
+        logger.info(f"Rebuilt index of {prefix} with {len(index)} rows")
+        return index
+
+    def get_metadata(
+        self, source: str, bucket_name=None
+    ) -> Union[Dict[str, Any], None]:
+        """Metadata of an object (size, ETag, ...) or None if it doesn't exist"""
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            return get_metadata(self.client, bucket_name, source)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                logger.error(f"Error in reading metadata of {source}: {e}")
+            return None
+
+    def write_profile(
+        self, profile: DatasetProfile, source: str, bucket_name=None
+    ) -> bool:
+        """Stores the profile of an object next to it, as `<source>.profile.json`
+
+        The profile records the ETag of the object it was computed from, so
+        readers can tell if the object was replaced since.
+
+        Args:
+            profile (DatasetProfile): Profile of the object.
+            source (str): Key of the profiled object.
+            bucket_name (str, optional): Bucket name of the object. Defaults to None.
+                If not provided, a default name from the environment space will be used.
+
+        Returns:
+            bool: True if the profile was written.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            response = self.client.head_object(Bucket=bucket_name, Key=source)
+            profile.source = {"key": source, "etag": response["ETag"]}
+            self._put_object(
+                bucket_name,
+                key=f"{source}{PROFILE_SUFFIX}",
+                body=profile.dumps(),
+                content_type="application/json",
+            )
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in writing profile of {source}: {e}")
             return False
         return True
+
+    def read_profile(
+        self, source: str, bucket_name=None
+    ) -> Union[DatasetProfile, None]:
+        """Reads the stored profile of an object, None if there is none"""
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            with self._read_through(bucket_name, f"{source}{PROFILE_SUFFIX}") as path:
+                with open(path, "rb") as file:
+                    return DatasetProfile.loads(file.read())
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                logger.error(f"Error in reading profile of {source}: {e}")
+            return None
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit ratio and bytes saved by the local disk cache"""
+        if self._disk_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._disk_cache.stats()}
+
+    def read_log_profile(self, prefix: str, bucket_name=None) -> DatasetProfile:
+        """Reads the profile of a log, kept up to date by compaction
+
+        Rows appended since the last compaction aren't included yet.
+        """
+        if not bucket_name:
+            bucket_name = os.environ[EnvConfig.S3_BUCKET_NAME.value]
+
+        try:
+            return self._load_log_profile(prefix, bucket_name)
+        except (NoCredentialsError, ClientError) as e:
+            logger.error(f"Error in reading profile of {prefix}: {e}")
+            return DatasetProfile()
+
+    def _load_log_profile(self, prefix: str, bucket_name: str) -> DatasetProfile:
+        """Loads the profile of a log, merged from compacted segments if absent"""
+        try:
+            response = self.client.get_object(
+                Bucket=bucket_name, Key=f"{prefix}/profile.json"
+            )
+            return DatasetProfile.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey"):
+                raise
+
+        profile = DatasetProfile()
+        for key in self.list_segments(prefix, bucket_name=bucket_name):
+            if key.startswith(f"{prefix}/compacted/") and (
+                segment_profile := self.read_profile(key, bucket_name)
+            ):
+                profile.merge(segment_profile)
+        return profile
+
+    def _write_log_profile(
+        self, profile: DatasetProfile, prefix: str, bucket_name: str
+    ) -> None:
+        try:
+            self._put_object(
+                bucket_name,
+                key=f"{prefix}/profile.json",
+                body=profile.dumps(),
+                content_type="application/json",
+            )
+        except (NoCredentialsError, ClientError) as e:
+            # The summary lacks these rows until it is deleted and rebuilt
+            logger.error(f"Error in writing profile of {prefix}: {e}")
+
+
+def _precondition_failed(error: ClientError) -> bool:
+    """Whether a conditional write lost against another writer"""
+    return error.response.get("Error", {}).get("Code") in (
+        "PreconditionFailed",
+        "412",
+        "ConditionalRequestConflict",
+    )
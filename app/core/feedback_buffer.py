@@ -0,0 +1,251 @@
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.constants import EnvConfig
+from app.core.data_factory import DataFactory
+from app.core.dvc_client import DVCClient
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FEEDBACK_PREFIX = "feedback"
+# Feedback used to be rewritten into this single object on every request
+LEGACY_FEEDBACK_PATH = "retrain.joblib"
+
+
+class FeedbackBufferFull(Exception):
+    """Raised instead of buffering a row while flushes keep failing"""
+
+
+class FeedbackBuffer:
+    """Collects feedback rows in memory and writes them to S3 in bulk.
+
+    Rows are flushed as one segment of the feedback log every `flush_interval`
+    seconds (see `PeriodicTask`) or as soon as `max_rows` are buffered. Unless
+    the write-ahead log is disabled every row is also appended to a local file
+    before it is acknowledged, and replayed on startup if the process died before
+    the flush. Every buffer writes its own WAL files, locked for as long as it
+    lives, so processes sharing the path only replay the files of dead ones.
+    Replays may write a row twice, compaction deduplicates on task_id.
+    Rows of failed flushes stay buffered, new ones are refused once `max_pending`
+    rows are waiting.
+    """
+
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        """Returns the singleton instance or creates a new one if not existend"""
+        if cls._instance is None:
+            cls._instance = super(FeedbackBuffer, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self.prefix = FEEDBACK_PREFIX
+        self.max_rows = int(os.getenv(EnvConfig.FEEDBACK_BUFFER_MAX_ROWS.value, "500"))
+        self.flush_interval = float(
+            os.getenv(EnvConfig.FEEDBACK_BUFFER_FLUSH_INTERVAL_S.value, "5")
+        )
+        self.max_pending = int(
+            os.getenv(EnvConfig.FEEDBACK_BUFFER_MAX_PENDING_ROWS.value, "50000")
+        )
+        # An empty path disables the WAL, files of this buffer are named after
+        # its owner id and are locked through `<wal_path>.<owner>.lock`.
+        self.wal_base: Optional[str] = os.getenv(
+            EnvConfig.FEEDBACK_WAL_PATH.value,
+            os.path.join(tempfile.gettempdir(), "pipeline-api-feedback.wal"),
+        )
+        self.wal_path: Optional[str] = None
+        self._wal_lock = None
+        if self.wal_base:
+            owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self.wal_path = f"{self.wal_base}.{owner}"
+            self._wal_lock = open(f"{self.wal_path}.lock", "w")
+            fcntl.flock(self._wal_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushing: set = set()
+        self._stats = {
+            "flushes": 0,
+            "failed_flushes": 0,
+            "flushed_rows": 0,
+            "last_flush_at": None,
+        }
+        self._initialized = True
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: Dict[str, Any]) -> int:
+        """Buffers a row (blocking while it is written to the WAL)
+
+        Returns:
+            int: Number of rows buffered after adding the row.
+
+        Raises:
+            FeedbackBufferFull: `max_pending` rows are waiting to be flushed.
+        """
+        with self._lock:
+            if len(self._rows) >= self.max_pending:
+                raise FeedbackBufferFull(
+                    f"{len(self._rows)} feedback rows are waiting to be flushed"
+                )
+            if self.wal_path:
+                self._write_wal([row])
+            self._rows.append(row)
+            return len(self._rows)
+
+    async def put(self, row: Dict[str, Any]) -> int:
+        """Buffers a row and triggers a flush in the background once full"""
+        if self.wal_path:
+            depth = await asyncio.to_thread(self.add, row)
+        else:
+            depth = self.add(row)
+
+        if depth >= self.max_rows and not self._flushing:
+            task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.flush))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+        return depth
+
+    def flush(self) -> int:
+        """Writes all buffered rows as one segment of the feedback log
+
+        Returns:
+            int: Number of rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                pending_wal = self._rotate_wal() if rows else None
+            if not rows:
+                return 0
+
+            segment = None
+            try:
+                df = DataFactory.from_records(rows)
+                if df is not None:
+                    segment = DVCClient().append_segment(
+                        df, prefix=self.prefix, segment_id=uuid.uuid4().hex
+                    )
+            except Exception:
+                # Whatever failed, the rows go back into the buffer
+                logger.exception("Feedback segment couldn't be written")
+
+            if segment is None:
+                self._stats["failed_flushes"] += 1
+                logger.error(f"Flushing {len(rows)} feedback rows failed, retrying")
+                with self._lock:
+                    if self.wal_path:
+                        self._write_wal(rows)
+                    self._rows = rows + self._rows
+            else:
+                self._stats["flushes"] += 1
+                self._stats["flushed_rows"] += len(rows)
+                self._stats["last_flush_at"] = time.time()
+                logger.info(f"Flushed {len(rows)} feedback rows to {segment}")
+
+            if pending_wal:
+                os.remove(pending_wal)
+            return len(rows) if segment else 0
+
+    async def close(self) -> None:
+        """Waits for running flushes and writes what is left"""
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+        await asyncio.to_thread(self.flush)
+        # Rows that couldn't be flushed are left to the next process
+        if self._wal_lock is not None:
+            self._wal_lock.close()
+
+    def recover(self) -> int:
+        """Loads rows from WAL files left behind by processes that died
+
+        WAL files of buffers that are still alive (their lock is held) are left
+        alone.
+
+        Returns:
+            int: Number of recovered rows.
+        """
+        if not self.wal_path:
+            return 0
+
+        recovered = 0
+        for lock_path in sorted(glob.glob(f"{glob.escape(self.wal_base)}.*.lock")):
+            wal_path = lock_path[: -len(".lock")]
+            if wal_path == self.wal_path:
+                continue
+            try:
+                lock = open(lock_path, "r")
+            except FileNotFoundError:
+                # Recovered by another process meanwhile
+                continue
+            with lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                recovered += self._replay(wal_path)
+                os.remove(lock_path)
+        return recovered
+
+    def _replay(self, wal_path: str) -> int:
+        """Moves the rows of the WAL files of a dead buffer into this one"""
+        paths = [wal_path] if os.path.exists(wal_path) else []
+        paths += sorted(glob.glob(f"{glob.escape(wal_path)}.*.flushing"))
+        rows = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as wal:
+                rows.extend(json.loads(line) for line in wal if line.strip())
+
+        # Rows are persisted in the WAL of this buffer before the old files are
+        # removed, so a crash during recovery can only duplicate rows.
+        with self._lock:
+            if rows:
+                self._write_wal(rows)
+            self._rows = rows + self._rows
+        for path in paths:
+            os.remove(path)
+        if rows:
+            logger.info(f"Recovered {len(rows)} feedback rows from {wal_path}")
+        return len(rows)
+
+    def _write_wal(self, rows: List[Dict[str, Any]]) -> None:
+        with open(str(self.wal_path), "a", encoding="utf-8") as wal:
+            wal.writelines(json.dumps(row) + "\n" for row in rows)
+            wal.flush()
+            os.fsync(wal.fileno())
+
+    def _rotate_wal(self) -> Optional[str]:
+        """Moves the WAL aside so rows arriving during the flush go to a new one"""
+        if not self.wal_path or not os.path.exists(self.wal_path):
+            return None
+        pending = f"{self.wal_path}.{uuid.uuid4().hex}.flushing"
+        os.replace(self.wal_path, pending)
+        return pending
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer depth and flush figures since startup"""
+        return {
+            **self._stats,
+            "depth": len(self._rows),
+            "max_rows": self.max_rows,
+            "max_pending": self.max_pending,
+            "flush_interval_s": self.flush_interval,
+            "wal_enabled": bool(self.wal_path),
+        }
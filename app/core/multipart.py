@@ -0,0 +1,310 @@
+import io
+import logging
+import re
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import IO, Any, Deque, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+
+
+class MultipartWriter(io.RawIOBase):
+    """Write-only file object streaming its content to S3 as a multipart upload.
+
+    Parts are uploaded on `executor` while writing goes on, at most
+    `max_inflight` at a time, so memory is bounded by `max_inflight + 1` parts.
+    Without an executor, parts are uploaded one after the other. Objects smaller
+    than a part are sent with a single `put_object`. The object only becomes
+    visible once the writer is closed; `abort` discards everything uploaded so
+    far. A hashlib `digest` passed in is updated with every byte written.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        key: str,
+        part_size: int = 8 * 1024 * 1024,
+        extra_args: Optional[Dict[str, Any]] = None,
+        digest=None,
+        executor: Optional[Executor] = None,
+        max_inflight: int = 1,
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.extra_args = extra_args or {}
+        self.digest = digest
+        self.executor = executor
+        self.max_inflight = max(max_inflight, 1)
+        self.bytes_written = 0
+
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Dict[str, Any]] = []
+        self._inflight: Deque[Future] = deque()
+        self._aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("write to closed MultipartWriter")
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        if self.digest is not None:
+            self.digest.update(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def _submit_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, **self.extra_args
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + len(self._inflight) + 1
+        if self.executor is None:
+            self._parts.append(self._upload_part(part_number, data))
+            return
+
+        while len(self._inflight) >= self.max_inflight:
+            self._parts.append(self._inflight.popleft().result())
+        self._inflight.append(
+            self.executor.submit(self._upload_part, part_number, data)
+        )
+
+    def _upload_part(self, part_number: int, data: bytes) -> Dict[str, Any]:
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    def close(self) -> None:
+        """Uploads the remaining bytes and completes the upload"""
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                self._complete()
+        finally:
+            super().close()
+
+    def _complete(self) -> None:
+        if self._upload_id is None:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self._buffer),
+                **self.extra_args,
+            )
+        else:
+            if self._buffer:
+                self._submit_part(bytes(self._buffer))
+            while self._inflight:
+                self._parts.append(self._inflight.popleft().result())
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer.clear()
+        logger.info(f"Streamed {self.bytes_written} bytes to {self.key}")
+
+    def abort(self) -> None:
+        """Discards the upload, nothing becomes visible under the key"""
+        self._aborted = True
+        self._buffer.clear()
+        while self._inflight:
+            future = self._inflight.popleft()
+            if not future.cancel():
+                # Running uploads must finish before the upload can be aborted.
+                future.exception()
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+        self.close()
+
+
+def download_ranges(
+    client,
+    bucket: str,
+    key: str,
+    file: IO[bytes],
+    part_size: int = 8 * 1024 * 1024,
+    executor: Optional[Executor] = None,
+    max_inflight: int = 1,
+    if_none_match: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Downloads an object into a file with parallel ranged GETs
+
+    The first range also yields size and ETag of the object, the others are
+    requested on `executor`, at most `max_inflight` at a time, and pinned to that
+    ETag so a concurrent overwrite can't mix two versions. Ranges are written at
+    their offset as they arrive, memory is bounded by the parts in flight.
+
+    Args:
+        client: boto3 S3 client.
+        bucket (str): Bucket of the object.
+        key (str): Key of the object.
+        file (IO[bytes]): Seekable, writable file to download into.
+        part_size (int, optional): Bytes per ranged GET. Defaults to 8 MiB.
+        executor (Executor, optional): Runs the ranged GETs after the first one.
+            Defaults to None (sequential).
+        max_inflight (int, optional): Ranges requested at once. Defaults to 1.
+        if_none_match (str, optional): Skip the download if the object still has
+            this ETag.
+
+    Returns:
+        Optional[Dict[str, Any]]: ETag, ContentType and ContentLength of the
+            object or None if it matched `if_none_match`.
+    """
+    conditions = {"IfNoneMatch": if_none_match} if if_none_match else {}
+    try:
+        response = client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes=0-{part_size - 1}", **conditions
+        )
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("304", "NotModified"):
+            return None
+        if code != "InvalidRange":
+            raise
+        # Empty objects have no byte range
+        response = client.get_object(Bucket=bucket, Key=key, **conditions)
+
+    size = _object_size(response)
+    etag = response["ETag"]
+    file.seek(0)
+    file.write(response["Body"].read())
+
+    def get_range(start: int) -> Tuple[int, bytes]:
+        end = min(start + part_size, size) - 1
+        part = client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag
+        )
+        return start, part["Body"].read()
+
+    inflight: Deque[Future] = deque()
+    try:
+        for start in range(part_size, size, part_size):
+            if executor is None:
+                _write_at(file, *get_range(start))
+                continue
+            while len(inflight) >= max(max_inflight, 1):
+                _write_at(file, *inflight.popleft().result())
+            inflight.append(executor.submit(get_range, start))
+        while inflight:
+            _write_at(file, *inflight.popleft().result())
+    finally:
+        for future in inflight:
+            future.cancel()
+
+    file.truncate(size)
+    return {
+        "ETag": etag,
+        "ContentType": response.get("ContentType"),
+        "ContentLength": size,
+    }
+
+
+def _object_size(response: Dict[str, Any]) -> int:
+    if match := CONTENT_RANGE.match(response.get("ContentRange") or ""):
+        return int(match.group(3))
+    return response["ContentLength"]
+
+
+def _write_at(file: IO[bytes], offset: int, data: bytes) -> None:
+    file.seek(offset)
+    file.write(data)
+
+
+class RangeReader(io.RawIOBase):
+    """Read-only, seekable file object over an S3 object, read by ranged GETs
+
+    Lets readers of formats with an index, like Parquet, fetch only the byte
+    ranges they need instead of the whole object. Reads are pinned to the ETag
+    the object had when the reader was opened. Reads shorter than `min_request`
+    are extended to it and the rest is kept for the next read.
+    """
+
+    def __init__(
+        self, client, bucket: str, key: str, min_request: int = 1024 * 1024
+    ) -> None:
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.min_request = min_request
+        self.requests = 0
+
+        head = client.head_object(Bucket=bucket, Key=key)
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"]
+        self.content_type = head.get("ContentType")
+        self._position = 0
+        self._cache_start = 0
+        self._cache = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        end = min(self._position + len(view), self.size)
+        if end <= self._position:
+            return 0
+
+        cache_end = self._cache_start + len(self._cache)
+        if not self._cache_start <= self._position < end <= cache_end:
+            request_end = min(max(end, self._position + self.min_request), self.size)
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Range=f"bytes={self._position}-{request_end - 1}",
+                IfMatch=self.etag,
+            )
+            self.requests += 1
+            self._cache_start, self._cache = self._position, response["Body"].read()
+
+        offset = self._position - self._cache_start
+        count = end - self._position
+        view[:count] = self._cache[offset : offset + count]
+        self._position = end
+        return count
@@ -0,0 +1,68 @@
+"""Compact encoding of model inputs in task payloads.
+
+Values of categorical columns (the `Literal` fields of the request schemas) are
+replaced by their index in the categories of the column. The categories form a
+codebook versioned by the hash of its content, stored in the bucket as
+`codebooks/<version>.json` for workers to decode with; encoded payloads name the
+version in `codebook`.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from app.core.dataset_schema import CATEGORY, DatasetSchema
+
+
+CODEBOOK_PREFIX = "codebooks/"
+
+
+class PayloadCodec:
+    def __init__(self, schema: DatasetSchema) -> None:
+        self.codebook: Dict[str, List[str]] = {
+            name: list(column.categories)
+            for name, column in schema.columns.items()
+            if column.kind == CATEGORY
+        }
+        self.content = json.dumps(
+            self.codebook, sort_keys=True, separators=(",", ":")
+        ).encode()
+        self.version = hashlib.sha256(self.content).hexdigest()[:16]
+        self._codes = {
+            name: {value: code for code, value in enumerate(categories)}
+            for name, categories in self.codebook.items()
+        }
+
+    @property
+    def key(self) -> str:
+        return f"{CODEBOOK_PREFIX}{self.version}.json"
+
+    def encode(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Encodes the columns of a single row (values) or of a batch (lists)
+
+        Values outside the categories are kept as they are.
+        """
+        encoded = dict(data)
+        for name, codes in self._codes.items():
+            if name not in data:
+                continue
+            value = data[name]
+            if isinstance(value, list):
+                encoded[name] = [codes.get(item, item) for item in value]
+            else:
+                encoded[name] = codes.get(value, value)
+        return encoded
+
+    def decode(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        decoded = dict(data)
+        for name, categories in self.codebook.items():
+            if name not in data:
+                continue
+            value = data[name]
+            if isinstance(value, list):
+                decoded[name] = [
+                    categories[item] if type(item) is int else item for item in value
+                ]
+            elif type(value) is int:
+                decoded[name] = categories[value]
+        return decoded
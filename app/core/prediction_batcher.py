@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.constants import EnvConfig
+from app.core.admission import PREDICTION, AdmissionRejected
+from app.core.celery_client import CeleryClient
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BATCH_TASK = "workflows.make_batch_prediction"
+ROW_SEPARATOR = ":"
+
+
+def compose_task_id(batch_task_id: str, index: int) -> str:
+    """Builds the id under which a single row of a batch task can be looked up"""
+    return f"{batch_task_id}{ROW_SEPARATOR}{index}"
+
+
+def split_task_id(task_id: str) -> Tuple[str, Optional[int]]:
+    """Splits an id built by `compose_task_id` into batch task id and row index"""
+    batch_task_id, separator, index = task_id.rpartition(ROW_SEPARATOR)
+    if not separator or not index.isdigit():
+        return task_id, None
+    return batch_task_id, int(index)
+
+
+def select_row(result: Any, index: Optional[int]) -> Any:
+    """Picks the entry of a row out of a batch task result (one entry per row)"""
+    if index is None or not isinstance(result, (list, tuple)):
+        return result
+    return result[index] if index < len(result) else None
+
+
+class PredictionBatcher:
+    """Coalesces single predictions into one batch task per time window.
+
+    Rows are collected until either the window elapses or the batch is full, and
+    dispatched as one columnar `workflows.make_batch_prediction` task. Every caller
+    receives the row id (`<task_id>:<index>`) of its own prediction.
+    """
+
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        """Returns the singleton instance or creates a new one if not existend"""
+        if cls._instance is None:
+            cls._instance = super(PredictionBatcher, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self.window = (
+            float(os.getenv(EnvConfig.PREDICTION_BATCH_WINDOW_MS.value, "0")) / 1000
+        )
+        self.max_size = int(os.getenv(EnvConfig.PREDICTION_BATCH_MAX_SIZE.value, "64"))
+        self.lane = PREDICTION
+
+        self._pending: List[Tuple[Dict, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatching: set = set()
+        self._stats = {
+            "batches": 0,
+            "rows": 0,
+            "failed_batches": 0,
+            "max_batch_size": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+        self._initialized = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, row: Dict) -> str:
+        """Queues a single row and waits until its batch was dispatched
+
+        Args:
+            row (Dict): Model input as dumped by `UserInputRequest.model_dump`.
+
+        Returns:
+            str: Row id of the prediction, resolvable through `split_task_id`.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future, time.monotonic()))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Dict, asyncio.Future, float]]) -> None:
+        dispatched_at = time.monotonic()
+        rows = [row for row, _, _ in batch]
+        columns = {column: [row[column] for row in rows] for column in rows[0]}
+
+        self._record(batch, dispatched_at)
+        try:
+            batch_task_id = await CeleryClient().start_workflow(
+                name=BATCH_TASK,
+                lane=self.lane,
+                body=CeleryClient().model_inputs(columns, size=len(rows)),
+                wait=True,
+            )
+        except Exception as e:
+            self._stats["failed_batches"] += 1
+            if isinstance(e, AdmissionRejected):
+                logger.warning(f"Batch of {len(rows)} predictions rejected: {e}")
+            else:
+                logger.exception(f"Dispatching batch of {len(rows)} predictions failed")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.info(f"Dispatched {len(rows)} predictions as task {batch_task_id}")
+        for index, (_, future, _) in enumerate(batch):
+            if not future.done():
+                future.set_result(compose_task_id(batch_task_id, index))
+
+    def _record(self, batch: List[Tuple[Dict, asyncio.Future, float]], now: float):
+        waits = [(now - enqueued_at) * 1000 for _, _, enqueued_at in batch]
+        self._stats["batches"] += 1
+        self._stats["rows"] += len(batch)
+        self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+        self._stats["total_wait_ms"] += sum(waits)
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], max(waits))
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queueing delay figures since startup"""
+        stats = dict(self._stats)
+        batches, rows = stats["batches"], stats["rows"]
+        stats["enabled"] = self.enabled
+        stats["pending"] = len(self._pending)
+        stats["mean_batch_size"] = rows / batches if batches else 0.0
+        stats["mean_wait_ms"] = stats.pop("total_wait_ms") / rows if rows else 0.0
+        return stats
+
+    async def close(self) -> None:
+        """Dispatches what is still queued and waits for in-flight dispatches"""
+        self._flush()
+        if self._dispatching:
+            await asyncio.gather(*self._dispatching, return_exceptions=True)
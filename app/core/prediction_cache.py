@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from celery import states
+
+from app.constants import EnvConfig
+from app.core.cache import MISSING, TTLCache
+from app.core.celery_client import CeleryClient
+from app.core.prediction_batcher import split_task_id
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Orchestrator of training runs, its reply names the training task
+TRAINING_WORKFLOW = "workflows.model_training"
+
+
+class PredictionCache:
+    """Maps model inputs to the task holding their prediction.
+
+    Keys are the SHA-256 of the canonical JSON of the input plus the model
+    version, so identical inputs share one prediction task: finished ones are
+    answered from the result backend, running ones are joined instead of
+    dispatching a duplicate. The model version is bumped, and the cache cleared,
+    whenever a training run succeeds, no matter who started it: workers report
+    every training workflow they receive as a task event. Without task events
+    only runs started by this process are noticed (by polling), predictions of
+    other models expire after `ttl` seconds.
+    """
+
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        """Returns the singleton instance or creates a new one if not existend"""
+        if cls._instance is None:
+            cls._instance = super(PredictionCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self.ttl = float(os.getenv(EnvConfig.PREDICTION_CACHE_TTL_S.value, "3600"))
+        self.model_version = 0
+        self.training_check_interval = 5.0
+
+        self._entries = TTLCache(
+            maxsize=int(os.getenv(EnvConfig.PREDICTION_CACHE_SIZE.value, "10000"))
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._workflows: set = set()
+        self._training_tasks: set = set()
+        self._lock = threading.Lock()
+        self._training_checked_at = 0.0
+        self._stats = {"coalesced": 0, "invalidations": 0}
+        self._initialized = True
+
+    @property
+    def enabled(self) -> bool:
+        return self._entries.maxsize > 0
+
+    def key(self, features: Dict[str, Any]) -> str:
+        canonical = json.dumps(features, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{self.model_version}|{canonical}".encode()).hexdigest()
+
+    async def get_or_dispatch(
+        self, features: Dict[str, Any], dispatch: Callable[[], Awaitable[str]]
+    ) -> Tuple[str, bool]:
+        """Returns the task id of a matching prediction or dispatches a new one
+
+        Args:
+            features (Dict[str, Any]): Model input as dumped by `UserInputRequest`.
+            dispatch (Callable[[], Awaitable[str]]): Starts the prediction and
+                returns the id of the task carrying its result.
+
+        Returns:
+            Tuple[str, bool]: Task id and whether it was served from the cache.
+        """
+        if not self.enabled:
+            return await dispatch(), False
+
+        await self._refresh_training_state()
+        key = self.key(features)
+
+        if (task_id := await self._lookup(key)) is not None:
+            return task_id, True
+        while (inflight := self._inflight.get(key)) is not None:
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight), True
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The request dispatching it was cancelled, one of its waiters
+                # dispatches instead.
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            task_id = await dispatch()
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so waiters-less failures don't log "never retrieved"
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(task_id)
+        self._entries.set(key, task_id, ttl=self.ttl)
+        return task_id, False
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        if (task_id := self._entries.get(key)) is MISSING:
+            return None
+
+        status, _ = await CeleryClient().get_state_async(split_task_id(task_id)[0])
+        if status in (states.FAILURE, states.REVOKED):
+            self._entries.pop(key)
+            return None
+        return task_id
+
+    def track_workflow(self, workflow_id: str) -> None:
+        """Remembers a training workflow, its training task is tracked once known"""
+        with self._lock:
+            self._workflows.add(workflow_id)
+
+    def track_training(self, task_id: str) -> None:
+        """Remembers a training task, the cache is invalidated once it succeeded"""
+        with self._lock:
+            self._training_tasks.add(task_id)
+
+    def on_task_received(self, task_id: str, name: str) -> None:
+        """Task event callback, see `TaskEventListener.subscribe_received`"""
+        if name == TRAINING_WORKFLOW:
+            self.track_workflow(task_id)
+
+    def on_task_finished(self, task_id: str, status: str) -> None:
+        """Task event callback, see `TaskEventListener.subscribe`"""
+        with self._lock:
+            workflow = task_id in self._workflows
+            training = task_id in self._training_tasks
+            self._workflows.discard(task_id)
+            self._training_tasks.discard(task_id)
+        if status != states.SUCCESS:
+            return
+        if workflow:
+            reply = CeleryClient().get_result(task_id)
+            if isinstance(reply, dict) and reply.get("result_task_id"):
+                self.track_training(reply["result_task_id"])
+        if training:
+            self.invalidate()
+
+    async def _refresh_training_state(self) -> None:
+        """Polls tracked training tasks, in case no task events are received"""
+        now = time.monotonic()
+        with self._lock:
+            task_ids = [*self._workflows, *self._training_tasks]
+        if (
+            not task_ids
+            or now - self._training_checked_at < self.training_check_interval
+        ):
+            return
+        self._training_checked_at = now
+
+        task_states = await CeleryClient().get_states_async(task_ids)
+        for task_id, (status, _) in task_states.items():
+            if status in states.READY_STATES:
+                await asyncio.to_thread(self.on_task_finished, task_id, status)
+
+    def invalidate(self) -> None:
+        self.model_version += 1
+        self._entries.clear()
+        self._stats["invalidations"] += 1
+        logger.info(f"Prediction cache invalidated, model version {self.model_version}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._entries.stats(),
+            **self._stats,
+            "model_version": self.model_version,
+            "tracked_workflows": len(self._workflows),
+            "tracked_trainings": len(self._training_tasks),
+        }
@@ -0,0 +1,252 @@
+"""Bounded, mergeable summaries of datasets.
+
+A profile holds, per column, the number of missing values and either the
+counts of the most frequent values or a quantile sketch. Its size doesn't depend
+on the number of rows, and profiles of parts of a dataset can be merged into the
+profile of the whole, so datasets are profiled once while they are written and
+appended rows only add to the existing profile.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.core.dataset_schema import CATEGORY, DatasetSchema
+
+
+Frame = TypeVar("Frame", pd.DataFrame, pa.Table)
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class NumericSketch:
+    """Approximate distribution of a numeric column as weighted centroids
+
+    Values are summarized by at most `max_centroids` centroids, which hold fewer
+    values towards both tails, so extreme quantiles stay accurate. Min, max,
+    count and mean are exact.
+    """
+
+    def __init__(self, max_centroids: int = 100) -> None:
+        self.max_centroids = max_centroids
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+
+    def update(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(
+            np.concatenate([self._means, values]),
+            np.concatenate([self._weights, np.ones(len(values))]),
+        )
+
+    def merge(self, other: "NumericSketch") -> None:
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self._means, other._means]),
+            np.concatenate([self._weights, other._weights]),
+        )
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means)
+        means, weights = means[order], weights[order]
+        if len(means) <= self.max_centroids:
+            self._means, self._weights = means, weights
+            return
+
+        # Centroids are binned by the quantile of their middle on the arcsine
+        # scale of t-digest, bins are finer at the tails than around the median.
+        quantiles = (np.cumsum(weights) - weights / 2) / weights.sum()
+        scaled = np.arcsin(2 * quantiles - 1) / np.pi + 0.5
+        bins = np.minimum(
+            (scaled * self.max_centroids).astype(int), self.max_centroids - 1
+        )
+        binned = np.bincount(bins, weights=weights)
+        keep = binned > 0
+        self._means = (np.bincount(bins, weights=means * weights)[keep]) / binned[keep]
+        self._weights = binned[keep]
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        # Each centroid stands for the middle of the weight it covers.
+        positions = (np.cumsum(self._weights) - self._weights / 2) / self.count
+        return float(
+            np.interp(
+                q,
+                np.concatenate([[0.0], positions, [1.0]]),
+                np.concatenate([[self.min], self._means, [self.max]]),
+            )
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "centroids": [self._means.tolist(), self._weights.tolist()],
+        }
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], max_centroids: int = 100
+    ) -> "NumericSketch":
+        sketch = cls(max_centroids)
+        sketch.count = data["count"]
+        sketch.total = data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        sketch._means = np.asarray(data["centroids"][0], dtype=float)
+        sketch._weights = np.asarray(data["centroids"][1], dtype=float)
+        return sketch
+
+
+class DatasetProfile:
+    """Row count plus missing values and a bounded summary per column
+
+    Columns typed as categorical by `schema`, or holding non-numeric values, are
+    summarized by the counts of their `max_categories` most frequent values, less
+    frequent ones are counted as `other`. Numeric columns get a `NumericSketch`.
+    """
+
+    def __init__(
+        self, schema: Optional[DatasetSchema] = None, max_categories: int = 100
+    ) -> None:
+        self.schema = schema
+        self.max_categories = max_categories
+        self.rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {}
+        # Identifies the profiled object, e.g. by its ETag
+        self.source: Dict[str, Any] = {}
+
+    def update(self, data: Union[pd.DataFrame, pa.Table]) -> "DatasetProfile":
+        names = data.column_names if isinstance(data, pa.Table) else list(data.columns)
+        for name in names:
+            series = (
+                data.column(name).to_pandas()
+                if isinstance(data, pa.Table)
+                else data[name]
+            )
+            column = self.columns.setdefault(name, {"nulls": 0})
+            nulls = int(series.isna().sum())
+            column["nulls"] += nulls
+            if nulls == len(series):
+                continue
+
+            if "sketch" in column or (
+                "counts" not in column and self._is_numeric(name, series)
+            ):
+                values = pd.to_numeric(series, errors="coerce")
+                sketch = column.setdefault("sketch", NumericSketch())
+                sketch.update(values.to_numpy(dtype="float64"))
+            else:
+                counts = series.value_counts()
+                self._add_counts(
+                    column,
+                    {str(value): count for value, count in counts.items() if count},
+                )
+        self.rows += len(data)
+        return self
+
+    def observe(self, chunks: Iterable[Frame]) -> Iterator[Frame]:
+        """Passes chunks on, profiling them on the way"""
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def merge(self, other: "DatasetProfile") -> "DatasetProfile":
+        self.rows += other.rows
+        for name, theirs in other.columns.items():
+            column = self.columns.setdefault(name, {"nulls": 0})
+            column["nulls"] += theirs["nulls"]
+            if "sketch" in theirs:
+                sketch = column.setdefault("sketch", NumericSketch())
+                sketch.merge(theirs["sketch"])
+            elif "counts" in theirs:
+                self._add_counts(column, theirs["counts"], theirs.get("other", 0))
+        return self
+
+    def _is_numeric(self, name: str, series: pd.Series) -> bool:
+        if self.schema is not None and name in self.schema.columns:
+            return self.schema.columns[name].kind != CATEGORY
+        return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(
+            series
+        )
+
+    def _add_counts(
+        self, column: Dict[str, Any], counts: Dict[str, int], other: int = 0
+    ) -> None:
+        merged = column.setdefault("counts", {})
+        for value, count in counts.items():
+            merged[value] = merged.get(value, 0) + int(count)
+        column["other"] = column.get("other", 0) + other
+
+        if len(merged) > self.max_categories:
+            ranked = sorted(merged.items(), key=lambda item: item[1], reverse=True)
+            column["counts"] = dict(ranked[: self.max_categories])
+            column["other"] += sum(count for _, count in ranked[self.max_categories :])
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON serializable summary with quantiles instead of sketches"""
+        columns: Dict[str, Any] = {}
+        for name, column in self.columns.items():
+            if "sketch" in column:
+                sketch: NumericSketch = column["sketch"]
+                columns[name] = {
+                    "nulls": column["nulls"],
+                    "min": sketch.min if sketch.count else None,
+                    "max": sketch.max if sketch.count else None,
+                    "mean": sketch.total / sketch.count if sketch.count else None,
+                    "quantiles": {str(q): sketch.quantile(q) for q in QUANTILES},
+                }
+            else:
+                columns[name] = {
+                    "nulls": column["nulls"],
+                    "counts": column.get("counts", {}),
+                    "other": column.get("other", 0),
+                }
+        return {"rows": self.rows, "columns": columns}
+
+    def dumps(self) -> bytes:
+        columns = {
+            name: {
+                key: value.to_dict() if isinstance(value, NumericSketch) else value
+                for key, value in column.items()
+            }
+            for name, column in self.columns.items()
+        }
+        return json.dumps(
+            {"source": self.source, "rows": self.rows, "columns": columns}
+        ).encode()
+
+    @classmethod
+    def loads(
+        cls, data: bytes, schema: Optional[DatasetSchema] = None
+    ) -> "DatasetProfile":
+        stored = json.loads(data)
+        profile = cls(schema)
+        profile.source = stored.get("source", {})
+        profile.rows = stored["rows"]
+        for name, column in stored["columns"].items():
+            if "sketch" in column:
+                column["sketch"] = NumericSketch.from_dict(column["sketch"])
+            profile.columns[name] = column
+        return profile
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class PeriodicTask:
+    """Runs a blocking function in a worker thread every `interval` seconds.
+
+    Meant to be started and stopped from the application lifespan. Errors are
+    logged and don't stop the schedule.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], object]):
+        self.name = name
+        self.interval = interval
+        self._func = func
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"Started periodic task {self.name} every {self.interval}s")
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    async def run_once(self) -> None:
+        try:
+            await asyncio.to_thread(self._func)
+        except Exception:
+            logger.exception(f"Periodic task {self.name} failed")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,180 @@
+"""Serialization formats used to store objects in S3.
+
+DataFrames are stored as Parquet (zstd compressed), everything else falls back to
+joblib. When reading, the format is detected from the stored content type or the
+leading bytes of the object, so objects written before Parquet was introduced
+keep loading. Objects in neither format are rejected with `UnknownFormatError`.
+"""
+
+import io
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import IO, Any, List, Optional, Union
+
+import joblib
+import pandas as pd
+
+from app.constants import EnvConfig
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PARQUET_MAGIC = b"PAR1"
+# Pickles (protocol 2+) and the compressors joblib supports: zlib, gzip, bz2, xz,
+# lzma and lz4
+JOBLIB_MAGICS = (
+    b"\x80",
+    b"x\x01",
+    b"x^",
+    b"x\x9c",
+    b"x\xda",
+    b"\x1f\x8b",
+    b"BZh",
+    b"\xfd7zXZ",
+    b"]\x00\x00",
+    b'\x04"M\x18',
+)
+
+
+class UnknownFormatError(Exception):
+    """Raised for objects none of the serializers wrote"""
+
+
+class Serializer(ABC):
+    name: str
+    content_type: str
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes: ...
+
+    @abstractmethod
+    def loads(
+        self,
+        data: bytes,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Any: ...
+
+    def load_file(
+        self,
+        file: Union[str, IO[bytes]],
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Any:
+        """Like `loads`, reading from a local path or a file object"""
+        if isinstance(file, str):
+            with open(file, "rb") as opened:
+                return self.loads(opened.read(), columns=columns, filters=filters)
+        return self.loads(file.read(), columns=columns, filters=filters)
+
+
+class JoblibSerializer(Serializer):
+    name = "joblib"
+    content_type = "application/x-joblib"
+
+    def dumps(self, obj: Any) -> bytes:
+        buffer = io.BytesIO()
+        joblib.dump(obj, buffer)
+        return buffer.getvalue()
+
+    def loads(
+        self,
+        data: bytes,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Any:
+        return self._select(joblib.load(io.BytesIO(data)), columns)
+
+    def load_file(
+        self,
+        file: Union[str, IO[bytes]],
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Any:
+        # Unpickled from the file, without a copy of its content in memory
+        return self._select(joblib.load(file), columns)
+
+    @staticmethod
+    def _select(obj: Any, columns: Optional[List[str]]) -> Any:
+        if columns is not None and isinstance(obj, pd.DataFrame):
+            obj = obj[columns]
+        return obj
+
+
+class ParquetSerializer(Serializer):
+    """Columnar storage for DataFrames
+
+    Reads can be limited to `columns` and to the row groups matching `filters`
+    (pyarrow DNF filter expressions, e.g. [("age", ">", 30)]).
+    """
+
+    name = "parquet"
+    content_type = "application/vnd.apache.parquet"
+
+    def __init__(self, compression: str = "zstd", row_group_size: int = 100_000):
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def dumps(self, obj: Any) -> bytes:
+        buffer = io.BytesIO()
+        obj.to_parquet(
+            buffer,
+            engine="pyarrow",
+            compression=self.compression,
+            index=False,
+            row_group_size=self.row_group_size,
+        )
+        return buffer.getvalue()
+
+    def loads(
+        self,
+        data: bytes,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Any:
+        return pd.read_parquet(
+            io.BytesIO(data), engine="pyarrow", columns=columns, filters=filters
+        )
+
+    def load_file(
+        self,
+        file: Union[str, IO[bytes]],
+        columns: Optional[List[str]] = None,
+        filters: Optional[List] = None,
+    ) -> Any:
+        # Local paths are memory-mapped, seekable file objects are read by range;
+        # either way only the selected columns and row groups are read.
+        return pd.read_parquet(
+            file, engine="pyarrow", columns=columns, filters=filters, memory_map=True
+        )
+
+
+SERIALIZERS = {
+    serializer.name: serializer
+    for serializer in (JoblibSerializer(), ParquetSerializer())
+}
+
+
+def for_object(obj: Any) -> Serializer:
+    """Picks the serializer to store an object with"""
+    if isinstance(obj, pd.DataFrame):
+        return SERIALIZERS[os.getenv(EnvConfig.DATAFRAME_FORMAT.value, "parquet")]
+    return SERIALIZERS["joblib"]
+
+
+def detect(data: bytes, content_type: Optional[str] = None) -> Serializer:
+    """Finds the serializer an object was stored with
+
+    Raises:
+        UnknownFormatError: Neither the content type nor the leading bytes match.
+    """
+    for serializer in SERIALIZERS.values():
+        if content_type == serializer.content_type:
+            return serializer
+    if data[:4] == PARQUET_MAGIC:
+        return SERIALIZERS["parquet"]
+    if data.startswith(JOBLIB_MAGICS):
+        return SERIALIZERS["joblib"]
+    raise UnknownFormatError(f"Unknown format starting with {bytes(data[:4])!r}")
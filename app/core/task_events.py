@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from celery import states
+
+from app.constants import EnvConfig
+from app.core.celery_client import CeleryClient
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+FINAL_EVENTS = {
+    "task-succeeded": states.SUCCESS,
+    "task-failed": states.FAILURE,
+    "task-revoked": states.REVOKED,
+}
+
+
+class TaskEventListener:
+    """Pushes task completions to waiting requests.
+
+    A single daemon thread per process consumes the Celery event stream (the
+    client enables `worker_send_task_events`) and resolves the futures of every
+    request waiting for the finished task. Without a running consumer, waiting
+    falls back to polling the (cached) result backend.
+    """
+
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        """Returns the singleton instance or creates a new one if not existend"""
+        if cls._instance is None:
+            cls._instance = super(TaskEventListener, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self.enabled = os.getenv(EnvConfig.TASK_EVENTS_ENABLED.value, "true") == "true"
+        self.poll_interval = 0.5
+        # Longest wait for events before the stop flag is checked again
+        self.capture_timeout = 1.0
+
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, Any]]] = {}
+        self._callbacks: List[Callable[[str, str], None]] = []
+        self._received_callbacks: List[Callable[[str, str], None]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._receiver = None
+        self._stopped = threading.Event()
+        self._connected = threading.Event()
+        self._stats = {"events": 0, "notified": 0, "reconnects": 0}
+        self._initialized = True
+
+    @property
+    def alive(self) -> bool:
+        return self._connected.is_set()
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._consume, name="task-events", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops consuming, waiting at most `timeout` seconds for the thread"""
+        self._stopped.set()
+        if self._receiver is not None:
+            self._receiver.should_stop = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning("Task event consumer didn't stop in time")
+        self._thread = None
+
+    def subscribe(self, callback: Callable[[str, str], None]) -> None:
+        """Registers `callback(task_id, status)`, called on every finished task"""
+        self._callbacks.append(callback)
+
+    def subscribe_received(self, callback: Callable[[str, str], None]) -> None:
+        """Registers `callback(task_id, name)`, called on every task a worker received
+
+        Tasks of all clients are reported, e.g. those started by other replicas.
+        """
+        self._received_callbacks.append(callback)
+
+    def _consume(self) -> None:
+        app = CeleryClient().get_app()
+        handlers = {event: self._on_event for event in FINAL_EVENTS}
+        handlers["task-received"] = self._on_received
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                with app.connection_for_read() as connection:
+                    self._receiver = app.events.Receiver(connection, handlers=handlers)
+                    self._connected.set()
+                    backoff = 1.0
+                    logger.info("Listening for task events")
+                    while not self._stopped.is_set():
+                        try:
+                            self._receiver.capture(
+                                limit=None, timeout=self.capture_timeout, wakeup=False
+                            )
+                        except socket.timeout:
+                            continue
+            except Exception:
+                logger.exception("Task event stream interrupted, reconnecting")
+                self._stats["reconnects"] += 1
+            finally:
+                self._connected.clear()
+            if not self._stopped.wait(backoff):
+                backoff = min(backoff * 2, 30.0)
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        task_id, status = event["uuid"], FINAL_EVENTS[event["type"]]
+        self._stats["events"] += 1
+        CeleryClient().forget_state(task_id)
+
+        for callback in self._callbacks:
+            try:
+                callback(task_id, status)
+            except Exception:
+                logger.exception(f"Task event callback failed for {task_id}")
+
+        with self._lock:
+            waiters = self._waiters.pop(task_id, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, status)
+        self._stats["notified"] += len(waiters)
+
+    def _on_received(self, event: Dict[str, Any]) -> None:
+        task_id, name = event["uuid"], event.get("name")
+        for callback in self._received_callbacks:
+            try:
+                callback(task_id, name)
+            except Exception:
+                logger.exception(f"Task event callback failed for {task_id}")
+
+    async def wait(self, task_id: str, timeout: float) -> Tuple[str, Any]:
+        """Waits until a task finished or the timeout passed
+
+        Args:
+            task_id (str): Id of the task.
+            timeout (float): Seconds to wait at most.
+
+        Returns:
+            Tuple[str, Any]: Status and result of the task when returning.
+        """
+        celery_client = CeleryClient()
+        if not self.alive:
+            return await self._poll(task_id, timeout)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(task_id, []).append((loop, future))
+        try:
+            # Registered before checking, so a completion in between isn't missed.
+            state = await celery_client.get_state_async(task_id)
+            if state[0] in states.READY_STATES:
+                return state
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._discard(task_id, future)
+        return await celery_client.get_state_async(task_id)
+
+    async def _poll(self, task_id: str, timeout: float) -> Tuple[str, Any]:
+        celery_client = CeleryClient()
+        deadline = time.monotonic() + timeout
+        while True:
+            state = await celery_client.get_state_async(task_id)
+            remaining = deadline - time.monotonic()
+            if state[0] in states.READY_STATES or remaining <= 0:
+                return state
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+    def _discard(self, task_id: str, future) -> None:
+        with self._lock:
+            waiters = self._waiters.get(task_id)
+            if not waiters:
+                return
+            waiters[:] = [waiter for waiter in waiters if waiter[1] is not future]
+            if not waiters:
+                del self._waiters[task_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waiting = sum(len(waiters) for waiters in self._waiters.values())
+        return {**self._stats, "connected": self.alive, "waiting": waiting}
+
+
+def _resolve(future, status: str) -> None:
+    if not future.done():
+        future.set_result(status)
@@ -0,0 +1,197 @@
+"""Metrics and spans of the hot paths, through the OpenTelemetry API.
+
+Instruments are created on the global meter and tracer, which stay no-ops
+unless an SDK is installed, e.g. by `opentelemetry-instrument` with the OTLP
+settings of `.env.example`. As long as none is, `measure` skips creating spans
+and recording values altogether, so instrumented code pays one type check.
+"""
+
+import io
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Span, Status, StatusCode
+
+
+T = TypeVar("T")
+
+tracer = trace.get_tracer("pipeline-api")
+meter = metrics.get_meter("pipeline-api")
+
+HTTP_DURATION = meter.create_histogram(
+    "pipeline.request.duration",
+    unit="s",
+    description="Duration of requests per route and status code",
+)
+DISPATCH_DURATION = meter.create_histogram(
+    "celery.dispatch.duration",
+    unit="s",
+    description="Time to publish a task to the broker",
+)
+BACKEND_DURATION = meter.create_histogram(
+    "celery.backend.duration",
+    unit="s",
+    description="Time spent reading or awaiting task results from the backend",
+)
+PAYLOAD_SIZE = meter.create_histogram(
+    "celery.payload.size", unit="By", description="Serialized size of task arguments"
+)
+SERIALIZATION_DURATION = meter.create_histogram(
+    "serialization.duration",
+    unit="s",
+    description="Time to (de)serialize objects and parse uploaded files",
+)
+S3_DURATION = meter.create_histogram(
+    "s3.request.duration", unit="s", description="Duration of S3 requests"
+)
+S3_TRANSFERRED = meter.create_histogram(
+    "s3.transfer.size", unit="By", description="Bytes sent or received per S3 request"
+)
+ERRORS = meter.create_counter(
+    "pipeline.errors", description="Failed requests and operations"
+)
+
+_enabled = False
+
+
+def enabled() -> bool:
+    """Whether an SDK is installed, once it is it can't be removed anymore"""
+    global _enabled
+    if not _enabled:
+        _enabled = not isinstance(
+            trace.get_tracer_provider(),
+            (trace.ProxyTracerProvider, trace.NoOpTracerProvider),
+        )
+    return _enabled
+
+
+@contextmanager
+def measure(histogram, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Times the block as span `name` and records its duration in `histogram`
+
+    Exceptions are counted as errors of `name` and re-raised. Yields the span,
+    None if telemetry is disabled.
+    """
+    if not enabled():
+        yield None
+        return
+
+    start = time.perf_counter()
+    try:
+        with tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+    except BaseException as e:
+        ERRORS.add(1, {"operation": name, "error.type": type(e).__name__})
+        raise
+    finally:
+        histogram.record(time.perf_counter() - start, attributes)
+
+
+def measure_iter(
+    histogram, name: str, items: Iterable[T], **attributes: Any
+) -> Iterator[T]:
+    """Like `measure`, timing the production of every item of a lazy iterable
+
+    Reaching the end of the iterable produces no item and records nothing, so the
+    span of an item is created once it was produced, starting back when it was
+    requested.
+    """
+    iterator = iter(items)
+    while True:
+        if not enabled():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            yield item
+            continue
+
+        start, start_time = time.perf_counter(), time.time_ns()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        except BaseException as e:
+            _record_item(histogram, name, start, start_time, attributes, e)
+            raise
+        _record_item(histogram, name, start, start_time, attributes)
+        yield item
+
+
+def _record_item(
+    histogram,
+    name: str,
+    start: float,
+    start_time: int,
+    attributes: Dict[str, Any],
+    error: Optional[BaseException] = None,
+) -> None:
+    histogram.record(time.perf_counter() - start, attributes)
+    span = tracer.start_span(name, attributes=attributes, start_time=start_time)
+    if error is not None:
+        ERRORS.add(1, {"operation": name, "error.type": type(error).__name__})
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, f"{type(error).__name__}: {error}"))
+    span.end()
+
+
+def record(histogram, value: float, **attributes: Any) -> None:
+    if enabled():
+        histogram.record(value, attributes)
+
+
+def instrument_s3(client) -> None:
+    """Records duration, bytes and errors of every request of a boto3 S3 client"""
+    events = client.meta.events
+    events.register("before-call.s3", _before_s3_call)
+    events.register("after-call.s3", _after_s3_call)
+    events.register("after-call-error.s3", _after_s3_error)
+
+
+def _before_s3_call(params: Dict[str, Any], context: Dict[str, Any], **_) -> None:
+    if not enabled():
+        return
+    context["telemetry_start"] = time.perf_counter()
+    if context.get("has_streaming_input"):
+        # Object bodies arrive wrapped in a BytesIO
+        body = params.get("body")
+        if isinstance(body, io.BytesIO):
+            context["telemetry_sent"] = body.getbuffer().nbytes
+        elif isinstance(body, (bytes, bytearray)):
+            context["telemetry_sent"] = len(body)
+
+
+def _after_s3_call(
+    http_response, parsed: Dict[str, Any], model, context: Dict[str, Any], **_
+) -> None:
+    if (start := context.get("telemetry_start")) is None:
+        return
+    attributes = {"operation": model.name, "status": http_response.status_code}
+    S3_DURATION.record(time.perf_counter() - start, attributes)
+
+    if sent := context.get("telemetry_sent"):
+        S3_TRANSFERRED.record(sent, {**attributes, "direction": "upload"})
+    if model.name == "GetObject" and http_response.status_code < 300:
+        received = parsed.get("ContentLength", 0)
+        S3_TRANSFERRED.record(received, {**attributes, "direction": "download"})
+    # Missing objects and failed preconditions are expected answers to lookups
+    # and conditional requests, not failures.
+    if http_response.status_code >= 400 and http_response.status_code not in (
+        404,
+        412,
+    ):
+        ERRORS.add(1, {"operation": f"s3.{model.name}", "error.type": "http"})
+
+
+def _after_s3_error(
+    exception: Exception, context: Dict[str, Any], event_name: str, **_
+) -> None:
+    if (start := context.get("telemetry_start")) is None:
+        return
+    operation = event_name.rsplit(".", 1)[-1]
+    S3_DURATION.record(time.perf_counter() - start, {"operation": operation})
+    ERRORS.add(
+        1, {"operation": f"s3.{operation}", "error.type": type(exception).__name__}
+    )
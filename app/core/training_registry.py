@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from celery import states
+from celery.backends.database import DatabaseBackend, session_cleanup
+from sqlalchemy import Column, Float, MetaData, String, Table, select, text
+
+from app.constants import EnvConfig
+from app.core.admission import TRAINING
+from app.core.celery_client import CeleryClient
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+training_runs = Table(
+    "pipeline_training_runs",
+    MetaData(),
+    Column("key", String(255), primary_key=True),
+    Column("workflow_id", String(155), nullable=False),
+    Column("task_id", String(155), nullable=True),
+    Column("started_at", Float, nullable=False),
+)
+
+
+@dataclass
+class TrainingRun:
+    # Orchestrator task, its result holds `result_task_id`
+    workflow_id: str
+    # Training task, None until the orchestrator answered
+    task_id: Optional[str]
+    started_at: float
+
+
+class TrainingRegistry:
+    """Maps training parameters to the run last started with them.
+
+    A request whose parameters match a run that is still going, or that
+    succeeded less than `ttl` seconds ago, is answered with that run instead of
+    starting another one. Celery reports tasks it has no record of as PENDING,
+    queued and lost ones alike, so such runs are only joined for `pending_ttl`
+    seconds after they started. With a database result backend runs are stored next
+    to the task results and claimed under a Postgres advisory lock, so replicas
+    share them; other backends fall back to a registry per process.
+    """
+
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        """Returns the singleton instance or creates a new one if not existend"""
+        if cls._instance is None:
+            cls._instance = super(TrainingRegistry, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self.ttl = float(os.getenv(EnvConfig.TRAINING_DEDUP_TTL_S.value, "3600"))
+        self.max_runtime = float(
+            os.getenv(EnvConfig.TRAINING_MAX_RUNTIME_S.value, "86400")
+        )
+        self.pending_ttl = float(
+            os.getenv(EnvConfig.TRAINING_PENDING_TTL_S.value, "600")
+        )
+
+        backend = CeleryClient().get_app().backend
+        self._backend = backend if isinstance(backend, DatabaseBackend) else None
+        self._table_ready = False
+        self._runs: Dict[str, TrainingRun] = {}
+        # Locks of the keys requested right now, with their number of holders
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+        # Orchestrator replies awaited for runs started by this process
+        self._following: Dict[str, asyncio.Task] = {}
+        self._stats = {"started": 0, "reused": 0}
+        self._initialized = True
+
+    @staticmethod
+    def key(optimize: bool, include_user_data: bool, dataset: str) -> str:
+        return f"{int(optimize)}:{int(include_user_data)}:{dataset}"
+
+    async def get_or_start(
+        self, key: str, start: Callable[[], Awaitable[str]]
+    ) -> Tuple[TrainingRun, bool]:
+        """Returns the run to answer a training request with
+
+        Args:
+            key (str): Training parameters, as built by `key`.
+            start (Callable[[], Awaitable[str]]): Starts the training workflow
+                without waiting for the orchestrator, returns its task id.
+
+        Returns:
+            Tuple[TrainingRun, bool]: The run and whether it was reused.
+        """
+        # Requests of this process queue up here instead of each holding a lock
+        # (and a database connection) while waiting for the same key.
+        async with self._key_lock(key):
+            claim = asyncio.ensure_future(asyncio.to_thread(self._claim, key))
+            try:
+                session = await asyncio.shield(claim)
+            except asyncio.CancelledError:
+                # The thread takes the lock all the same, released once it did
+                claim.add_done_callback(self._abandon)
+                raise
+            completed = False
+            try:
+                run = await asyncio.to_thread(self._load, session, key)
+                if run is not None and await self._reusable(key, run):
+                    self._stats["reused"] += 1
+                    logger.info(f"Training {key} joins run {run.workflow_id}")
+                    completed = True
+                    return run, True
+
+                run = TrainingRun(await start(), None, time.time())
+                await asyncio.to_thread(self._save, session, key, run)
+                completed = True
+                self._stats["started"] += 1
+                self._follow(key, run)
+                return run, False
+            finally:
+                await asyncio.to_thread(self._release, session, completed)
+
+    async def resolve(self, key: str, run: TrainingRun) -> str:
+        """Returns the id of the training task, waiting for the orchestrator
+
+        Raises:
+            celery.exceptions.TimeoutError: The orchestrator didn't answer.
+        """
+        if run.task_id is None:
+            following = self._following.get(run.workflow_id)
+            if following is not None:
+                run.task_id = await asyncio.shield(following)
+            else:
+                run.task_id = await self._resolve(key, run)
+        return run.task_id
+
+    async def _resolve(self, key: str, run: TrainingRun) -> str:
+        celery_client = CeleryClient()
+        workflow = celery_client.get_app().AsyncResult(run.workflow_id)
+        reply = await celery_client.wait_for(workflow)
+        run.task_id = reply["result_task_id"]
+        await asyncio.to_thread(self._update, key, run)
+        return run.task_id
+
+    def _follow(self, key: str, run: TrainingRun) -> None:
+        """Awaits the orchestrator of a run started by this process in the
+        background, its admission slot passes on to the training task"""
+
+        async def follow() -> str:
+            task_id = await self._resolve(key, run)
+            CeleryClient().admission.dispatched(TRAINING, run.workflow_id, task_id)
+            return task_id
+
+        def done(task: asyncio.Task) -> None:
+            del self._following[run.workflow_id]
+            if not task.cancelled() and task.exception() is not None:
+                logger.warning(
+                    f"Orchestrator of training {key} didn't answer: "
+                    f"{task.exception()!r}"
+                )
+
+        task = asyncio.create_task(follow())
+        self._following[run.workflow_id] = task
+        task.add_done_callback(done)
+
+    async def _reusable(self, key: str, run: TrainingRun) -> bool:
+        celery_client = CeleryClient()
+        age = time.time() - run.started_at
+        if run.task_id is None:
+            status, reply = await celery_client.get_state_async(run.workflow_id)
+            if status != states.SUCCESS:
+                return self._unfinished(status, age)
+            if not isinstance(reply, dict) or "result_task_id" not in reply:
+                logger.warning(f"Workflow {run.workflow_id} replied with {reply!r}")
+                return False
+            run.task_id = reply["result_task_id"]
+            await asyncio.to_thread(self._update, key, run)
+
+        status = await celery_client.get_status_async(run.task_id)
+        if status in states.UNREADY_STATES:
+            return self._unfinished(status, age)
+        if status != states.SUCCESS:
+            return False
+        done = await asyncio.to_thread(self._date_done, run.task_id)
+        return done is not None and time.time() - done < self.ttl
+
+    def _unfinished(self, status: str, age: float) -> bool:
+        """Whether a task in an unready state is still worth joining"""
+        if status == states.PENDING:
+            # Unknown to the backend: not picked up yet, or lost (never
+            # published, purged from the queue, result expired).
+            return age < self.pending_ttl
+        return status in states.UNREADY_STATES and age < self.max_runtime
+
+    @staticmethod
+    def _date_done(task_id: str) -> Optional[float]:
+        date_done = CeleryClient().get_app().AsyncResult(task_id).date_done
+        if date_done is None:
+            return None
+        if date_done.tzinfo is None:
+            # Backends store naive UTC timestamps
+            date_done = date_done.replace(tzinfo=timezone.utc)
+        return date_done.timestamp()
+
+    @asynccontextmanager
+    async def _key_lock(self, key: str) -> AsyncIterator[None]:
+        """Holds the lock of `key` in this process, dropped once nobody needs it"""
+        lock, holders = self._locks.get(key, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._locks[key] = (lock, holders + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, holders = self._locks[key]
+            if holders == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, holders - 1)
+
+    def _claim(self, key: str) -> Any:
+        """Opens a session holding the lock of `key` until it's released"""
+        if self._backend is None:
+            return None
+
+        session = self._backend.ResultSession()
+        try:
+            if not self._table_ready:
+                training_runs.create(session.connection(), checkfirst=True)
+                session.commit()
+                self._table_ready = True
+            if session.get_bind().dialect.name == "postgresql":
+                lock_id = int.from_bytes(
+                    hashlib.sha256(key.encode()).digest()[:8], "big", signed=True
+                )
+                session.execute(
+                    text("SELECT pg_advisory_xact_lock(:id)"), {"id": lock_id}
+                )
+        except Exception:
+            session.rollback()
+            session.close()
+            raise
+        return session
+
+    def _abandon(self, claim: asyncio.Future) -> None:
+        """Releases a claim whose request was cancelled while it was taken"""
+        if not claim.cancelled() and claim.exception() is None:
+            asyncio.get_running_loop().run_in_executor(
+                None, self._release, claim.result(), False
+            )
+
+    @staticmethod
+    def _release(session, commit: bool) -> None:
+        """Ends the transaction, which releases the lock"""
+        if session is None:
+            return
+        try:
+            if commit:
+                session.commit()
+            else:
+                session.rollback()
+        finally:
+            session.close()
+
+    def _load(self, session, key: str) -> Optional[TrainingRun]:
+        if session is None:
+            return self._runs.get(key)
+        row = session.execute(
+            select(
+                training_runs.c.workflow_id,
+                training_runs.c.task_id,
+                training_runs.c.started_at,
+            ).where(training_runs.c.key == key)
+        ).first()
+        return TrainingRun(*row) if row else None
+
+    def _save(self, session, key: str, run: TrainingRun) -> None:
+        if session is None:
+            self._runs[key] = run
+            return
+        session.execute(training_runs.delete().where(training_runs.c.key == key))
+        session.execute(
+            training_runs.insert().values(
+                key=key,
+                workflow_id=run.workflow_id,
+                task_id=run.task_id,
+                started_at=run.started_at,
+            )
+        )
+
+    def _update(self, key: str, run: TrainingRun) -> None:
+        """Stores the resolved training task id of a run"""
+        if self._backend is None:
+            return
+        session = self._backend.ResultSession()
+        with session_cleanup(session):
+            session.execute(
+                training_runs.update()
+                .where(training_runs.c.key == key)
+                .where(training_runs.c.workflow_id == run.workflow_id)
+                .values(task_id=run.task_id)
+            )
+            session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "shared": self._backend is not None,
+            "locked_keys": len(self._locks),
+            "following": len(self._following),
+        }
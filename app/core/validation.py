@@ -0,0 +1,123 @@
+"""Bulk validation of datasets against the constraints of the request schemas.
+
+Instead of validating one pydantic model per row, every constraint is checked
+for a whole column at once: categorical columns against their allowed values,
+numeric columns against their type and `ge`/`le` bounds. Missing values violate
+every constraint.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Type, TypeVar, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pydantic import BaseModel
+
+from app.core.dataset_schema import CATEGORY, INT, ColumnSpec, DatasetSchema
+
+
+Frame = TypeVar("Frame", pd.DataFrame, pa.Table)
+
+
+@dataclass
+class ValidationReport:
+    rows: int = 0
+    invalid_rows: int = 0
+    missing_columns: List[str] = field(default_factory=list)
+    violations: Dict[str, int] = field(default_factory=dict)
+    row_indices: List[int] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        return not self.missing_columns and not self.invalid_rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "invalid_rows": self.invalid_rows,
+            "missing_columns": self.missing_columns,
+            "violations": self.violations,
+            "row_indices": self.row_indices,
+        }
+
+
+class DatasetValidationError(ValueError):
+    def __init__(self, report: ValidationReport) -> None:
+        super().__init__(f"{report.invalid_rows} of {report.rows} rows are invalid")
+        self.report = report
+
+
+class ColumnarValidator:
+    """Checks DataFrames or Arrow tables against a `DatasetSchema`
+
+    Reports at most `max_indices` offending row indices, violations are counted
+    for all rows.
+    """
+
+    def __init__(self, schema: DatasetSchema, max_indices: int = 100) -> None:
+        self.schema = schema
+        self.max_indices = max_indices
+
+    @classmethod
+    def from_model(cls, model: Type[BaseModel], **kwargs) -> "ColumnarValidator":
+        return cls(DatasetSchema.from_model(model), **kwargs)
+
+    def validate(self, data: Union[pd.DataFrame, pa.Table]) -> ValidationReport:
+        report = ValidationReport()
+        self._check(data, report, offset=0)
+        return report
+
+    def iter_validated(self, chunks: Iterable[Frame]) -> Iterator[Frame]:
+        """Passes chunks on, raises a DatasetValidationError at the first invalid"""
+        report = ValidationReport()
+        for chunk in chunks:
+            self._check(chunk, report, offset=report.rows)
+            if not report.valid:
+                raise DatasetValidationError(report)
+            yield chunk
+
+    def _check(
+        self, data: Union[pd.DataFrame, pa.Table], report: ValidationReport, offset: int
+    ) -> None:
+        names = data.column_names if isinstance(data, pa.Table) else list(data.columns)
+        rows = len(data)
+        invalid = np.zeros(rows, dtype=bool)
+
+        for name, column in self.schema.columns.items():
+            if name not in names:
+                if name not in report.missing_columns:
+                    report.missing_columns.append(name)
+                continue
+
+            series = (
+                data.column(name).to_pandas()
+                if isinstance(data, pa.Table)
+                else data[name]
+            )
+            mask = _violations(series, column)
+            if count := int(mask.sum()):
+                report.violations[name] = report.violations.get(name, 0) + count
+                invalid |= mask
+
+        report.rows += rows
+        report.invalid_rows += int(invalid.sum())
+        if remaining := self.max_indices - len(report.row_indices):
+            indices = np.flatnonzero(invalid)[:remaining] + offset
+            report.row_indices.extend(indices.tolist())
+
+
+def _violations(series: pd.Series, column: ColumnSpec) -> np.ndarray:
+    if column.kind == CATEGORY:
+        return ~series.isin(column.categories).to_numpy()
+
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore"):
+        mask = np.isnan(values)
+        if column.ge is not None:
+            mask |= values < column.ge
+        if column.le is not None:
+            mask |= values > column.le
+        if column.kind == INT:
+            mask |= values % 1 != 0
+    return mask
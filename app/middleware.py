@@ -1,13 +1,20 @@
 """Functionality checking bearer token on each request for predefined endpoints.
-In case the bearer token is not provided or invalid. Unauthorized HTTPException will be thrown."""
+In case the bearer token is not provided or invalid. Unauthorized HTTPException will be thrown.
+WebSocket connections are closed with a policy violation instead.
+The timing middleware records the duration of every request, the body limit
+middleware rejects oversized request bodies before they are read."""
 
 import os
+import time
 import logging
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, WebSocket, WebSocketException, status
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.constants import EnvConfig
+from app.core import telemetry
 
 
 logger = logging.getLogger(__name__)
@@ -32,3 +39,104 @@ def get_bearer_token(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Unauthorized. Provided bearer token invalid.",
         )
+
+
+# Browsers can't set headers on WebSocket connections but subprotocols, clients
+# offer `["bearer", <token>]` and the server selects `bearer`.
+WEBSOCKET_PROTOCOL = "bearer"
+
+
+def get_websocket_token(websocket: WebSocket) -> None:
+    """Accepts the bearer token from the Authorization header or, following the
+    `bearer` subprotocol, from the Sec-WebSocket-Protocol header. Tokens aren't
+    taken from the URL, which ends up in access logs and browser history."""
+    header = websocket.headers.get("authorization", "")
+    provided = header.split()[-1] if header else ""
+    protocols = websocket.scope.get("subprotocols", [])
+    if not provided and WEBSOCKET_PROTOCOL in protocols[:-1]:
+        provided = protocols[protocols.index(WEBSOCKET_PROTOCOL) + 1]
+    expected_token = os.environ[EnvConfig.API_BEARER_TOKEN.value]
+
+    if not provided or provided != expected_token:
+        logger.exception("Unauthorized websocket access. Token missing or invalid")
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+
+class TimingMiddleware:
+    """Records duration and status of every HTTP request per route template
+
+    A plain ASGI middleware, streamed responses are passed through untouched and
+    nothing is done unless telemetry is enabled.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not telemetry.enabled():
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            attributes = {
+                "http.request.method": scope["method"],
+                "http.route": route,
+                "http.response.status_code": status_code,
+            }
+            telemetry.HTTP_DURATION.record(time.perf_counter() - start, attributes)
+            if status_code >= 500:
+                telemetry.ERRORS.add(
+                    1, {"operation": f"http {route}", "error.type": str(status_code)}
+                )
+
+
+class BodyLimitMiddleware:
+    """Answers requests with bodies above `max_bytes` with a 413
+
+    Bodies announcing their size (Content-Length) are rejected before anything is
+    read, others (chunked) once more than `max_bytes` arrived, so uploads are
+    never spooled to disk beyond the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the limit of {self.max_bytes} bytes"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Re-raised by FastAPI while it parses the body
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
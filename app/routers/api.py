@@ -1,14 +1,53 @@
 import os
+import asyncio
 import logging
-from typing import Annotated
+from typing import IO, Annotated, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile, Depends
+import pandas as pd
 
-from app.middleware import get_bearer_token
+from celery import states
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from fastapi import (
+    APIRouter,
+    File,
+    HTTPException,
+    UploadFile,
+    Depends,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+
+from app.middleware import WEBSOCKET_PROTOCOL, get_bearer_token, get_websocket_token
+from app.core.admission import PREDICTION, TRAINING, AdmissionRejected
 from app.core.data_factory import DataFactory
+from app.core.dataset_schema import DatasetSchema
 from app.core.celery_client import CeleryClient
-from app.core.dvc_client import DVCClient
-from app.schemas import UserInputRequest, FeedbackInputRequest, AsyncTaskResponse
+from app.core.dvc_client import PROFILE_SUFFIX, DVCClient
+from app.core.feedback_buffer import (
+    FEEDBACK_PREFIX,
+    FeedbackBuffer,
+    FeedbackBufferFull,
+)
+from app.core.prediction_cache import TRAINING_WORKFLOW, PredictionCache
+from app.core.profile import DatasetProfile
+from app.core.task_events import TaskEventListener
+from app.core.training_registry import TrainingRegistry
+from app.core.validation import ColumnarValidator, DatasetValidationError
+from app.core.prediction_batcher import (
+    BATCH_TASK,
+    PredictionBatcher,
+    select_row,
+    split_task_id,
+)
+from app.schemas import (
+    UserInputRequest,
+    FeedbackInputRequest,
+    AsyncTaskResponse,
+    TaskCheckRequest,
+    DatasetMetadataResponse,
+)
 from app.constants import EnvConfig
 
 
@@ -18,8 +57,15 @@ logger.setLevel(logging.INFO)
 router = APIRouter(prefix="/api")
 
 BUCKET = os.environ[EnvConfig.S3_BUCKET_NAME.value]
-FEEDBACK_PATH = "retrain.joblib"
-FILEPATH = "data.joblib"
+FILEPATH = "data.parquet"
+# Key of the reference data before it was versioned
+LEGACY_FILEPATH = "data.joblib"
+UPLOAD_MAX_BYTES = int(os.getenv(EnvConfig.UPLOAD_MAX_BYTES.value, str(1024**3)))
+TASK_CHECK_MAX_BATCH = int(os.getenv(EnvConfig.TASK_CHECK_MAX_BATCH.value, "100"))
+TASK_WAIT_MAX_TIMEOUT = float(os.getenv(EnvConfig.TASK_WAIT_MAX_TIMEOUT_S.value, "60"))
+BATCH_MAX_ROWS = int(os.getenv(EnvConfig.PREDICTION_BATCH_MAX_ROWS.value, "10000"))
+DATASET_SCHEMA = DatasetSchema.from_model(UserInputRequest)
+DATASET_VALIDATOR = ColumnarValidator(DATASET_SCHEMA)
 
 
 @router.post("/data-management/upload/file", tags=["Data Management"])
@@ -28,107 +74,362 @@ async def upload_file(
     file: UploadFile = File(...),
 ):
     dvc_client = DVCClient()
+    filename = str(file.filename)
     try:
-        contents = await file.read()
-        filename = str(file.filename)
-        if (df := DataFactory.from_bytes(filename, contents)) is None:
+        if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File exceeds the limit of {UPLOAD_MAX_BYTES} bytes",
+            )
+
+        # The upload is spooled to disk by the multipart parser, read it from there
+        # chunk by chunk instead of loading it into memory as a whole.
+        chunks = DataFactory.iter_chunks(
+            filename, file.file, schema=DATASET_SCHEMA, as_arrow=True
+        )
+        if chunks is None:
             raise HTTPException(
                 status_code=422,
                 detail="Provided file is corrupt and can't be processed",
             )
 
-        if not dvc_client.save_data_to(obj=df, destination=FILEPATH):
+        profile = DatasetProfile(DATASET_SCHEMA)
+        version = await dvc_client.save_version_async(
+            profile.observe(DATASET_VALIDATOR.iter_validated(chunks)), name=FILEPATH
+        )
+        if version is None:
             logger.exception("Data upload to s3-bucket storage failed")
             raise HTTPException(status_code=504, detail="File upload failed")
+        # Also for known content, in case writing its profile failed before
+        if version.created or not await dvc_client.get_metadata_async(
+            f"{version.key}{PROFILE_SUFFIX}"
+        ):
+            await dvc_client.write_profile_async(profile, version.key)
+    except HTTPException:
+        raise
+    except DatasetValidationError as e:
+        logger.info(f"Rejected upload of {filename}: {e}")
+        raise HTTPException(status_code=422, detail=e.report.to_dict())
+    except ValueError as e:
+        logger.exception(e)
+        raise HTTPException(
+            status_code=422,
+            detail="Provided file is corrupt and can't be processed",
+        )
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail="Something went wrong")
     finally:
         await file.close()
 
-    logger.info(f"Uploaded file {filename} under {FILEPATH}")
-    return {"status": "Upload successful", "reference_data_filename": FILEPATH}
+    logger.info(f"Uploaded file {filename} as {FILEPATH} version {version.md5}")
+    return {
+        "status": "Upload successful",
+        "reference_data_filename": FILEPATH,
+        "dataset_version": version.md5,
+    }
+
+
+@router.get("/data-management/metadata", tags=["Data Management"])
+async def dataset_metadata(
+    _: Annotated[None, Depends(get_bearer_token)],
+    dataset: Literal["reference", "feedback"] = "reference",
+) -> DatasetMetadataResponse:
+    """Profile of a dataset, computed when it was written; nothing is downloaded."""
+    dvc_client = DVCClient()
+    if dataset == "feedback":
+        profile = await dvc_client.read_log_profile_async(FEEDBACK_PREFIX)
+        return DatasetMetadataResponse(dataset=dataset, profile=profile.summary())
+
+    pointer = await dvc_client.read_pointer_async(FILEPATH)
+    if pointer is None:
+        raise HTTPException(status_code=404, detail="No reference data uploaded yet")
+    obj, profile = await asyncio.gather(
+        dvc_client.get_metadata_async(pointer["path"]),
+        dvc_client.read_profile_async(pointer["path"]),
+    )
+    if obj is None:
+        raise HTTPException(status_code=404, detail="No reference data uploaded yet")
+    obj["dataset_version"] = pointer["md5"]
+
+    return DatasetMetadataResponse(
+        dataset=dataset,
+        object=obj,
+        profile=profile.summary() if profile else None,
+        stale=profile is None or profile.source.get("etag") != obj["etag"],
+    )
 
 
 @router.post("/data-management/upload/feedback", tags=["Data Management"])
 async def upload_feedback(
     _: Annotated[None, Depends(get_bearer_token)], feeback_input: FeedbackInputRequest
 ):
-    dvc_client = DVCClient()
     feeback_input_json = feeback_input.model_dump(by_alias=True)
     try:
-        if (df := DataFactory.from_dict(feeback_input_json)) is None:
-            raise HTTPException(
-                status_code=422,
-                detail="Provided file is corrupt and can't be processed",
-            )
-
-        if (df_feedback := dvc_client.read_data_from(source=FEEDBACK_PATH)) is not None:
-            df = DataFactory.merge_dfs(df, df_feedback)
-
-        if dvc_client.save_data_to(obj=df, destination=FEEDBACK_PATH) is False:
-            logger.exception("Data upload to s3-bucket storage failed")
-            raise HTTPException(status_code=504, detail="File upload failed")
+        depth = await FeedbackBuffer().put(feeback_input_json)
+    except FeedbackBufferFull as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=503,
+            detail="Feedback can't be stored right now",
+            headers={"Retry-After": str(int(FeedbackBuffer().flush_interval) or 1)},
+        )
     except Exception as e:
         logger.exception(e)
         raise HTTPException(status_code=500, detail="Something went wrong")
 
-    logger.info(
-        f"Uploaded feedback with id: {feeback_input_json['task_id']} under {FEEDBACK_PATH}"
+    logger.info(f"Buffered feedback with id: {feeback_input_json['task_id']}")
+    return {"status": "Feedback accepted", "buffered_rows": depth}
+
+
+@router.get("/data-management/feedback/buffer", tags=["Data Management"])
+def feedback_buffer_status(_: Annotated[None, Depends(get_bearer_token)]):
+    return FeedbackBuffer().stats()
+
+
+def _too_many_requests(e: AdmissionRejected) -> HTTPException:
+    """Answers dispatches rejected by admission control, clients retry later."""
+    logger.warning(str(e))
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
     )
-    return {"status": "Upload successful", "reference_data_filename": FEEDBACK_PATH}
 
 
-# Do we really need async here?
+async def _start_workflow(
+    name: str, body: dict, wait: bool, lane: str = PREDICTION
+) -> AsyncTaskResponse:
+    """Dispatches an orchestrator workflow without blocking the event loop."""
+    celery_client = CeleryClient()
+    try:
+        res_id = await celery_client.start_workflow(
+            name=name, lane=lane, body=body, wait=wait
+        )
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    except CeleryTimeoutError:
+        logger.exception(f"Orchestrator didn't answer for workflow {name}")
+        raise HTTPException(
+            status_code=504, detail=f"Workflow {name} didn't start in time"
+        )
+
+    if not wait:
+        return AsyncTaskResponse(id=res_id, status="PENDING")
+
+    res_state = await celery_client.get_status_async(res_id)
+    return AsyncTaskResponse(id=res_id, status=str(res_state))
+
+
 @router.post("/models/train", tags=["Machine Learning"])
 async def train_model(
     _: Annotated[None, Depends(get_bearer_token)],
     optimize_hyperparams: bool = False,
     include_user_data: bool = False,
-):
-    celery_client = CeleryClient()
-    task = celery_client.get_task(
-        name="workflows.model_training",
-        queue="tasks",
-        kwargs={
-            "body": {
+    wait: bool = True,
+) -> AsyncTaskResponse:
+    dvc_client = DVCClient()
+    # Versions are immutable, workers can cache them by hash. Unversioned data
+    # is moved into a version on startup, without a pointer nothing was uploaded.
+    pointer = await dvc_client.read_pointer_async(FILEPATH)
+    if pointer is None:
+        raise HTTPException(status_code=409, detail="No reference data uploaded yet")
+    filepath, dataset_version = pointer["path"], pointer["md5"]
+    feedback_manifest = None
+    if include_user_data:
+        feedback_manifest = await dvc_client.write_manifest_async(
+            prefix=FEEDBACK_PREFIX
+        )
+        if feedback_manifest is None:
+            raise HTTPException(
+                status_code=504, detail="Feedback manifest couldn't be written"
+            )
+
+    if feedback_manifest:
+        manifest_md5 = os.path.splitext(os.path.basename(feedback_manifest))[0]
+        dataset_version = f"{dataset_version}+{manifest_md5}"
+
+    async def start() -> str:
+        response = await _start_workflow(
+            name=TRAINING_WORKFLOW,
+            body={
                 "optimize": optimize_hyperparams,
                 "include_user_data": include_user_data,
-                "feedback_path": FEEDBACK_PATH,
-                "filepath": FILEPATH,
+                "feedback_manifest": feedback_manifest,
+                "filepath": filepath,
+                "dataset_version": dataset_version,
                 "bucket": BUCKET,
-            }
-        },
-    )
-    workflow_start = task.apply_async()
+            },
+            wait=False,
+            lane=TRAINING,
+        )
+        return response.id
 
-    res_id = workflow_start.get()["result_task_id"]
-    res_state = celery_client.get_status(res_id)
+    # Identical requests join the run already going (or just finished).
+    registry = TrainingRegistry()
+    key = registry.key(optimize_hyperparams, include_user_data, dataset_version)
+    run, reused = await registry.get_or_start(key, start)
+    # Followed to the training task, whose success changes the model.
+    PredictionCache().track_workflow(run.workflow_id)
 
-    logger.info(f"Training workflow started with id: {res_id}")
-    return AsyncTaskResponse(id=res_id, status=str(res_state))
+    celery_client = CeleryClient()
+    if not wait:
+        status = await celery_client.get_status_async(run.workflow_id)
+        response = AsyncTaskResponse(id=run.workflow_id, status=str(status))
+    else:
+        try:
+            res_id = await registry.resolve(key, run)
+        except CeleryTimeoutError:
+            logger.exception("Orchestrator didn't answer for workflow training")
+            raise HTTPException(
+                status_code=504,
+                detail="Workflow workflows.model_training didn't start in time",
+            )
+        res_state = await celery_client.get_status_async(res_id)
+        response = AsyncTaskResponse(id=res_id, status=str(res_state))
+        PredictionCache().track_training(response.id)
+
+    if reused:
+        logger.info(f"Training request joined workflow with id: {response.id}")
+        return response
+    logger.info(f"Training workflow started with id: {response.id}")
+    return response
+
+
+async def _dispatch_prediction(user_input_json: dict) -> str:
+    """Starts a single prediction and returns the id of the task holding it."""
+    batcher = PredictionBatcher()
+    try:
+        if batcher.enabled:
+            return await batcher.submit(user_input_json)
+        return await CeleryClient().start_workflow(
+            name="workflows.make_prediction",
+            lane=PREDICTION,
+            body=CeleryClient().model_inputs(user_input_json),
+            wait=True,
+        )
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    except CeleryTimeoutError:
+        logger.exception("Orchestrator didn't answer for prediction")
+        raise HTTPException(status_code=504, detail="Prediction didn't start in time")
 
 
-# Do we really need async here?
 @router.post("/models/predict", tags=["Machine Learning"])
 async def predict(
-    _: Annotated[None, Depends(get_bearer_token)], user_input: UserInputRequest
-):
-    celery_client = CeleryClient()
+    _: Annotated[None, Depends(get_bearer_token)],
+    user_input: UserInputRequest,
+    wait: bool = True,
+) -> AsyncTaskResponse:
     user_input_json = user_input.model_dump(by_alias=True)
 
-    task = celery_client.get_task(
-        name="workflows.make_prediction",
-        queue="tasks",
-        kwargs={"body": {"data": user_input_json}},
+    if not wait:
+        response = await _start_workflow(
+            name="workflows.make_prediction",
+            body=CeleryClient().model_inputs(user_input_json),
+            wait=False,
+        )
+        logger.info(f"Prediction workflow started with id: {response.id}")
+        return response
+
+    res_id, cached = await PredictionCache().get_or_dispatch(
+        user_input_json, lambda: _dispatch_prediction(user_input_json)
     )
-    workflow_start = task.apply_async()
+    batch_task_id, row = split_task_id(res_id)
+    status, result = await CeleryClient().get_state_async(batch_task_id)
+    if status.upper() != "SUCCESS":
+        result = None
 
-    res_id = workflow_start.get()["result_task_id"]
-    res_state = celery_client.get_status(res_id)
+    if cached:
+        logger.info(f"Prediction served from task: {res_id}")
+    else:
+        logger.info(f"Prediction workflow started with id: {res_id}")
+    return AsyncTaskResponse(
+        id=res_id, status=str(status), result=select_row(result, row)
+    )
 
-    logger.info(f"Prediction workflow started with id: {res_id}")
-    return AsyncTaskResponse(id=res_id, status=str(res_state))
+
+async def _predict_batch(columns: dict, size: int, wait: bool) -> AsyncTaskResponse:
+    if size > BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {size} rows exceeds the limit of {BATCH_MAX_ROWS}",
+        )
+
+    response = await _start_workflow(
+        name=BATCH_TASK,
+        body=CeleryClient().model_inputs(columns, size=size),
+        wait=wait,
+    )
+
+    logger.info(f"Batch prediction workflow for {size} rows started: {response.id}")
+    return response
+
+
+@router.post("/models/predict/batch", tags=["Machine Learning"])
+async def predict_batch(
+    _: Annotated[None, Depends(get_bearer_token)],
+    user_inputs: List[UserInputRequest],
+    wait: bool = True,
+) -> AsyncTaskResponse:
+    if not user_inputs:
+        raise HTTPException(status_code=422, detail="Expected at least one row")
+
+    rows = [user_input.model_dump(by_alias=True) for user_input in user_inputs]
+    columns = {column: [row[column] for row in rows] for column in rows[0]}
+    return await _predict_batch(columns, size=len(rows), wait=wait)
+
+
+@router.post("/models/predict/batch/file", tags=["Machine Learning"])
+async def predict_batch_file(
+    _: Annotated[None, Depends(get_bearer_token)],
+    file: UploadFile = File(...),
+    wait: bool = True,
+) -> AsyncTaskResponse:
+    filename = str(file.filename)
+    try:
+        # Parsed and validated chunk by chunk from the spooled upload, oversized
+        # batches are rejected without reading them to the end.
+        df = await asyncio.to_thread(_read_batch_file, filename, file.file)
+    except HTTPException:
+        raise
+    except DatasetValidationError as e:
+        logger.info(f"Rejected batch file {filename}: {e}")
+        raise HTTPException(status_code=422, detail=e.report.to_dict())
+    except ValueError as e:
+        logger.exception(e)
+        df = None
+    finally:
+        await file.close()
+
+    if df is None or df.empty:
+        raise HTTPException(
+            status_code=422,
+            detail="Provided file is corrupt and can't be processed",
+        )
+
+    df = df[UserInputRequest.columns()]
+    return await _predict_batch(DataFactory.to_columns(df), size=len(df), wait=wait)
+
+
+def _read_batch_file(filename: str, file: IO[bytes]) -> Optional[pd.DataFrame]:
+    """Reads the valid rows of a batch file, at most `BATCH_MAX_ROWS` of them"""
+    chunks = DataFactory.iter_chunks(
+        filename, file, chunksize=BATCH_MAX_ROWS, schema=DATASET_SCHEMA, as_arrow=True
+    )
+    if chunks is None:
+        return None
+
+    frames, rows = [], 0
+    for chunk in DATASET_VALIDATOR.iter_validated(chunks):
+        rows += len(chunk)
+        if rows > BATCH_MAX_ROWS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch of more than {BATCH_MAX_ROWS} rows exceeds the limit",
+            )
+        frames.append(chunk.to_pandas())
+    return pd.concat(frames, ignore_index=True) if frames else None
 
 
 @router.get("/tasks/check/{task_id}", tags=["Task Check"])
@@ -136,10 +437,102 @@ def check_task(
     _: Annotated[None, Depends(get_bearer_token)], task_id: str
 ) -> AsyncTaskResponse:
     result = None
-    celery_client = CeleryClient()
-    status = str(celery_client.get_status(task_id))
+    batch_task_id, row = split_task_id(task_id)
+    status, batch_result = CeleryClient().get_state(batch_task_id)
 
     if status.upper() == "SUCCESS":
-        result = celery_client.get_result(task_id)
+        result = select_row(batch_result, row)
 
     return AsyncTaskResponse(id=task_id, status=str(status), result=result)
+
+
+@router.post("/tasks/check", tags=["Task Check"])
+def check_tasks(
+    _: Annotated[None, Depends(get_bearer_token)], task_check: TaskCheckRequest
+) -> Dict[str, AsyncTaskResponse]:
+    if len(task_check.ids) > TASK_CHECK_MAX_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {TASK_CHECK_MAX_BATCH} task ids can be checked at once",
+        )
+
+    rows = {task_id: split_task_id(task_id) for task_id in task_check.ids}
+    task_states = CeleryClient().get_states([batch_id for batch_id, _ in rows.values()])
+
+    responses = {}
+    for task_id, (batch_task_id, row) in rows.items():
+        status, result = task_states[batch_task_id]
+        if status.upper() != "SUCCESS":
+            result = None
+        responses[task_id] = AsyncTaskResponse(
+            id=task_id, status=str(status), result=select_row(result, row)
+        )
+    return responses
+
+
+async def _wait_for_task(task_id: str, timeout: float) -> AsyncTaskResponse:
+    batch_task_id, row = split_task_id(task_id)
+    status, result = await TaskEventListener().wait(batch_task_id, timeout)
+    if status.upper() != "SUCCESS":
+        result = None
+    return AsyncTaskResponse(
+        id=task_id, status=str(status), result=select_row(result, row)
+    )
+
+
+@router.get("/tasks/{task_id}/wait", tags=["Task Check"])
+async def wait_task(
+    _: Annotated[None, Depends(get_bearer_token)],
+    task_id: str,
+    timeout: Annotated[float, Query(ge=0, le=TASK_WAIT_MAX_TIMEOUT)] = 30,
+) -> AsyncTaskResponse:
+    """Long-poll: answers as soon as the task finished or the timeout passed."""
+    return await _wait_for_task(task_id, timeout)
+
+
+@router.get("/tasks/{task_id}/stream", tags=["Task Check"])
+async def stream_task(
+    _: Annotated[None, Depends(get_bearer_token)],
+    task_id: str,
+    timeout: Annotated[float, Query(ge=0, le=TASK_WAIT_MAX_TIMEOUT)] = 60,
+):
+    """Server-sent events: the current state first, then the final one."""
+
+    async def events():
+        response = await _wait_for_task(task_id, 0)
+        yield f"event: status\ndata: {response.model_dump_json()}\n\n"
+        if response.status in states.READY_STATES:
+            return
+
+        waiter = asyncio.ensure_future(_wait_for_task(task_id, timeout))
+        while not waiter.done():
+            done, _ = await asyncio.wait({waiter}, timeout=15)
+            if not done:
+                yield ": keep-alive\n\n"
+        yield f"event: status\ndata: {waiter.result().model_dump_json()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.websocket("/tasks/{task_id}/ws")
+async def websocket_task(
+    websocket: WebSocket,
+    _: Annotated[None, Depends(get_websocket_token)],
+    task_id: str,
+):
+    """WebSocket: sends the current state first, then the final one."""
+    subprotocol = (
+        WEBSOCKET_PROTOCOL
+        if WEBSOCKET_PROTOCOL in websocket.scope.get("subprotocols", [])
+        else None
+    )
+    await websocket.accept(subprotocol=subprotocol)
+    try:
+        response = await _wait_for_task(task_id, 0)
+        await websocket.send_json(response.model_dump())
+        if response.status not in states.READY_STATES:
+            response = await _wait_for_task(task_id, TASK_WAIT_MAX_TIMEOUT)
+            await websocket.send_json(response.model_dump())
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Client stopped waiting for task {task_id}")
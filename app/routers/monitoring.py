@@ -0,0 +1,34 @@
+"""Endpoint definition for runtime statistics of in-process components"""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from app.middleware import get_bearer_token
+from app.core.celery_client import CeleryClient
+from app.core.dvc_client import DVCClient
+from app.core.feedback_buffer import FeedbackBuffer
+from app.core.prediction_batcher import PredictionBatcher
+from app.core.prediction_cache import PredictionCache
+from app.core.task_events import TaskEventListener
+from app.core.training_registry import TrainingRegistry
+
+
+router = APIRouter(
+    prefix="/api/monitoring",
+)
+
+
+@router.get("/stats", tags=["Monitoring"])
+def stats_endpoint(_: Annotated[None, Depends(get_bearer_token)]):
+    """Stats Endpoint"""
+    return {
+        "prediction_batcher": PredictionBatcher().stats(),
+        "prediction_cache": PredictionCache().stats(),
+        "feedback_buffer": FeedbackBuffer().stats(),
+        "task_status_cache": CeleryClient().cache_stats(),
+        "admission": CeleryClient().admission.stats(),
+        "task_events": TaskEventListener().stats(),
+        "training_registry": TrainingRegistry().stats(),
+        "disk_cache": DVCClient().cache_stats(),
+    }
@@ -1,6 +1,6 @@
 """Define all needed Request/Response endpoints schemas here."""
 
-from typing import Any, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -157,6 +157,14 @@ class UserInputRequest(BaseModel):
         serialization_alias="native-country",
     )
 
+    @classmethod
+    def columns(cls) -> List[str]:
+        """Column names of the model features as used in datasets and payloads."""
+        return [
+            field.serialization_alias or name
+            for name, field in cls.model_fields.items()
+        ]
+
 
 class FeedbackInputRequest(UserInputRequest):
     task_id: str
@@ -169,6 +177,17 @@ class FileMetadataResponse(BaseModel):
     columns: List[str]
 
 
+class DatasetMetadataResponse(BaseModel):
+    dataset: str
+    object: Optional[Dict[str, Any]] = None
+    profile: Optional[Dict[str, Any]] = None
+    stale: bool = False
+
+
+class TaskCheckRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, description="Task ids to check")
+
+
 class AsyncTaskResponse(BaseModel):
     id: str
     status: str
@@ -2,16 +2,23 @@ import json
 
 import pandas as pd
 
+from app.core.profile import DatasetProfile
 
-def retrieve_metadata(data: pd.DataFrame) -> str:
-    metadata = {}
 
-    for col in data.columns:
-        metadata[col] = data[col].dropna().unique().tolist()  # type: ignore
-    return json.dumps(metadata)
+def retrieve_metadata(data: pd.DataFrame) -> str:
+    """Bounded summary of every column, see `DatasetProfile.summary`"""
+    return json.dumps(DatasetProfile().update(data).summary())
 
 
 def get_metadata(client, bucket: str, object_name: str) -> dict:
-    return client.get_object_attributes(
-        Bucket=bucket, Key=object_name, ObjectAttributes=["Metadata"]
-    )
+    """Size, type, version and user metadata of an object, without downloading it"""
+    response = client.head_object(Bucket=bucket, Key=object_name)
+    return {
+        "key": object_name,
+        "size": response["ContentLength"],
+        "content_type": response.get("ContentType"),
+        "etag": response["ETag"],
+        "version_id": response.get("VersionId"),
+        "last_modified": response["LastModified"].isoformat(),
+        "metadata": response.get("Metadata", {}),
+    }
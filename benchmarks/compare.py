@@ -0,0 +1,64 @@
+"""Compares two benchmark result files, e.g. of two commits.
+
+Every timing or throughput found in both files is listed with its ratio, new
+divided by old; latencies above 1 and throughputs below 1 are regressions.
+
+Usage: python -m benchmarks.compare old.json new.json --threshold 1.1
+"""
+
+import argparse
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+METRICS = ("median_ms", "p50_ms", "p99_ms", "throughput_rps", "mb_per_s")
+HIGHER_IS_BETTER = ("throughput_rps", "mb_per_s")
+
+
+def metrics(results: Any, path: str = "") -> Iterator[Tuple[str, float]]:
+    if not isinstance(results, dict):
+        return
+    for key, value in results.items():
+        name = f"{path}.{key}" if path else key
+        if key in METRICS and isinstance(value, (int, float)):
+            yield name, float(value)
+        else:
+            yield from metrics(value, name)
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> dict:
+    old_metrics = dict(metrics(old))
+    rows = {}
+    for name, value in metrics(new):
+        if not old_metrics.get(name):
+            continue
+        ratio = value / old_metrics[name]
+        worse = 1 / ratio if name.endswith(HIGHER_IS_BETTER) else ratio
+        rows[name] = {
+            "old": old_metrics[name],
+            "new": value,
+            "ratio": ratio,
+            "regression": worse > threshold,
+        }
+    return rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("old")
+    arg_parser.add_argument("new")
+    arg_parser.add_argument("--threshold", type=float, default=1.1)
+    args = arg_parser.parse_args()
+
+    with (
+        open(args.old, encoding="utf-8") as old,
+        open(args.new, encoding="utf-8") as new,
+    ):
+        old_results, new_results = json.load(old), json.load(new)
+
+    rows = compare(old_results, new_results, args.threshold)
+    for name, row in rows.items():
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{name:60} {row['old']:12.2f} {row['new']:12.2f} {row['ratio']:6.2f} {flag}"
+        )
+    raise SystemExit(any(row["regression"] for row in rows.values()))
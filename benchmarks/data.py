@@ -0,0 +1,28 @@
+"""Synthetic census-like data matching the `UserInputRequest` schema."""
+
+import typing
+
+import numpy as np
+import pandas as pd
+from annotated_types import Ge, Le
+
+from app.schemas import UserInputRequest
+
+
+def make_census_frame(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Draws `rows` random, valid model inputs (one column per schema field)"""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, field in UserInputRequest.model_fields.items():
+        column = field.serialization_alias or name
+        if typing.get_origin(field.annotation) is typing.Literal:
+            columns[column] = rng.choice(typing.get_args(field.annotation), size=rows)
+            continue
+
+        low = next(m.ge for m in field.metadata if isinstance(m, Ge))
+        high = next(m.le for m in field.metadata if isinstance(m, Le))
+        if field.annotation is int:
+            columns[column] = rng.integers(low, high, size=rows, endpoint=True)
+        else:
+            columns[column] = rng.uniform(low, high, size=rows).round(0)
+    return pd.DataFrame(columns)
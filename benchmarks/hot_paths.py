@@ -0,0 +1,59 @@
+"""Micro-benchmarks of the `DataFactory` conversions and `retrieve_metadata`.
+
+Usage: python -m benchmarks.hot_paths --rows 1000 --rows 100000 --output hot_paths.json
+"""
+
+import io
+
+from app.core.data_factory import DataFactory
+from app.core.dataset_schema import DatasetSchema
+from app.schemas import UserInputRequest
+from app.utils import retrieve_metadata
+from benchmarks.data import make_census_frame
+from benchmarks.utils import environment, parser, report, timeit
+
+
+def run(rows: int, repeat: int) -> dict:
+    df = make_census_frame(rows)
+    records = df.to_dict("records")
+    csv = df.to_csv(index=False).encode()
+    parquet = io.BytesIO()
+    df.to_parquet(parquet, index=False)
+    schema = DatasetSchema.from_model(UserInputRequest)
+    half = len(df) // 2
+
+    cases = {
+        "from_records": lambda: DataFactory.from_records(records),
+        "to_columns": lambda: DataFactory.to_columns(df),
+        "from_bytes_csv": lambda: DataFactory.from_bytes("data.csv", csv, schema),
+        "from_bytes_parquet": lambda: DataFactory.from_bytes(
+            "data.parquet", parquet.getvalue(), schema
+        ),
+        "iter_chunks_csv": lambda: list(
+            DataFactory.iter_chunks(
+                "data.csv", io.BytesIO(csv), chunksize=10_000, schema=schema
+            )
+        ),
+        "merge_dfs": lambda: DataFactory.merge_dfs(
+            df.iloc[:half], df.iloc[half // 2 :]
+        ),
+        "retrieve_metadata": lambda: retrieve_metadata(df),
+    }
+    return {name: timeit(func, repeat) for name, func in cases.items()}
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--rows", type=int, action="append")
+    args = arg_parser.parse_args()
+
+    report(
+        {
+            **environment(),
+            "results": {
+                str(rows): run(rows, args.repeat)
+                for rows in args.rows or [1000, 100_000]
+            },
+        },
+        args.output,
+    )
@@ -0,0 +1,140 @@
+"""Latency and throughput of the API under concurrent load.
+
+Boots the app of main.py against the stand-ins of `benchmarks.standins` and
+sends `--requests` requests per endpoint from `--concurrency` concurrent clients
+through an in-process ASGI transport. Predictions are all distinct, so none is
+served from the prediction cache.
+
+Predictions wait for the orchestrator reply with `AsyncResult.get`, which polls
+the result backend every 0.5 s. Their latency (p50 of about 500 ms) measures
+that interval, not the API.
+
+Usage: python -m benchmarks.load --concurrency 1 --concurrency 32 --output load.json
+"""
+
+import asyncio
+import io
+import itertools
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import httpx
+
+from app.schemas import UserInputRequest
+from benchmarks import standins
+from benchmarks.data import make_census_frame
+from benchmarks.utils import environment, parser, report
+
+
+NOTES = {
+    "predict": "Latency is bound by the 0.5 s result polling interval of "
+    "AsyncResult.get, not by the API"
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def request_bodies(rows: int) -> List[Dict[str, Any]]:
+    """Distinct `UserInputRequest` bodies, keyed by field name instead of alias"""
+    columns = {
+        field.serialization_alias or name: name
+        for name, field in UserInputRequest.model_fields.items()
+    }
+    return make_census_frame(rows).rename(columns=columns).to_dict("records")
+
+
+async def drive(
+    send: Callable[[int], Awaitable[httpx.Response]], requests: int, concurrency: int
+) -> Dict[str, Any]:
+    """Sends `requests` requests from `concurrency` workers and times each one"""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while (i := next(counter)) < requests:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.is_error
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies),
+    }
+
+
+async def run(concurrency: List[int], requests: int, upload_rows: int) -> dict:
+    from main import app
+
+    inputs = iter(request_bodies(requests * len(concurrency) * 2))
+    upload = io.BytesIO()
+    make_census_frame(upload_rows).to_csv(upload, index=False)
+    task_ids: List[str] = []
+
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://benchmark",
+            headers=standins.AUTH_HEADERS,
+            timeout=None,
+        ) as client,
+    ):
+
+        async def predict(_: int) -> httpx.Response:
+            response = await client.post("/api/models/predict", json=next(inputs))
+            task_ids.append(response.json().get("id", ""))
+            return response
+
+        async def check(i: int) -> httpx.Response:
+            ids = [task_ids[(i + j) % len(task_ids)] for j in range(10)]
+            return await client.post("/api/tasks/check", json={"ids": ids})
+
+        async def upload_file(i: int) -> httpx.Response:
+            files = {"file": ("data.csv", upload.getvalue(), "text/csv")}
+            return await client.post("/api/data-management/upload/file", files=files)
+
+        async def upload_feedback(i: int) -> httpx.Response:
+            feedback = {**next(inputs), "task_id": f"task-{i}", "income": "<=50K"}
+            return await client.post(
+                "/api/data-management/upload/feedback", json=feedback
+            )
+
+        endpoints = {
+            "predict": predict,
+            "tasks_check": check,
+            "upload_file": upload_file,
+            "upload_feedback": upload_feedback,
+        }
+        return {
+            name: {
+                str(level): await drive(send, requests, level) for level in concurrency
+            }
+            for name, send in endpoints.items()
+        }
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--concurrency", type=int, action="append")
+    arg_parser.add_argument("--requests", type=int, default=500)
+    arg_parser.add_argument("--upload-rows", type=int, default=10000)
+    args = arg_parser.parse_args()
+
+    with standins.running():
+        results = asyncio.run(
+            run(args.concurrency or [1, 16], args.requests, args.upload_rows)
+        )
+    report({**environment(), "notes": NOTES, "results": results}, args.output)
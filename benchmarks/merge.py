@@ -0,0 +1,56 @@
+"""Deduplicating merge of a feedback batch into a history of `--rows` rows.
+
+Compares concatenating and deduplicating the whole history, as done before,
+with checking only the batch against a hash index of the history.
+
+Usage: python -m benchmarks.merge --rows 10000 --rows 1000000 --rows 10000000
+"""
+
+import numpy as np
+import pandas as pd
+
+from app.core.data_factory import DataFactory, HashIndex
+from benchmarks.data import make_census_frame
+from benchmarks.utils import parser, report, timeit
+
+
+def run(rows: int, batch: int, repeat: int) -> dict:
+    history = make_census_frame(rows)
+    history["task_id"] = np.arange(rows)
+    # A tenth of the batch repeats feedback already in the history.
+    new = make_census_frame(batch, seed=7)
+    new["task_id"] = np.arange(rows - batch // 10, rows - batch // 10 + batch)
+
+    index = HashIndex(HashIndex.hash_rows(history, ["task_id"]))
+
+    def incremental():
+        # Loaded as during compaction, every repetition starts from the history.
+        DataFactory.merge_dfs(new, key=["task_id"], index=HashIndex.loads(data))
+
+    data = index.dumps()
+    return {
+        "index_bytes": len(data),
+        "build_index": timeit(
+            lambda: HashIndex(HashIndex.hash_rows(history, ["task_id"])), repeat
+        ),
+        "concat_drop_duplicates": timeit(
+            lambda: pd.concat([history, new], ignore_index=True).drop_duplicates(),
+            repeat,
+        ),
+        "incremental": timeit(incremental, repeat),
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--rows", type=int, action="append")
+    arg_parser.add_argument("--batch", type=int, default=10_000)
+    args = arg_parser.parse_args()
+
+    report(
+        {
+            str(rows): run(rows, args.batch, args.repeat)
+            for rows in args.rows or [10_000, 1_000_000]
+        },
+        args.output,
+    )
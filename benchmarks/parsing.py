@@ -0,0 +1,50 @@
+"""Parse time and memory of uploaded CSV files with and without the dataset schema.
+
+Usage: python -m benchmarks.parsing --rows 48842 --rows 1000000
+"""
+
+import io
+
+import pandas as pd
+
+from app.core.data_factory import DataFactory
+from app.core.dataset_schema import DatasetSchema
+from app.schemas import UserInputRequest
+from benchmarks.data import make_census_frame
+from benchmarks.utils import parser, report, timeit
+
+
+def run(rows: int, repeat: int) -> dict:
+    buffer = io.StringIO()
+    make_census_frame(rows).to_csv(buffer, index=False)
+    data = buffer.getvalue().encode()
+    schema = DatasetSchema.from_model(UserInputRequest)
+
+    parsers = {
+        "pandas_infer": lambda: pd.read_csv(io.BytesIO(data)),
+        "arrow_schema": lambda: DataFactory.from_bytes("data.csv", data, schema=schema),
+        "arrow_schema_table": lambda: DataFactory.from_bytes(
+            "data.csv", data, schema=schema, as_arrow=True
+        ),
+    }
+    results = {"csv_bytes": len(data)}
+    for name, parse in parsers.items():
+        parsed = parse()
+        results[name] = {
+            "memory_bytes": int(parsed.memory_usage(deep=True).sum())
+            if isinstance(parsed, pd.DataFrame)
+            else parsed.nbytes,
+            "parse": timeit(parse, repeat),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--rows", type=int, action="append")
+    args = arg_parser.parse_args()
+
+    report(
+        {str(rows): run(rows, args.repeat) for rows in args.rows or [48842]},
+        args.output,
+    )
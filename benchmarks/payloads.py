@@ -0,0 +1,60 @@
+"""Size and (de)serialization time of prediction payloads per encoding.
+
+`json` is the default payload, `compact` the msgpack payload with categorical
+inputs as codes (CELERY_PAYLOAD_ENCODING=compact).
+
+Usage: python -m benchmarks.payloads --rows 1 --rows 64 --rows 10000
+"""
+
+from kombu.serialization import dumps, loads
+
+from app.core.dataset_schema import DatasetSchema
+from app.core.payload_codec import PayloadCodec
+from app.schemas import UserInputRequest
+from benchmarks.data import make_census_frame
+from benchmarks.utils import environment, parser, report, timeit
+
+
+def run(rows: int, repeat: int) -> dict:
+    df = make_census_frame(rows)
+    data = df.to_dict("records")[0] if rows == 1 else df.to_dict(orient="list")
+    codec = PayloadCodec(DatasetSchema.from_model(UserInputRequest))
+
+    encodings = {
+        "json": ("json", lambda: {"data": data}, lambda body: body),
+        "compact": (
+            "msgpack",
+            lambda: {"data": codec.encode(data), "codebook": codec.version},
+            lambda body: codec.decode(body["data"]),
+        ),
+    }
+    results = {}
+    for name, (serializer, encode, decode) in encodings.items():
+        content_type, encoding, payload = dumps(encode(), serializer=serializer)
+        results[name] = {
+            "bytes": len(payload),
+            "dumps": timeit(lambda: dumps(encode(), serializer=serializer), repeat),
+            "loads": timeit(
+                lambda: decode(
+                    loads(payload, content_type, encoding, accept=[content_type])
+                ),
+                repeat,
+            ),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--rows", type=int, action="append")
+    args = arg_parser.parse_args()
+
+    report(
+        {
+            **environment(),
+            "results": {
+                str(rows): run(rows, args.repeat) for rows in args.rows or [1, 64]
+            },
+        },
+        args.output,
+    )
@@ -0,0 +1,39 @@
+"""Write/read time and size of DataFrames per storage format.
+
+Usage: python -m benchmarks.serializers --rows 48842 --rows 1000000
+"""
+
+from app.core.serializers import JoblibSerializer, ParquetSerializer
+from benchmarks.data import make_census_frame
+from benchmarks.utils import parser, report, timeit
+
+
+def run(rows: int, repeat: int) -> dict:
+    df = make_census_frame(rows)
+    results = {}
+    for name, serializer in {
+        "joblib": JoblibSerializer(),
+        "parquet-zstd": ParquetSerializer(),
+        "parquet-snappy": ParquetSerializer(compression="snappy"),
+    }.items():
+        data = serializer.dumps(df)
+        results[name] = {
+            "bytes": len(data),
+            "write": timeit(lambda: serializer.dumps(df), repeat),
+            "read": timeit(lambda: serializer.loads(data), repeat),
+            "read_two_columns": timeit(
+                lambda: serializer.loads(data, columns=["age", "education"]), repeat
+            ),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--rows", type=int, action="append")
+    args = arg_parser.parse_args()
+
+    report(
+        {str(rows): run(rows, args.repeat) for rows in args.rows or [48842]},
+        args.output,
+    )
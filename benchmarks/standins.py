@@ -0,0 +1,87 @@
+"""In-process stand-ins for the services the API depends on.
+
+S3 is replaced by a moto mock, Celery tasks are executed by a worker thread
+consuming from an in-memory broker, and the orchestrator workflows are replaced
+by tasks returning constant predictions, so the API can be benchmarked without
+any running service. `running` has to be entered before `main` is imported.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.constants import EnvConfig
+
+
+ENVIRONMENT = {
+    EnvConfig.API_BEARER_TOKEN.value: "benchmark",
+    EnvConfig.S3_BUCKET_NAME.value: "raw-data",
+    EnvConfig.S3_ACCESS_KEY_ID.value: "benchmark",
+    EnvConfig.S3_SECRET_ACCESS_KEY.value: "benchmark",
+    EnvConfig.S3_ENDPOINT_URL.value: "https://s3.amazonaws.com",
+    EnvConfig.CELERY_BROKER_CONNECTION.value: "memory://",
+    EnvConfig.CELERY_BACKEND_CONNECTION.value: "cache+memory://",
+    EnvConfig.TASK_EVENTS_ENABLED.value: "false",
+    EnvConfig.FEEDBACK_WAL_PATH.value: "",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+AUTH_HEADERS = {"Authorization": f"Bearer {ENVIRONMENT['API_BEARER_TOKEN']}"}
+
+
+@contextmanager
+def running(concurrency: int = 8) -> Iterator[None]:
+    """Configures the environment, mocks S3 and runs a worker with fake workflows"""
+    try:
+        from moto import mock_aws
+    except ImportError as e:
+        raise SystemExit("The stand-in for S3 needs moto: pip install moto") from e
+    from celery.contrib.testing.worker import start_worker
+
+    os.environ.update(ENVIRONMENT)
+    os.environ[EnvConfig.DISK_CACHE_DIR.value] = tempfile.mkdtemp()
+
+    from app.core.admission import PREDICTION, TRAINING
+    from app.core.celery_client import CeleryClient
+
+    app = CeleryClient().get_app()
+    # The memory transport polls its queues, once a second by default.
+    app.conf.broker_transport_options = {"polling_interval": 0.001}
+    _register_workflows(app)
+    with (
+        mock_aws(),
+        start_worker(
+            app,
+            concurrency=concurrency,
+            pool="threads",
+            # Workflows are routed to the lane queues, results to the default one.
+            queues=[
+                *set(
+                    CeleryClient().admission.queue(lane)
+                    for lane in (PREDICTION, TRAINING)
+                ),
+                app.conf.task_default_queue,
+            ],
+            perform_ping_check=False,
+        ),
+    ):
+        yield
+
+
+def _register_workflows(app) -> None:
+    @app.task(name="benchmarks.predict_result")
+    def predict_result(body: dict) -> list:
+        # Single predictions carry one value per column, batches a list.
+        age = body.get("data", {}).get("age")
+        return [0.5] * (len(age) if isinstance(age, list) else 1)
+
+    def start_workflow(body: dict) -> dict:
+        return {"result_task_id": predict_result.apply_async(args=(body,)).id}
+
+    for name in (
+        "workflows.make_prediction",
+        "workflows.make_batch_prediction",
+        "workflows.model_training",
+    ):
+        app.task(name=name)(start_workflow)
@@ -0,0 +1,124 @@
+"""Upload and download throughput of large objects, sequential and in parallel parts.
+
+Runs against the S3 configured by S3_ENDPOINT_URL/S3_ACCESS_KEY_ID/
+S3_SECRET_ACCESS_KEY (e.g. a local MinIO) or, with --moto, an in-process moto
+mock. Local stand-ins answer in microseconds, --latency-ms adds a delay to every
+request to resemble a remote object store.
+
+Usage: python -m benchmarks.transfers --moto --size-mb 256 --latency-ms 20
+"""
+
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+from app.core.multipart import MultipartWriter, download_ranges
+from benchmarks.utils import parser, report, timeit
+
+
+def make_client(latency_ms: float, concurrency: int):
+    client = boto3.client(
+        "s3",
+        endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+        aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID", "benchmark"),
+        aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY", "benchmark"),
+        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
+        config=Config(max_pool_connections=max(concurrency, 10)),
+    )
+    if latency_ms:
+        client.meta.events.register(
+            "before-send.s3.*", lambda **kwargs: time.sleep(latency_ms / 1000)
+        )
+    return client
+
+
+def run(client, bucket: str, size: int, part_size: int, concurrency: int, repeat: int):
+    data = os.urandom(size)
+    key = "benchmarks/transfers.bin"
+
+    def upload(executor=None):
+        writer = MultipartWriter(
+            client,
+            bucket,
+            key,
+            part_size=part_size,
+            executor=executor,
+            max_inflight=concurrency,
+        )
+        view = memoryview(data)
+        for offset in range(0, size, 1024**2):
+            writer.write(view[offset : offset + 1024**2])
+        writer.close()
+
+    def download(executor=None):
+        download_ranges(
+            client,
+            bucket,
+            key,
+            io.BytesIO(),
+            part_size=part_size,
+            executor=executor,
+            max_inflight=concurrency,
+        )
+
+    def download_whole():
+        client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+    results = {}
+    with ThreadPoolExecutor(concurrency) as executor:
+        for name, func in {
+            "upload_sequential": upload,
+            "upload_parallel": lambda: upload(executor),
+            "download_single_get": download_whole,
+            "download_sequential": download,
+            "download_parallel": lambda: download(executor),
+        }.items():
+            timing = timeit(func, repeat)
+            timing["mb_per_s"] = size / 1024**2 / (timing["median_ms"] / 1000)
+            results[name] = timing
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--size-mb", type=int, default=64)
+    arg_parser.add_argument("--part-size-mb", type=int, default=8)
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--latency-ms", type=float, default=0)
+    arg_parser.add_argument("--bucket", default="benchmarks")
+    arg_parser.add_argument("--moto", action="store_true")
+    args = arg_parser.parse_args()
+
+    if args.moto:
+        from moto import mock_aws
+
+        mock_aws().start()
+        os.environ.pop("S3_ENDPOINT_URL", None)
+
+    client = make_client(args.latency_ms, args.concurrency)
+    try:
+        client.create_bucket(Bucket=args.bucket)
+    except client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    report(
+        {
+            "size_bytes": args.size_mb * 1024**2,
+            "part_size_bytes": args.part_size_mb * 1024**2,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            **run(
+                client,
+                args.bucket,
+                args.size_mb * 1024**2,
+                args.part_size_mb * 1024**2,
+                args.concurrency,
+                args.repeat,
+            ),
+        },
+        args.output,
+    )
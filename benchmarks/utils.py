@@ -0,0 +1,54 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, List
+
+
+def timeit(func: Callable[[], Any], repeat: int = 5) -> Dict[str, float]:
+    """Calls `func` `repeat` times and returns wall clock stats in milliseconds"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "max_ms": max(timings),
+    }
+
+
+def parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser
+
+
+def environment() -> Dict[str, Any]:
+    """Commit and interpreter the results were measured with"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def report(results: Dict[str, Any], output=None) -> None:
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text)
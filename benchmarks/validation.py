@@ -0,0 +1,40 @@
+"""Validation of whole datasets: columnar checks against one model per row.
+
+Usage: python -m benchmarks.validation --rows 48842
+"""
+
+from pydantic import ValidationError
+
+from app.core.validation import ColumnarValidator
+from app.schemas import UserInputRequest
+from benchmarks.data import make_census_frame
+from benchmarks.utils import parser, report, timeit
+
+
+def run(rows: int, repeat: int) -> dict:
+    df = make_census_frame(rows)
+    records = df.to_dict(orient="records")
+    validator = ColumnarValidator.from_model(UserInputRequest)
+
+    def per_row():
+        for record in records:
+            try:
+                UserInputRequest.model_validate(record)
+            except ValidationError:
+                pass
+
+    return {
+        "model_validate": timeit(per_row, repeat),
+        "columnar": timeit(lambda: validator.validate(df), repeat),
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = parser(__doc__)
+    arg_parser.add_argument("--rows", type=int, action="append")
+    args = arg_parser.parse_args()
+
+    report(
+        {str(rows): run(rows, args.repeat) for rows in args.rows or [48842]},
+        args.output,
+    )
@@ -3,20 +3,95 @@
 import sys
 import os
 import logging
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.constants import EnvConfig
-from app.routers.api import router as api_router
+from app.core.celery_client import CeleryClient
+from app.core.dvc_client import DVCClient
+from app.core.feedback_buffer import (
+    FEEDBACK_PREFIX,
+    LEGACY_FEEDBACK_PATH,
+    FeedbackBuffer,
+)
+from app.core.prediction_batcher import PredictionBatcher
+from app.core.prediction_cache import PredictionCache
+from app.core.scheduler import PeriodicTask
+from app.core.task_events import TaskEventListener
+from app.middleware import BodyLimitMiddleware, TimingMiddleware
+from app.routers.api import (
+    FILEPATH,
+    LEGACY_FILEPATH,
+    UPLOAD_MAX_BYTES,
+    router as api_router,
+)
 from app.routers.health import router as health_router
+from app.routers.monitoring import router as monitoring_router
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Starts background jobs and drains in-process components on shutdown"""
+    feedback_compaction = PeriodicTask(
+        name="feedback-compaction",
+        interval=float(
+            os.getenv(EnvConfig.FEEDBACK_COMPACTION_INTERVAL_S.value, "600")
+        ),
+        func=lambda: DVCClient().compact_segments(
+            prefix=FEEDBACK_PREFIX,
+            min_segments=int(
+                os.getenv(EnvConfig.FEEDBACK_COMPACTION_MIN_SEGMENTS.value, "50")
+            ),
+            subset=["task_id"],
+            retention=float(
+                os.getenv(EnvConfig.FEEDBACK_SEGMENT_RETENTION_S.value, "172800")
+            ),
+        ),
+    )
+    feedback_buffer = FeedbackBuffer()
+    feedback_flush = PeriodicTask(
+        name="feedback-flush",
+        interval=feedback_buffer.flush_interval,
+        func=feedback_buffer.flush,
+    )
+    admission = CeleryClient().admission
+    queue_depth_sampling = PeriodicTask(
+        name="queue-depth-sampling",
+        interval=admission.sample_interval,
+        func=admission.sample,
+    )
+    await DVCClient().provision_async()
+    await DVCClient().import_legacy_log_async(LEGACY_FEEDBACK_PATH, FEEDBACK_PREFIX)
+    await DVCClient().import_legacy_dataset_async(LEGACY_FILEPATH, FILEPATH)
+    if codec := CeleryClient().codec:
+        await DVCClient().publish_codebook_async(codec)
+    TaskEventListener().subscribe(PredictionCache().on_task_finished)
+    TaskEventListener().subscribe_received(PredictionCache().on_task_received)
+    TaskEventListener().subscribe(admission.finished)
+    admission.events_alive = lambda: TaskEventListener().alive
+    TaskEventListener().start()
+    feedback_buffer.recover()
+    feedback_flush.start()
+    feedback_compaction.start()
+    queue_depth_sampling.start()
+    yield
+    await queue_depth_sampling.stop()
+    TaskEventListener().stop()
+    await feedback_compaction.stop()
+    await feedback_flush.stop()
+    await feedback_buffer.close()
+    await PredictionBatcher().close()
+
+
 app = FastAPI(
+    lifespan=lifespan,
     title="pipeline-api",
     version="1.0",
     redoc_url=None,
@@ -30,9 +105,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TimingMiddleware)
+# Room for the multipart boundaries and headers around an uploaded file
+app.add_middleware(BodyLimitMiddleware, max_bytes=UPLOAD_MAX_BYTES + 64 * 1024)
 
 app.include_router(health_router)
 app.include_router(api_router)
+app.include_router(monitoring_router)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,184 @@
+import hashlib
+import io
+import os
+import re
+from collections import Counter
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# The routers read their settings on import
+os.environ.setdefault("API_BEARER_TOKEN", "test-token")
+os.environ.setdefault("S3_BUCKET_NAME", "test-bucket")
+os.environ.setdefault("S3_ENDPOINT_URL", "http://localhost:9000")
+os.environ.setdefault("S3_ACCESS_KEY_ID", "test")
+os.environ.setdefault("S3_SECRET_ACCESS_KEY", "test")
+
+
+def client_error(code: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class _Paginator:
+    def __init__(self, client: "FakeS3") -> None:
+        self.client = client
+
+    def paginate(self, Bucket, Prefix=""):
+        self.client.calls["ListObjectsV2"] += 1
+        keys = sorted(key for key in self.client.objects if key.startswith(Prefix))
+        yield {"Contents": [{"Key": key} for key in keys]}
+
+
+class FakeS3:
+    """In-memory stand-in for the S3 calls of the DVCClient and transfer helpers
+
+    Objects of all buckets share one namespace. `calls` counts requests per
+    operation, `fail` maps operations to the error code they answer with.
+    """
+
+    def __init__(self) -> None:
+        self.objects = {}
+        self.content_types = {}
+        self.buckets = set()
+        self.uploads = {}
+        self.calls = Counter()
+        self.fail = {}
+        self.gets = 0
+
+    def _call(self, operation: str) -> None:
+        self.calls[operation] += 1
+        if code := self.fail.get(operation):
+            raise client_error(code, operation)
+
+    def _etag(self, key: str) -> str:
+        return f'"{hashlib.md5(self.objects[key]).hexdigest()}"'
+
+    def head_bucket(self, Bucket):
+        self._call("HeadBucket")
+        if Bucket not in self.buckets:
+            raise client_error("404", "HeadBucket")
+
+    def create_bucket(self, Bucket):
+        self._call("CreateBucket")
+        self.buckets.add(Bucket)
+
+    def put_bucket_versioning(self, Bucket, VersioningConfiguration):
+        self._call("PutBucketVersioning")
+
+    def put_object(
+        self, Bucket, Key, Body, ContentType=None, IfNoneMatch=None, IfMatch=None
+    ):
+        self._call("PutObject")
+        if Bucket not in self.buckets:
+            raise client_error("NoSuchBucket", "PutObject")
+        if IfNoneMatch == "*" and Key in self.objects:
+            raise client_error("PreconditionFailed", "PutObject")
+        if IfMatch and (Key not in self.objects or IfMatch != self._etag(Key)):
+            raise client_error("PreconditionFailed", "PutObject")
+        self.objects[Key] = bytes(Body)
+        self.content_types[Key] = ContentType
+        return {"ETag": self._etag(Key)}
+
+    def head_object(self, Bucket, Key):
+        self._call("HeadObject")
+        if Key not in self.objects:
+            raise client_error("404", "HeadObject")
+        return {
+            "ContentLength": len(self.objects[Key]),
+            "ContentType": self.content_types.get(Key),
+            "ETag": self._etag(Key),
+        }
+
+    def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None, **kwargs):
+        self._call("GetObject")
+        self.gets += 1
+        if Key not in self.objects:
+            raise client_error("NoSuchKey", "GetObject")
+        if IfNoneMatch and IfNoneMatch == self._etag(Key):
+            raise client_error("304", "GetObject")
+        data = self.objects[Key]
+        response = {
+            "ContentLength": len(data),
+            "ContentType": self.content_types.get(Key),
+            "ETag": self._etag(Key),
+        }
+        if Range:
+            start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", Range).groups())
+            response["ContentRange"] = (
+                f"bytes {start}-{min(end, len(data) - 1)}/{len(data)}"
+            )
+            data = data[start : end + 1]
+        response["Body"] = io.BytesIO(data)
+        return response
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        return _Paginator(self)
+
+    def delete_object(self, Bucket, Key):
+        self._call("DeleteObject")
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        self._call("DeleteObjects")
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+
+    def copy(self, CopySource, Bucket, Key, ExtraArgs=None, Config=None):
+        self._call("CopyObject")
+        self.objects[Key] = self.objects[CopySource["Key"]]
+        self.content_types[Key] = (ExtraArgs or {}).get("ContentType")
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None, **kwargs):
+        self._call("CreateMultipartUpload")
+        self.uploads[Key] = {}
+        self.content_types[Key] = ContentType
+        return {"UploadId": Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self._call("UploadPart")
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._call("CompleteMultipartUpload")
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(
+            parts[part["PartNumber"]] for part in MultipartUpload["Parts"]
+        )
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self._call("AbortMultipartUpload")
+        self.uploads.pop(UploadId, None)
+
+
+@pytest.fixture
+def s3() -> FakeS3:
+    return FakeS3()
+
+
+@pytest.fixture
+def dvc_client(monkeypatch, s3):
+    """A fresh DVCClient on `s3`, without disk cache"""
+    from app.core.dvc_client import DVCClient
+
+    monkeypatch.setattr(DVCClient, "_instance", None)
+    monkeypatch.setenv("DISK_CACHE_MAX_BYTES", "0")
+    client = DVCClient()
+    client.client = s3
+    s3.buckets.add(os.environ["S3_BUCKET_NAME"])
+    return client
+
+
+@pytest.fixture
+def api() -> TestClient:
+    """Client of the API routes, without the lifespan of `main.app`"""
+    from app.routers.api import router
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(
+        app, headers={"Authorization": f"Bearer {os.environ['API_BEARER_TOKEN']}"}
+    )
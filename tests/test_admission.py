@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from celery import Celery
+
+from app.core.admission import (
+    PREDICTION,
+    TRAINING,
+    AdmissionController,
+    AdmissionRejected,
+)
+
+
+def make_controller(**kwargs) -> AdmissionController:
+    app = Celery("test", broker="memory://")
+    queues = {PREDICTION: "predictions", TRAINING: "training"}
+    return AdmissionController(app, queues, **kwargs)
+
+
+def test_inflight_limit_per_lane():
+    controller = make_controller(max_inflight=2)
+    for task_id in ("a", "b"):
+        token = controller.admit(PREDICTION)
+        controller.dispatched(PREDICTION, token, task_id)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(PREDICTION)
+    assert rejected.value.retry_after > 0
+    controller.admit(TRAINING)
+
+    controller.finished("a", "SUCCESS")
+    controller.admit(PREDICTION)
+    assert controller.stats()["lanes"][PREDICTION]["rejected"] == 1
+
+
+def test_queue_depth_limit():
+    controller = make_controller(max_queue_depth=2, sample_interval=60)
+    # Stale or missing samples don't reject anything
+    controller.admit(PREDICTION)
+
+    controller.sample()
+    assert controller.stats()["lanes"][PREDICTION]["queue_depth"] == 0
+    controller.dispatched(PREDICTION, controller.admit(PREDICTION), "a")
+    controller.dispatched(PREDICTION, controller.admit(PREDICTION), "b")
+    with pytest.raises(AdmissionRejected):
+        controller.admit(PREDICTION)
+    controller.admit(TRAINING)
+
+    # Both messages were consumed since
+    controller.sample()
+    controller.admit(PREDICTION)
+    assert controller.stats()["lanes"][PREDICTION]["drain_rate"] > 0
+
+
+def test_admitted_tasks_hold_their_slot():
+    controller = make_controller(max_inflight=1, max_queue_depth=1, sample_interval=60)
+    controller.sample()
+    token = controller.admit(PREDICTION)
+    # Not published yet, the slot is taken all the same
+    with pytest.raises(AdmissionRejected):
+        controller.admit(PREDICTION)
+
+    controller.release(PREDICTION, token)
+    lane = controller.stats()["lanes"][PREDICTION]
+    assert (lane["inflight"], lane["queue_depth"]) == (0, 0)
+
+    token = controller.admit(PREDICTION)
+    controller.dispatched(PREDICTION, token, "orchestrator")
+    controller.dispatched(PREDICTION, "orchestrator", "result")
+    controller.finished("orchestrator", "SUCCESS")
+    assert controller.stats()["lanes"][PREDICTION]["inflight"] == 1
+    controller.finished("result", "SUCCESS")
+    assert controller.stats()["lanes"][PREDICTION]["inflight"] == 0
+
+
+def test_slots_expire_sooner_without_events(monkeypatch):
+    controller = make_controller(max_inflight=1, fallback_ttl=0.05)
+    controller.dispatched(PREDICTION, controller.admit(PREDICTION), "a")
+
+    controller.events_alive = lambda: True
+    time.sleep(0.06)
+    with pytest.raises(AdmissionRejected):
+        controller.admit(PREDICTION)
+
+    # Events are disabled or their receiver disconnected
+    controller.events_alive = lambda: False
+    controller.admit(PREDICTION)
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.schemas import UserInputRequest
+from benchmarks.compare import compare, metrics
+from benchmarks.load import drive, percentile, request_bodies
+
+
+def test_percentile_interpolates_between_values():
+    values = [float(value) for value in range(1, 102)]
+
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 99) == 100.0
+    assert percentile([1.0, 2.0], 50) == pytest.approx(1.5)
+
+
+def test_request_bodies_are_distinct_valid_inputs():
+    bodies = request_bodies(20)
+
+    assert len(bodies) == 20
+    for body in bodies:
+        UserInputRequest.model_validate(body)
+    assert len({tuple(sorted(body.items())) for body in bodies}) == 20
+
+
+def test_drive_sends_every_request_with_bounded_concurrency():
+    sent, running, peak = [], 0, 0
+
+    async def send(i: int) -> httpx.Response:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        sent.append(i)
+        return httpx.Response(500 if i % 10 == 0 else 200)
+
+    results = asyncio.run(drive(send, requests=50, concurrency=4))
+
+    assert sorted(sent) == list(range(50))
+    assert peak == 4
+    assert results["requests"] == 50
+    assert results["errors"] == 5
+    assert results["throughput_rps"] > 0
+    assert 0 < results["p50_ms"] <= results["p99_ms"] <= results["max_ms"]
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    old = {
+        "commit": "a",
+        "results": {
+            "predict": {"1": {"p99_ms": 10.0, "throughput_rps": 100.0, "errors": 0}},
+            "upload_file": {"1": {"p99_ms": 10.0, "throughput_rps": 100.0}},
+        },
+    }
+    new = {
+        "commit": "b",
+        "results": {
+            "predict": {"1": {"p99_ms": 10.5, "throughput_rps": 80.0, "errors": 3}},
+            "upload_file": {"1": {"p99_ms": 20.0, "throughput_rps": 100.0}},
+            "tasks_check": {"1": {"p99_ms": 5.0}},
+        },
+    }
+
+    assert dict(metrics(old)) == {
+        "results.predict.1.p99_ms": 10.0,
+        "results.predict.1.throughput_rps": 100.0,
+        "results.upload_file.1.p99_ms": 10.0,
+        "results.upload_file.1.throughput_rps": 100.0,
+    }
+    rows = compare(old, new, threshold=1.1)
+    # Metrics missing from the old results can't be compared
+    assert set(rows) == set(dict(metrics(old)))
+    assert {name for name, row in rows.items() if row["regression"]} == {
+        "results.predict.1.throughput_rps",
+        "results.upload_file.1.p99_ms",
+    }
+    assert rows["results.upload_file.1.p99_ms"]["ratio"] == 2.0
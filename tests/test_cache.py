@@ -0,0 +1,31 @@
+from app.core.cache import MISSING, TTLCache
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = TTLCache(timer=clock)
+    cache.set("pending", "PENDING", ttl=1)
+    cache.set("done", "SUCCESS")
+
+    clock.now = 2
+    assert cache.get("pending") is MISSING
+    assert cache.get("done") == "SUCCESS"
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
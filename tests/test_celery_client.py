@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from celery import states
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+
+from app.core.admission import PREDICTION, AdmissionController, AdmissionRejected
+from app.core.celery_client import CeleryClient
+
+
+class FakeResult:
+    def __init__(self, value=None, error=None) -> None:
+        self.id = "task-id"
+        self.value, self.error = value, error
+        self.threads = []
+
+    def get(self, timeout):
+        self.threads.append(threading.current_thread().name)
+        if self.error:
+            raise self.error
+        return self.value
+
+
+def test_dispatch_and_wait_run_off_the_event_loop(monkeypatch):
+    celery_client = CeleryClient()
+    result = FakeResult(value={"result_task_id": "result-id"})
+    published = []
+
+    def publish(task, name, queue):
+        published.append((name, queue, threading.current_thread().name))
+        return result
+
+    monkeypatch.setattr(celery_client, "_publish", publish)
+
+    async def dispatch():
+        workflow = await celery_client.submit("workflows.x", queue="tasks")
+        return await celery_client.wait_for(workflow)
+
+    assert asyncio.run(dispatch()) == {"result_task_id": "result-id"}
+    ((name, queue, thread),) = published
+    assert (name, queue) == ("workflows.x", "tasks")
+    assert thread.startswith("celery-client")
+    assert result.threads[0].startswith("celery-client")
+
+
+def test_wait_for_raises_on_timeout():
+    result = FakeResult(error=CeleryTimeoutError())
+    with pytest.raises(CeleryTimeoutError):
+        asyncio.run(CeleryClient().wait_for(result, timeout=0.01))
+
+
+def test_concurrent_workflows_respect_the_inflight_limit(monkeypatch):
+    celery_client = CeleryClient()
+    monkeypatch.setattr(
+        celery_client,
+        "admission",
+        AdmissionController(
+            celery_client.get_app(), {PREDICTION: "predictions"}, max_inflight=3
+        ),
+    )
+    published = []
+
+    def publish(task, name, queue):
+        # Slow enough for every request to be admitted before any was published
+        time.sleep(0.05)
+        published.append(name)
+        result = FakeResult()
+        result.id = f"task-{len(published)}"
+        return result
+
+    monkeypatch.setattr(celery_client, "_publish", publish)
+
+    async def dispatch():
+        return await asyncio.gather(
+            *(
+                celery_client.start_workflow("workflows.x", PREDICTION, {}, wait=False)
+                for _ in range(10)
+            ),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(dispatch())
+    assert sorted(r for r in results if isinstance(r, str)) == [
+        "task-1",
+        "task-2",
+        "task-3",
+    ]
+    assert sum(isinstance(r, AdmissionRejected) for r in results) == 7
+    assert celery_client.admission.stats()["lanes"][PREDICTION]["inflight"] == 3
+
+
+def test_failed_publish_releases_its_slot(monkeypatch):
+    celery_client = CeleryClient()
+    monkeypatch.setattr(
+        celery_client,
+        "admission",
+        AdmissionController(
+            celery_client.get_app(), {PREDICTION: "predictions"}, max_inflight=1
+        ),
+    )
+
+    def publish(task, name, queue):
+        raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(celery_client, "_publish", publish)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(
+                celery_client.start_workflow("workflows.x", PREDICTION, {}, wait=False)
+            )
+    assert celery_client.admission.stats()["lanes"][PREDICTION]["inflight"] == 0
+
+
+def test_observed_finished_tasks_release_their_slot(monkeypatch):
+    celery_client = CeleryClient()
+    admission = AdmissionController(
+        celery_client.get_app(), {PREDICTION: "predictions"}, max_inflight=1
+    )
+    monkeypatch.setattr(celery_client, "admission", admission)
+    monkeypatch.setattr(
+        celery_client,
+        "_fetch_task_metas",
+        lambda task_ids: {
+            task_id: {"status": states.SUCCESS, "result": 1} for task_id in task_ids
+        },
+    )
+    admission.dispatched(PREDICTION, admission.admit(PREDICTION), "observed-task")
+    with pytest.raises(AdmissionRejected):
+        admission.admit(PREDICTION)
+
+    # No finish event arrives, the client polls the task instead
+    assert celery_client.get_states(["observed-task"])["observed-task"][0] == (
+        states.SUCCESS
+    )
+    admission.admit(PREDICTION)
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+from app.core.data_factory import DataFactory, HashIndex, MergeReport
+
+
+def test_merge_dfs_dedups_on_key_against_index():
+    index, report = HashIndex(), MergeReport()
+    history = pd.DataFrame({"task_id": ["a", "b"], "label": [0, 1]})
+    DataFactory.merge_dfs(history, key=["task_id"], index=index)
+
+    new = pd.DataFrame({"task_id": ["b", "c", "c"], "label": [0, 1, 0]})
+    merged = DataFactory.merge_dfs(
+        new, key=["task_id"], index=HashIndex.loads(index.dumps()), report=report
+    )
+
+    assert merged.to_dict(orient="list") == {"task_id": ["c"], "label": [1]}
+    assert report == MergeReport(added=1, dropped=2)
+
+
+def test_merge_dfs_rejects_unknown_key():
+    with pytest.raises(ValueError):
+        DataFactory.merge_dfs(pd.DataFrame({"a": [1]}), key=["task_id"])
@@ -0,0 +1,42 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.data_factory import DataFactory
+from app.core.dataset_schema import DatasetSchema
+from app.schemas import UserInputRequest
+
+
+def test_schema_from_model():
+    schema = DatasetSchema.from_model(UserInputRequest)
+    assert schema.columns["gender"].categories == ("Male", "Female")
+    assert (schema.columns["age"].ge, schema.columns["age"].le) == (16, 91)
+    assert schema.columns["hours-per-week"].kind == "int"
+
+
+def test_from_bytes_applies_schema():
+    schema = DatasetSchema.from_model(UserInputRequest)
+    data = b"age,gender,hours-per-week,income\n30,Male,40,>50K\n45,Unknown,20,<=50K\n"
+
+    df = DataFactory.from_bytes("data.csv", data, schema=schema)
+    assert list(df["gender"].cat.categories) == ["Male", "Female"]
+    assert df["gender"].isna().tolist() == [False, True]
+    assert df["hours-per-week"].dtype == "int64"
+    assert df["income"].tolist() == [">50K", "<=50K"]
+
+    table = DataFactory.from_bytes("data.csv", data, schema=schema, as_arrow=True)
+    assert isinstance(table, pa.Table)
+    assert pa.types.is_dictionary(table.schema.field("gender").type)
+
+
+def test_iter_chunks_applies_schema():
+    schema = DatasetSchema.from_model(UserInputRequest)
+    buffer = io.BytesIO()
+    pd.DataFrame({"age": ["30", "45"], "race": ["White", "Black"]}).to_parquet(buffer)
+    buffer.seek(0)
+
+    chunks = list(DataFactory.iter_chunks("data.parquet", buffer, 1, schema=schema))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert chunks[0]["age"].dtype == "float64"
+    assert chunks[0]["race"].dtype == "category"
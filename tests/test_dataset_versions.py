@@ -0,0 +1,75 @@
+import hashlib
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.dvc_client import CACHE_PREFIX
+
+
+FRAME = pd.DataFrame({"age": [20.0, 40.0], "gender": ["Male", "Female"]})
+
+
+def test_version_is_content_addressed(dvc_client, s3):
+    version = dvc_client.save_version([FRAME], "data.parquet")
+
+    assert version.created
+    assert version.key.startswith(CACHE_PREFIX)
+    assert hashlib.md5(s3.objects[version.key]).hexdigest() == version.md5
+    assert version.size == len(s3.objects[version.key])
+    assert dvc_client.read_pointer("data.parquet")["path"] == version.key
+    pd.testing.assert_frame_equal(dvc_client.read_data_from(version.key), FRAME)
+    assert not [key for key in s3.objects if key.startswith("staging/")]
+
+
+def test_identical_upload_is_deduplicated(dvc_client, s3):
+    first = dvc_client.save_version([FRAME], "data.parquet")
+    s3.calls.clear()
+
+    # Same rows, other chunking: the stored bytes and so the version are equal
+    second = dvc_client.save_version(
+        [pa.Table.from_pandas(FRAME, preserve_index=False)], "data.parquet"
+    )
+    assert second.md5 == first.md5 and not second.created
+    assert s3.calls["CopyObject"] == 0
+    assert len([key for key in s3.objects if key.startswith(CACHE_PREFIX)]) == 1
+
+
+def test_new_content_moves_the_pointer(dvc_client, s3):
+    first = dvc_client.save_version([FRAME], "data.parquet")
+    second = dvc_client.save_version([FRAME.iloc[:1]], "data.parquet")
+
+    assert second.md5 != first.md5 and second.created
+    assert dvc_client.read_pointer("data.parquet")["md5"] == second.md5
+    # Earlier versions stay available for runs that pinned them
+    assert first.key in s3.objects
+
+
+def test_failed_upload_keeps_the_pointer(dvc_client, s3):
+    first = dvc_client.save_version([FRAME], "data.parquet")
+    s3.fail["PutObject"] = "InternalError"
+
+    assert dvc_client.save_version([FRAME.iloc[:1]], "data.parquet") is None
+    assert dvc_client.read_pointer("data.parquet")["md5"] == first.md5
+
+
+def test_missing_profile_is_written_on_reupload(dvc_client, s3, api, monkeypatch):
+    from benchmarks.data import make_census_frame
+
+    data = make_census_frame(10).to_csv(index=False).encode()
+    write_profile = dvc_client.write_profile
+    monkeypatch.setattr(dvc_client, "write_profile", lambda *args, **kwargs: False)
+
+    def upload():
+        response = api.post(
+            "/api/data-management/upload/file", files={"file": ("data.csv", data)}
+        )
+        assert response.status_code == 200
+        return dvc_client.read_pointer("data.parquet")["path"]
+
+    key = upload()
+    assert f"{key}.profile.json" not in s3.objects
+
+    # Same content, the version exists but its profile is still missing
+    monkeypatch.setattr(dvc_client, "write_profile", write_profile)
+    assert upload() == key
+    assert f"{key}.profile.json" in s3.objects
@@ -0,0 +1,42 @@
+from app.core.disk_cache import DiskCache
+
+
+def _store(cache: DiskCache, key: str, etag: str, data: bytes):
+    path = cache.temp_path()
+    with open(path, "wb") as file:
+        file.write(data)
+    return cache.commit("bucket", key, etag, path)
+
+
+def test_lru_eviction_and_etag_replacement(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    _store(cache, "a", '"1"', b"aaaa")
+    _store(cache, "b", '"1"', b"bbbb")
+    cache.hit("bucket", "a")
+    _store(cache, "c", '"1"', b"cccc")
+
+    assert cache.lookup("bucket", "b") is None
+    etag, path = cache.lookup("bucket", "a")
+    assert etag == '"1"' and open(path, "rb").read() == b"aaaa"
+
+    _store(cache, "a", '"2"', b"AA")
+    assert cache.lookup("bucket", "a")[0] == '"2"'
+    assert len(list(tmp_path.iterdir())) == 2
+    assert DiskCache(str(tmp_path), max_bytes=10).stats()["size_bytes"] == 6
+
+
+def test_objects_larger_than_cache_are_not_stored(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=3)
+    assert _store(cache, "a", '"1"', b"aaaa") is None
+    assert cache.lookup("bucket", "a") is None
+
+
+def test_pinned_file_outlives_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=4)
+    stored = _store(cache, "a", '"1"', b"aaaa")
+    pinned = cache.pin(stored)
+    _store(cache, "b", '"1"', b"bbbb")
+
+    assert cache.lookup("bucket", "a") is None
+    assert open(pinned, "rb").read() == b"aaaa"
+    assert cache.pin(stored) is None
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+
+import pandas as pd
+
+
+BUCKET = os.environ["S3_BUCKET_NAME"]
+
+
+def test_bucket_is_checked_once(dvc_client, s3):
+    s3.buckets.clear()
+
+    assert dvc_client.provision()
+    assert dvc_client.provision()
+    assert BUCKET in s3.buckets
+    assert s3.calls["HeadBucket"] == 1
+    assert s3.calls["CreateBucket"] == 1
+    assert s3.calls["PutBucketVersioning"] == 1
+
+
+def test_small_object_is_one_request(dvc_client, s3):
+    assert dvc_client.provision()
+    assert dvc_client.save_data_to(pd.DataFrame({"age": [20.0]}), "data.parquet")
+    assert dvc_client.save_data_to({"a": 1}, "model.joblib")
+
+    assert s3.calls["PutObject"] == 2
+    assert s3.calls["CreateMultipartUpload"] == 0
+    # Checked on startup, uploads don't look the bucket up again
+    assert s3.calls["HeadBucket"] == 1
+
+
+def test_missing_bucket_is_created_on_upload(dvc_client, s3):
+    assert dvc_client.provision()
+    s3.buckets.clear()
+
+    assert dvc_client.save_data_to({"a": 1}, "model.joblib")
+    assert "model.joblib" in s3.objects
+    assert s3.calls["CreateBucket"] == 1
+    assert s3.calls["PutObject"] == 2
+
+
+def test_failed_upload_is_reported(dvc_client, s3):
+    s3.fail["PutObject"] = "AccessDenied"
+
+    assert not dvc_client.save_data_to({"a": 1}, "model.joblib")
+    assert s3.calls["CreateBucket"] == 0
+
+
+def test_file_evicted_before_reading_is_downloaded_again(dvc_client, s3, tmp_path):
+    from app.core.disk_cache import DiskCache
+
+    cache = DiskCache(str(tmp_path), max_bytes=1024**2)
+    dvc_client._disk_cache = cache
+    df = pd.DataFrame({"age": [20.0, 30.0]})
+    assert dvc_client.save_data_to(df, "data.parquet")
+    assert dvc_client.read_data_from("data.parquet").equals(df)
+
+    lookup = cache.lookup
+
+    def evicting_lookup(bucket_name, key):
+        # Another reader evicts the file right after it was looked up
+        cached = lookup(bucket_name, key)
+        os.remove(cached[1])
+        return cached
+
+    cache.lookup = evicting_lookup
+    gets = s3.gets
+    assert dvc_client.read_data_from("data.parquet").equals(df)
+    assert s3.gets > gets
+
+
+def test_client_is_pooled(monkeypatch):
+    from app.core.dvc_client import DVCClient
+
+    monkeypatch.setattr(DVCClient, "_instance", None)
+    monkeypatch.setenv("S3_MAX_POOL_CONNECTIONS", "7")
+    monkeypatch.setenv("S3_MAX_ATTEMPTS", "3")
+    client = DVCClient()
+
+    config = client.client.meta.config
+    assert config.max_pool_connections == 7
+    assert config.retries == {"mode": "standard", "total_max_attempts": 3}
+    assert client._executor._max_workers == 7
+    assert DVCClient() is client
+
+
+def test_blocking_calls_leave_the_event_loop(dvc_client, monkeypatch):
+    threads = []
+
+    def read_pointer(name, bucket_name=None):
+        threads.append(threading.current_thread().name)
+
+    monkeypatch.setattr(dvc_client, "read_pointer", read_pointer)
+    asyncio.run(dvc_client.read_pointer_async("data.parquet"))
+    assert threads[0].startswith("dvc-client")
@@ -0,0 +1,99 @@
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from app.core.feedback_buffer import FeedbackBuffer, FeedbackBufferFull
+
+
+@pytest.fixture
+def buffer(tmp_path, monkeypatch):
+    monkeypatch.setattr(FeedbackBuffer, "_instance", None)
+    monkeypatch.setenv("FEEDBACK_WAL_PATH", str(tmp_path / "feedback.wal"))
+    return FeedbackBuffer()
+
+
+def test_rows_survive_restart(buffer, monkeypatch):
+    buffer.add({"task_id": "a"})
+    buffer.add({"task_id": "b"})
+    # The process dies, which releases the lock of its WAL
+    buffer._wal_lock.close()
+
+    monkeypatch.setattr(FeedbackBuffer, "_instance", None)
+    restarted = FeedbackBuffer()
+    assert len(restarted) == 0
+    assert restarted.recover() == 2
+    assert restarted.stats()["depth"] == 2
+    restarted._wal_lock.close()
+
+    monkeypatch.setattr(FeedbackBuffer, "_instance", None)
+    assert FeedbackBuffer().recover() == 2
+
+
+def test_wal_of_live_process_is_not_recovered(buffer, monkeypatch):
+    buffer.add({"task_id": "a"})
+
+    monkeypatch.setattr(FeedbackBuffer, "_instance", None)
+    other = FeedbackBuffer()
+    assert other.wal_path != buffer.wal_path
+    assert other.recover() == 0
+    assert len(buffer) == 1
+
+
+@pytest.fixture
+def failing_buffer(buffer, dvc_client, s3, monkeypatch):
+    """A buffer of at most 3 rows whose flushes fail"""
+    s3.fail["PutObject"] = "ServiceUnavailable"
+    monkeypatch.setattr(buffer, "max_pending", 3)
+    return buffer
+
+
+def test_failed_flush_keeps_rows(failing_buffer):
+    failing_buffer.add({"task_id": "a"})
+    failing_buffer.add({"task_id": "b"})
+
+    assert failing_buffer.flush() == 0
+    assert len(failing_buffer) == 2
+    assert failing_buffer.stats()["failed_flushes"] == 1
+
+
+def test_unreachable_s3_keeps_rows(buffer, dvc_client, s3, monkeypatch):
+    def put_object(**kwargs):
+        raise EndpointConnectionError(endpoint_url="http://localhost:9000")
+
+    monkeypatch.setattr(s3, "put_object", put_object)
+    buffer.add({"task_id": "a"})
+
+    assert buffer.flush() == 0
+    assert len(buffer) == 1
+    assert buffer.stats()["failed_flushes"] == 1
+
+
+def test_full_buffer_rejects_rows(failing_buffer):
+    for task_id in "abc":
+        failing_buffer.add({"task_id": task_id})
+    failing_buffer.flush()
+
+    with pytest.raises(FeedbackBufferFull):
+        failing_buffer.add({"task_id": "d"})
+    assert len(failing_buffer) == 3
+
+
+def test_full_buffer_answers_503(failing_buffer, api):
+    from benchmarks.load import request_bodies
+
+    for task_id in "abc":
+        failing_buffer.add({"task_id": task_id})
+
+    feedback = {**request_bodies(1)[0], "task_id": "d", "income": "<=50K"}
+    response = api.post("/api/data-management/upload/feedback", json=feedback)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_wal_is_enabled_by_default(monkeypatch):
+    monkeypatch.setattr(FeedbackBuffer, "_instance", None)
+    monkeypatch.delenv("FEEDBACK_WAL_PATH", raising=False)
+    assert FeedbackBuffer().stats()["wal_enabled"]
+
+    monkeypatch.setattr(FeedbackBuffer, "_instance", None)
+    monkeypatch.setenv("FEEDBACK_WAL_PATH", "")
+    assert not FeedbackBuffer().stats()["wal_enabled"]
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from app.core import serializers
+
+
+FRAME = pd.DataFrame({"age": [20.0, 40.0], "gender": ["Male", "Female"]})
+
+
+def test_legacy_dataset_becomes_first_version(dvc_client, s3):
+    s3.objects["data.joblib"] = serializers.SERIALIZERS["joblib"].dumps(FRAME)
+
+    version = dvc_client.import_legacy_dataset("data.joblib", "data.parquet")
+    pointer = dvc_client.read_pointer("data.parquet")
+    assert pointer["md5"] == version.md5
+    pd.testing.assert_frame_equal(dvc_client.read_data_from(pointer["path"]), FRAME)
+    assert dvc_client.read_profile(pointer["path"]) is not None
+
+    # Once versioned, later starts leave the dataset alone
+    assert dvc_client.import_legacy_dataset("data.joblib", "data.parquet") is None
+    assert dvc_client.read_pointer("data.parquet") == pointer
+
+
+def test_nothing_to_import(dvc_client):
+    assert dvc_client.import_legacy_dataset("data.joblib", "data.parquet") is None
+    assert dvc_client.read_pointer("data.parquet") is None
+
+
+def test_training_needs_reference_data(dvc_client, api):
+    response = api.post("/api/models/train?wait=false")
+    assert response.status_code == 409
@@ -0,0 +1,49 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.middleware import BodyLimitMiddleware
+
+
+def limited_client(max_bytes: int):
+    app = FastAPI()
+    uploads = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        uploads.append(file.filename)
+        return {"size": file.size}
+
+    app.add_middleware(BodyLimitMiddleware, max_bytes=max_bytes)
+    return TestClient(app), uploads
+
+
+def test_declared_oversized_body_is_rejected_unread():
+    client, uploads = limited_client(1024)
+
+    response = client.post("/upload", files={"file": ("a.csv", b"x" * 2048)})
+    assert response.status_code == 413
+    assert client.post("/upload", files={"file": ("b.csv", b"x" * 10)}).is_success
+    assert uploads == ["b.csv"]
+
+
+def test_streamed_body_is_cut_off_at_the_limit():
+    client, uploads = limited_client(1024)
+    boundary = "limit"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; "
+        'name="file"; filename="a.csv"\r\n\r\n'
+    ).encode()
+
+    def body():
+        yield head
+        for _ in range(64):
+            yield b"x" * 512
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = client.post(
+        "/upload",
+        content=body(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert response.status_code == 413
+    assert uploads == []
@@ -0,0 +1,36 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.multipart import MultipartWriter, RangeReader, download_ranges
+
+
+def test_parallel_upload_and_ranged_download_roundtrip(s3):
+    client = s3
+    data = bytes(range(256)) * (50 * 1024)
+    with ThreadPoolExecutor(4) as executor:
+        writer = MultipartWriter(
+            client, "bucket", "key", part_size=0, executor=executor, max_inflight=3
+        )
+        for offset in range(0, len(data), 1024**2):
+            writer.write(data[offset : offset + 1024**2])
+        writer.close()
+        assert client.objects["key"] == data
+
+        file = io.BytesIO()
+        info = download_ranges(
+            client, "bucket", "key", file, 1024**2, executor, max_inflight=3
+        )
+    assert file.getvalue() == data
+    assert info["ContentLength"] == len(data) and client.gets == 13
+
+
+def test_range_reader_reads_only_requested_ranges(s3):
+    client = s3
+    client.objects["key"] = bytes(range(256)) * 4096
+    reader = RangeReader(client, "bucket", "key", min_request=1024)
+
+    reader.seek(-4, io.SEEK_END)
+    assert reader.read() == bytes([252, 253, 254, 255])
+    reader.seek(512)
+    assert reader.read(8) == bytes(range(8)) and reader.read(8) == bytes(range(8, 16))
+    assert reader.requests == 2
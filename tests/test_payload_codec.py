@@ -0,0 +1,31 @@
+from kombu.serialization import dumps
+
+from app.core.dataset_schema import DatasetSchema
+from app.core.payload_codec import PayloadCodec
+from app.schemas import UserInputRequest
+from benchmarks.data import make_census_frame
+
+
+def test_roundtrip_rows_and_batches():
+    codec = PayloadCodec(DatasetSchema.from_model(UserInputRequest))
+    df = make_census_frame(20)
+    columns = df.to_dict(orient="list")
+    row = df.to_dict("records")[0]
+
+    assert codec.decode(codec.encode(columns)) == columns
+    assert codec.decode(codec.encode(row)) == row
+    assert all(type(code) is int for code in codec.encode(columns)["workclass"])
+    assert codec.encode({"workclass": "unknown"}) == {"workclass": "unknown"}
+
+    _, _, compact = dumps(codec.encode(columns), serializer="msgpack")
+    _, _, plain = dumps(columns, serializer="json")
+    assert len(compact) < len(plain) / 2
+
+
+def test_version_follows_content():
+    codec = PayloadCodec(DatasetSchema.from_model(UserInputRequest))
+    assert (
+        codec.version
+        == PayloadCodec(DatasetSchema.from_model(UserInputRequest)).version
+    )
+    assert codec.key == f"codebooks/{codec.version}.json"
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+from app.core.celery_client import CeleryClient
+from app.core.prediction_batcher import BATCH_TASK
+from app.routers import api as api_module
+from benchmarks.data import make_census_frame
+from benchmarks.load import request_bodies
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    workflows = []
+
+    async def start_workflow(name, lane, body, wait):
+        workflows.append((name, body))
+        return "task-id"
+
+    monkeypatch.setattr(CeleryClient(), "start_workflow", start_workflow)
+    return workflows
+
+
+def test_rows_are_sent_as_one_columnar_task(api, dispatched):
+    response = api.post("/api/models/predict/batch?wait=false", json=request_bodies(3))
+    assert response.status_code == 200
+    assert response.json()["id"] == "task-id"
+
+    ((name, body),) = dispatched
+    assert name == BATCH_TASK and body["size"] == 3
+    assert all(len(values) == 3 for values in body["data"].values())
+    assert "marital-status" in body["data"]
+
+
+def test_file_rows_are_sent_as_one_columnar_task(api, dispatched):
+    csv = make_census_frame(5).to_csv(index=False).encode()
+    response = api.post(
+        "/api/models/predict/batch/file?wait=false",
+        files={"file": ("rows.csv", csv, "text/csv")},
+    )
+    assert response.status_code == 200
+    ((name, body),) = dispatched
+    assert body["size"] == 5 and len(body["data"]["age"]) == 5
+
+
+def test_batches_above_the_limit_are_rejected(api, dispatched, monkeypatch):
+    monkeypatch.setattr(api_module, "BATCH_MAX_ROWS", 2)
+    response = api.post("/api/models/predict/batch?wait=false", json=request_bodies(3))
+    assert response.status_code == 413
+    assert not dispatched
+    assert api.post("/api/models/predict/batch", json=[]).status_code == 422
+
+
+def test_file_batches_are_checked_while_reading(api, dispatched, monkeypatch):
+    monkeypatch.setattr(api_module, "BATCH_MAX_ROWS", 2)
+    parquet = io.BytesIO()
+    make_census_frame(5).to_parquet(parquet)
+
+    response = api.post(
+        "/api/models/predict/batch/file?wait=false",
+        files={"file": ("rows.parquet", parquet.getvalue())},
+    )
+    assert response.status_code == 413
+    assert not dispatched
+
+
+def test_invalid_file_rows_are_reported(api, dispatched):
+    df = make_census_frame(3)
+    df["age"] = df["age"].astype(object)
+    df.loc[1, "age"] = "unknown"
+    response = api.post(
+        "/api/models/predict/batch/file?wait=false",
+        files={"file": ("rows.csv", df.to_csv(index=False).encode())},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"]["violations"] == {"age": 1}
+    assert not dispatched
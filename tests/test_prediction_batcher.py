@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.celery_client import CeleryClient
+from app.core.prediction_batcher import (
+    PredictionBatcher,
+    compose_task_id,
+    select_row,
+    split_task_id,
+)
+
+
+def test_row_ids_roundtrip():
+    task_id = "5c76d78d-623f-4db5-9d96-65b6cb894bb1"
+    assert split_task_id(compose_task_id(task_id, 3)) == (task_id, 3)
+    assert split_task_id(task_id) == (task_id, None)
+
+
+def test_select_row():
+    assert select_row([0, 1, 2], 1) == 1
+    assert select_row([0, 1, 2], 5) is None
+    assert select_row({"label": 1}, None) == {"label": 1}
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    monkeypatch.setattr(PredictionBatcher, "_instance", None)
+    monkeypatch.setenv("PREDICTION_BATCH_WINDOW_MS", "20")
+    monkeypatch.setenv("PREDICTION_BATCH_MAX_SIZE", "3")
+    return PredictionBatcher()
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    batches = []
+
+    async def start_workflow(name, lane, body, wait):
+        batches.append(body)
+        if body["data"]["age"][0] < 0:
+            raise RuntimeError("broker down")
+        return f"batch-{len(batches)}"
+
+    monkeypatch.setattr(CeleryClient(), "start_workflow", start_workflow)
+    return batches
+
+
+def test_full_batch_is_sent_without_waiting(batcher, dispatched):
+    async def submit():
+        rows = [batcher.submit({"age": age}) for age in range(4)]
+        return await asyncio.wait_for(asyncio.gather(*rows), timeout=1)
+
+    task_ids = asyncio.run(submit())
+    # The fourth row waits for the window, the first three don't
+    assert task_ids == ["batch-1:0", "batch-1:1", "batch-1:2", "batch-2:0"]
+    assert [body["size"] for body in dispatched] == [3, 1]
+    assert dispatched[0]["data"]["age"] == [0, 1, 2]
+
+
+def test_window_flushes_partial_batch(batcher, dispatched):
+    async def submit():
+        started = time.monotonic()
+        task_ids = await asyncio.gather(*(batcher.submit({"age": a}) for a in (1, 2)))
+        return task_ids, time.monotonic() - started
+
+    task_ids, waited = asyncio.run(submit())
+    assert task_ids == ["batch-1:0", "batch-1:1"]
+    assert waited >= 0.02
+    assert batcher.stats()["batches"] == 1
+
+
+def test_failed_batch_fails_every_row(batcher, dispatched):
+    async def submit():
+        rows = [batcher.submit({"age": age}) for age in (-1, 2)]
+        return await asyncio.gather(*rows, return_exceptions=True)
+
+    errors = asyncio.run(submit())
+    assert [str(error) for error in errors] == ["broker down", "broker down"]
+    assert batcher.stats()["failed_batches"] == 1
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from celery import states
+
+from app.core.celery_client import CeleryClient
+from app.core.prediction_cache import TRAINING_WORKFLOW, PredictionCache
+
+
+@pytest.fixture
+def prediction_cache(monkeypatch):
+    monkeypatch.setattr(PredictionCache, "_instance", None)
+    monkeypatch.setenv("PREDICTION_CACHE_SIZE", "100")
+    return PredictionCache()
+
+
+@pytest.fixture
+def task_states(monkeypatch):
+    """States the CeleryClient answers with, unknown tasks are pending"""
+    task_states = {}
+
+    def get_state(task_id):
+        return task_states.get(task_id, (states.PENDING, None))
+
+    celery_client = CeleryClient()
+    monkeypatch.setattr(celery_client, "get_state", get_state)
+    monkeypatch.setattr(
+        celery_client,
+        "get_states",
+        lambda task_ids: {task_id: get_state(task_id) for task_id in task_ids},
+    )
+    return task_states
+
+
+def test_key_is_canonical_and_versioned(prediction_cache):
+    key = prediction_cache.key({"age": 30, "sex": "Male"})
+    assert key == prediction_cache.key({"sex": "Male", "age": 30})
+
+    prediction_cache.track_training("training-id")
+    prediction_cache.on_task_finished("training-id", states.SUCCESS)
+    assert prediction_cache.key({"age": 30, "sex": "Male"}) != key
+
+
+def test_training_of_other_clients_invalidates(prediction_cache, task_states):
+    # Events of a workflow started by another replica (or a scheduler)
+    prediction_cache.on_task_received("other-task", "workflows.make_prediction")
+    prediction_cache.on_task_received("workflow-id", TRAINING_WORKFLOW)
+    task_states["workflow-id"] = (states.SUCCESS, {"result_task_id": "training-id"})
+    prediction_cache.on_task_finished("workflow-id", states.SUCCESS)
+    assert prediction_cache.model_version == 0
+
+    prediction_cache.on_task_finished("training-id", states.SUCCESS)
+    assert prediction_cache.model_version == 1
+    assert prediction_cache.stats()["tracked_trainings"] == 0
+
+
+def test_failed_training_keeps_predictions(prediction_cache, task_states):
+    prediction_cache.on_task_received("workflow-id", TRAINING_WORKFLOW)
+    task_states["workflow-id"] = (states.SUCCESS, {"result_task_id": "training-id"})
+    prediction_cache.on_task_finished("workflow-id", states.SUCCESS)
+    prediction_cache.on_task_finished("training-id", states.FAILURE)
+    assert prediction_cache.model_version == 0
+
+
+def test_training_without_events_is_polled(prediction_cache, task_states):
+    prediction_cache.training_check_interval = 0
+    dispatched = []
+
+    async def dispatch():
+        dispatched.append(f"prediction-{len(dispatched)}")
+        return dispatched[-1]
+
+    async def predict():
+        return await prediction_cache.get_or_dispatch({"age": 30}, dispatch)
+
+    assert asyncio.run(predict()) == ("prediction-0", False)
+    assert asyncio.run(predict()) == ("prediction-0", True)
+
+    # Started with wait=false, nobody waited for the training task
+    prediction_cache.track_workflow("workflow-id")
+    task_states["workflow-id"] = (states.SUCCESS, {"result_task_id": "training-id"})
+    assert asyncio.run(predict()) == ("prediction-0", True)
+    task_states["training-id"] = (states.SUCCESS, None)
+    assert asyncio.run(predict()) == ("prediction-1", False)
+    assert prediction_cache.model_version == 1
+
+
+def test_cancelled_dispatch_is_taken_over_by_waiters(prediction_cache, task_states):
+    dispatched, release = [], None
+
+    async def dispatch():
+        dispatched.append(f"prediction-{len(dispatched)}")
+        if len(dispatched) == 1:
+            # The owner's client disconnects while its dispatch is going
+            await release.wait()
+        return dispatched[-1]
+
+    async def predict():
+        nonlocal release
+        release = asyncio.Event()
+        owner = asyncio.create_task(
+            prediction_cache.get_or_dispatch({"age": 30}, dispatch)
+        )
+        while not dispatched:
+            await asyncio.sleep(0.001)
+        waiter = asyncio.create_task(
+            prediction_cache.get_or_dispatch({"age": 30}, dispatch)
+        )
+        while not prediction_cache.stats()["coalesced"]:
+            await asyncio.sleep(0.001)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await asyncio.wait_for(waiter, timeout=1)
+
+    assert asyncio.run(predict()) == ("prediction-1", False)
+    assert prediction_cache._inflight == {}
+    assert prediction_cache.stats()["coalesced"] == 1
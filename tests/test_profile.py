@@ -0,0 +1,33 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.core.profile import DatasetProfile, NumericSketch
+from app.utils import retrieve_metadata
+
+
+def test_sketch_merges_to_accurate_quantiles():
+    values = np.random.default_rng(0).lognormal(10, 1, 200_000)
+    sketch = NumericSketch()
+    for part in np.array_split(values, 10):
+        partial = NumericSketch()
+        partial.update(part)
+        sketch.merge(NumericSketch.from_dict(partial.to_dict()))
+
+    assert sketch.count == len(values)
+    for q in (0.01, 0.5, 0.99):
+        assert abs(sketch.quantile(q) / np.quantile(values, q) - 1) < 0.02
+
+
+def test_profile_is_bounded_and_mergeable():
+    df = pd.DataFrame({"id": [str(i) for i in range(300)], "x": [1.0, None] * 150})
+    profile = DatasetProfile(max_categories=100).update(df)
+    profile = DatasetProfile.loads(profile.dumps()).merge(profile)
+    summary = profile.summary()
+
+    assert summary["rows"] == 600
+    assert summary["columns"]["x"]["nulls"] == 300
+    assert len(summary["columns"]["id"]["counts"]) == 100
+    assert summary["columns"]["id"]["other"] == 400
+    assert len(json.loads(retrieve_metadata(df))["columns"]["id"]["counts"]) == 100
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import json
+
+import joblib
+import pandas as pd
+
+from app.core.scheduler import PeriodicTask
+
+BUCKET = "test-bucket"
+
+
+def rows(*task_ids):
+    return pd.DataFrame({"task_id": list(task_ids), "label": [1] * len(task_ids)})
+
+
+def read_log(dvc_client, prefix="feedback"):
+    frames = [
+        dvc_client.read_data_from(key) for key in dvc_client.list_segments(prefix)
+    ]
+    return pd.concat(frames).sort_values("task_id")["task_id"].tolist()
+
+
+def test_appended_segments_are_listed_in_the_manifest(dvc_client, s3):
+    first = dvc_client.append_segment(rows("a"), "feedback", "1")
+    second = dvc_client.append_segment(rows("b"), "feedback", "2")
+    assert first.startswith("feedback/segments/date=")
+    assert sorted(dvc_client.list_segments("feedback")) == sorted([first, second])
+
+    key = dvc_client.write_manifest("feedback")
+    manifest = json.loads(s3.objects[key])
+    assert manifest["segments"] == sorted([first, second])
+    assert json.loads(s3.objects["feedback/manifest.json"])["path"] == key
+    # An unchanged log has the same manifest
+    assert dvc_client.write_manifest("feedback") == key
+
+
+def test_compaction_merges_segments_and_drops_duplicates(dvc_client, s3):
+    dvc_client.append_segment(rows("a", "b"), "feedback", "1")
+    dvc_client.append_segment(rows("b", "c"), "feedback", "2")
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+
+    (compacted,) = dvc_client.list_segments("feedback")
+    assert compacted.startswith("feedback/compacted/")
+    assert read_log(dvc_client) == ["a", "b", "c"]
+    assert "feedback/index.parquet" in s3.objects
+
+    # Rows compacted before are dropped against the index, not the history
+    dvc_client.append_segment(rows("a", "d"), "feedback", "3")
+    dvc_client.append_segment(rows("e"), "feedback", "4")
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+    assert read_log(dvc_client) == ["a", "b", "c", "d", "e"]
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 0
+
+
+def test_manifest_stays_readable_after_compaction(dvc_client, s3):
+    dvc_client.append_segment(rows("a"), "feedback", "1")
+    dvc_client.append_segment(rows("b"), "feedback", "2")
+    manifest = json.loads(s3.objects[dvc_client.write_manifest("feedback")])
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+
+    # A training run queued with the manifest reads it after the compaction
+    frames = [dvc_client.read_data_from(key) for key in manifest["segments"]]
+    assert pd.concat(frames)["task_id"].tolist() == ["a", "b"]
+    # Retired segments aren't listed next to the rows they were merged into
+    assert read_log(dvc_client) == ["a", "b"]
+
+    # Deleted by the first compaction after the retention period
+    dvc_client.append_segment(rows("c"), "feedback", "3")
+    dvc_client.compact_segments("feedback", min_segments=2, retention=0)
+    assert not set(manifest["segments"]) & set(s3.objects)
+    assert json.loads(s3.objects["feedback/retired.json"])["segments"] == {}
+    assert read_log(dvc_client) == ["a", "b", "c"]
+
+
+def test_compaction_runs_in_one_process_at_a_time(dvc_client, s3):
+    dvc_client.append_segment(rows("a"), "feedback", "1")
+    dvc_client.append_segment(rows("b"), "feedback", "2")
+    lease = dvc_client._acquire_lease(BUCKET, "feedback/compaction.lease", 60)
+    assert lease is not None
+    assert dvc_client._acquire_lease(BUCKET, "feedback/compaction.lease", 60) is None
+
+    # Another process holds the lease
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 0
+    assert len(dvc_client.list_segments("feedback")) == 2
+
+    dvc_client._release_lease(BUCKET, "feedback/compaction.lease", lease)
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+    # Released again, and an expired lease is taken over
+    assert dvc_client._acquire_lease(BUCKET, "feedback/compaction.lease", -1)
+    assert dvc_client._acquire_lease(BUCKET, "feedback/compaction.lease", 60)
+
+
+def test_legacy_log_is_moved_into_segments(dvc_client, s3):
+    legacy = io.BytesIO()
+    joblib.dump(rows("a", "b"), legacy)
+    s3.objects["retrain.joblib"] = legacy.getvalue()
+
+    assert dvc_client.import_legacy_log("retrain.joblib", "feedback") == 2
+    assert "retrain.joblib" not in s3.objects
+    assert read_log(dvc_client) == ["a", "b"]
+    assert json.loads(s3.objects["feedback/manifest.json"])["segments"]
+    assert dvc_client.import_legacy_log("retrain.joblib", "feedback") == 0
+
+
+def test_periodic_task_survives_failures():
+    calls = []
+
+    def func():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("S3 down")
+
+    async def run():
+        task = PeriodicTask("test", interval=0.01, func=func)
+        task.start()
+        await asyncio.sleep(0.1)
+        await task.stop()
+
+    asyncio.run(run())
+    assert len(calls) >= 3
+    PeriodicTask("disabled", interval=0, func=func).start()
+
+
+def test_failed_upload_keeps_segments_and_index(dvc_client, s3, monkeypatch):
+    dvc_client.append_segment(rows("a"), "feedback", "1")
+    dvc_client.append_segment(rows("b"), "feedback", "2")
+    segments = dvc_client.list_segments("feedback")
+
+    def failed_upload(chunks, destination, **kwargs):
+        list(chunks)
+        return None
+
+    # Only the compacted segment fails, index and deletes would go through
+    with monkeypatch.context() as patch:
+        patch.setattr(dvc_client, "save_chunks_to", failed_upload)
+        assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 0
+    assert dvc_client.list_segments("feedback") == segments
+    assert "feedback/index.parquet" not in s3.objects
+
+    # Nothing was marked as compacted, the rows are merged by the next run
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+    assert read_log(dvc_client) == ["a", "b"]
+
+
+def test_unreadable_segment_is_skipped_and_kept(dvc_client, s3):
+    dvc_client.append_segment(rows("a"), "feedback", "1")
+    dvc_client.append_segment(rows("b"), "feedback", "2")
+    bad = dvc_client.append_segment(rows("c"), "feedback", "3")
+    s3.objects[bad] = b"PAR1 truncated"
+
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+    compacted = [key for key in dvc_client.list_segments("feedback") if key != bad]
+    assert len(compacted) == 1 and compacted[0].startswith("feedback/compacted/")
+    assert dvc_client.read_data_from(compacted[0])["task_id"].tolist() == ["a", "b"]
+    assert bad in s3.objects
+
+
+def test_only_duplicates_drop_the_segments(dvc_client, s3):
+    dvc_client.append_segment(rows("a"), "feedback", "1")
+    dvc_client.append_segment(rows("b"), "feedback", "2")
+    dvc_client.compact_segments("feedback", subset=["task_id"])
+    dvc_client.append_segment(rows("a"), "feedback", "3")
+    dvc_client.append_segment(rows("b"), "feedback", "4")
+
+    assert dvc_client.compact_segments("feedback", subset=["task_id"]) == 2
+    assert read_log(dvc_client) == ["a", "b"]
+    assert all(
+        key.startswith("feedback/compacted/")
+        for key in dvc_client.list_segments("feedback")
+    )
+
+
+def test_append_is_one_request(dvc_client, s3):
+    dvc_client.append_segment(rows("a"), "feedback", "1")
+    assert sum(s3.calls.values()) == 1
+
+
+def test_log_profile_is_updated_by_compaction(dvc_client, s3):
+    dvc_client.append_segment(rows("a", "b"), "feedback", "1")
+    dvc_client.append_segment(rows("b", "c"), "feedback", "2")
+    assert dvc_client.read_log_profile("feedback").rows == 0
+
+    dvc_client.compact_segments("feedback", subset=["task_id"])
+    dvc_client.append_segment(rows("c", "d"), "feedback", "3")
+    dvc_client.append_segment(rows("e"), "feedback", "4")
+    dvc_client.compact_segments("feedback", subset=["task_id"])
+
+    s3.calls.clear()
+    assert dvc_client.read_log_profile("feedback").rows == 5
+    assert s3.calls["GetObject"] == 1
+
+
+def test_log_profile_is_rebuilt_from_compacted_segments(dvc_client, s3):
+    dvc_client.append_segment(rows("a", "b"), "feedback", "1")
+    dvc_client.append_segment(rows("c"), "feedback", "2")
+    dvc_client.compact_segments("feedback", subset=["task_id"])
+    del s3.objects["feedback/profile.json"]
+
+    assert dvc_client.read_log_profile("feedback").rows == 3
+    dvc_client.append_segment(rows("d"), "feedback", "3")
+    dvc_client.append_segment(rows("e"), "feedback", "4")
+    dvc_client.compact_segments("feedback", subset=["task_id"])
+    assert dvc_client.read_log_profile("feedback").rows == 5
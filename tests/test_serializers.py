@@ -0,0 +1,65 @@
+import io
+
+import joblib
+import pandas as pd
+import pytest
+
+from app.core import serializers
+
+
+def test_detects_format_of_stored_objects():
+    df = pd.DataFrame({"age": [20.0, 40.0], "gender": ["Male", "Female"]})
+
+    for name in ("parquet", "joblib"):
+        data = serializers.SERIALIZERS[name].dumps(df)
+        serializer = serializers.detect(data)
+        assert serializer.name == name
+        pd.testing.assert_frame_equal(serializer.loads(data), df)
+
+
+def test_parquet_projection_and_filters():
+    df = pd.DataFrame({"age": [20.0, 40.0], "gender": ["Male", "Female"]})
+    parquet = serializers.SERIALIZERS["parquet"]
+
+    loaded = parquet.loads(
+        parquet.dumps(df), columns=["gender"], filters=[("age", ">", 30)]
+    )
+    assert loaded["gender"].tolist() == ["Female"]
+    assert list(loaded.columns) == ["gender"]
+
+
+@pytest.mark.parametrize(
+    "compress", [0, 3, ("gzip", 3), ("bz2", 3), ("xz", 3), ("lzma", 3)]
+)
+def test_detects_compressed_joblib(compress):
+    buffer = io.BytesIO()
+    joblib.dump({"a": 1}, buffer, compress=compress)
+
+    assert serializers.detect(buffer.getvalue()).name == "joblib"
+
+
+def test_rejects_unknown_format():
+    with pytest.raises(serializers.UnknownFormatError):
+        serializers.detect(b"age,gender\n20,Male\n")
+
+
+def test_serializers_implement_the_interface():
+    with pytest.raises(TypeError):
+        serializers.Serializer()
+
+
+@pytest.mark.parametrize("compress", [0, 3])
+def test_joblib_files_are_loaded_without_reading_them_into_memory(
+    compress, tmp_path, monkeypatch
+):
+    df = pd.DataFrame({"age": [20.0, 40.0], "gender": ["Male", "Female"]})
+    path = tmp_path / "model.joblib"
+    joblib.dump(df, path, compress=compress)
+    serializer = serializers.SERIALIZERS["joblib"]
+    monkeypatch.setattr(serializer, "loads", None)
+
+    pd.testing.assert_frame_equal(serializer.load_file(str(path)), df)
+    with open(path, "rb") as file:
+        loaded = serializer.load_file(file, columns=["gender"])
+    assert loaded["gender"].tolist() == ["Male", "Female"]
+    assert list(loaded.columns) == ["gender"]
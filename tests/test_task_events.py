@@ -0,0 +1,118 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+from celery import states
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.celery_client import CeleryClient
+from app.core.task_events import TaskEventListener
+
+
+class FakeReceiver:
+    """Receives no events, like an idle event stream"""
+
+    def __init__(self, connection, handlers) -> None:
+        self.should_stop = False
+
+    def capture(self, limit, timeout, wakeup):
+        assert timeout, "capture must return to check the stop flag"
+        time.sleep(timeout)
+        raise socket.timeout()
+
+
+class FakeApp:
+    class events:
+        Receiver = FakeReceiver
+
+    @contextmanager
+    def connection_for_read(self):
+        yield object()
+
+
+@pytest.fixture
+def listener(monkeypatch):
+    monkeypatch.setattr(TaskEventListener, "_instance", None)
+    monkeypatch.setenv("TASK_EVENTS_ENABLED", "true")
+    listener = TaskEventListener()
+    listener.capture_timeout = 0.05
+    return listener
+
+
+def test_stop_interrupts_idle_stream(listener, monkeypatch):
+    monkeypatch.setattr(CeleryClient(), "get_app", FakeApp)
+    listener.start()
+    thread = listener._thread
+    assert listener._connected.wait(1)
+
+    listener.stop()
+    assert not thread.is_alive()
+    assert not listener.alive
+
+
+def test_event_notifies_waiters_and_subscribers(listener, monkeypatch):
+    states_by_id = {"task-id": (states.PENDING, None)}
+    monkeypatch.setattr(CeleryClient(), "get_state", states_by_id.__getitem__)
+    finished = []
+    listener.subscribe(lambda task_id, status: finished.append((task_id, status)))
+    listener._connected.set()
+
+    async def wait():
+        waiter = asyncio.create_task(listener.wait("task-id", timeout=5))
+        while not listener.stats()["waiting"]:
+            await asyncio.sleep(0.01)
+        states_by_id["task-id"] = (states.SUCCESS, 42)
+        event = threading.Thread(
+            target=listener._on_event,
+            args=({"uuid": "task-id", "type": "task-succeeded"},),
+        )
+        event.start()
+        result = await waiter
+        # The waiter may be resolved before the event thread updated its stats
+        await asyncio.to_thread(event.join)
+        return result
+
+    assert asyncio.run(wait()) == (states.SUCCESS, 42)
+    assert finished == [("task-id", states.SUCCESS)]
+    assert listener.stats()["notified"] == 1
+
+
+@pytest.fixture
+def ws(monkeypatch) -> TestClient:
+    from app.routers.api import router
+
+    monkeypatch.setattr(TaskEventListener, "_instance", None)
+    monkeypatch.setattr(CeleryClient(), "get_state", lambda _: (states.SUCCESS, 1))
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_websocket_token_in_subprotocol(ws):
+    token = os.environ["API_BEARER_TOKEN"]
+    with ws.websocket_connect(
+        "/api/tasks/task-id/ws", subprotocols=["bearer", token]
+    ) as websocket:
+        assert websocket.accepted_subprotocol == "bearer"
+        assert websocket.receive_json()["status"] == states.SUCCESS
+
+
+def test_websocket_token_not_taken_from_url(ws):
+    token = os.environ["API_BEARER_TOKEN"]
+    with pytest.raises(WebSocketDisconnect):
+        with ws.websocket_connect(f"/api/tasks/task-id/ws?token={token}"):
+            pass
+
+
+def test_received_tasks_are_reported(listener):
+    received = []
+    listener.subscribe_received(lambda task_id, name: received.append((task_id, name)))
+
+    listener._on_received({"uuid": "task-id", "name": "workflows.model_training"})
+    assert received == [("task-id", "workflows.model_training")]
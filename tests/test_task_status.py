@@ -0,0 +1,76 @@
+import pytest
+from celery import Celery, states
+from celery.backends.database import DatabaseBackend
+
+from app.core.cache import TTLCache
+from app.core.celery_client import CeleryClient
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    """Result database shared by a fresh status cache of the CeleryClient"""
+    app = Celery("test", backend=f"db+sqlite:///{tmp_path}/results.db")
+    celery_client = CeleryClient()
+    monkeypatch.setattr(celery_client, "_app", app)
+    monkeypatch.setattr(celery_client, "_status_cache", TTLCache())
+    sessions = []
+    session_factory = DatabaseBackend.ResultSession
+
+    def counted_session(self, *args, **kwargs):
+        sessions.append(1)
+        return session_factory(self, *args, **kwargs)
+
+    # Backends are per thread, sync endpoints read through another instance
+    monkeypatch.setattr(DatabaseBackend, "ResultSession", counted_session)
+    app.backend.sessions = sessions
+    return app.backend
+
+
+def test_states_read_in_one_query(backend):
+    backend.store_result("done", [1, 0], states.SUCCESS)
+    backend.store_result("failed", ValueError("bad row"), states.FAILURE)
+    backend.sessions.clear()
+
+    found = CeleryClient().get_states(["done", "failed", "unknown", "done"])
+    assert len(backend.sessions) == 1
+    assert found["done"] == (states.SUCCESS, [1, 0])
+    assert found["failed"][0] == states.FAILURE
+    assert found["unknown"] == (states.PENDING, None)
+
+
+def test_finished_states_are_cached(backend):
+    backend.store_result("done", 1, states.SUCCESS)
+    backend.sessions.clear()
+
+    celery_client = CeleryClient()
+    celery_client.get_states(["done", "waiting"])
+    assert celery_client.get_states(["done"]) == {"done": (states.SUCCESS, 1)}
+    assert celery_client.get_state("done") == (states.SUCCESS, 1)
+    assert len(backend.sessions) == 1
+
+
+def test_unfinished_states_expire(backend, monkeypatch):
+    celery_client = CeleryClient()
+    monkeypatch.setattr(celery_client, "_pending_ttl", 0)
+    assert celery_client.get_states(["waiting"]) == {"waiting": (states.PENDING, None)}
+
+    backend.store_result("waiting", 7, states.SUCCESS)
+    assert celery_client.get_states(["waiting"]) == {"waiting": (states.SUCCESS, 7)}
+
+
+def test_bulk_check_selects_batch_rows(backend, api, monkeypatch):
+    backend.store_result("batch", ["<=50K", ">50K"], states.SUCCESS)
+
+    def per_task(*args, **kwargs):
+        raise AssertionError("tasks are read one by one")
+
+    monkeypatch.setattr(DatabaseBackend, "get_task_meta", per_task)
+
+    response = api.post(
+        "/api/tasks/check", json={"ids": ["batch:1", "batch:0", "other"]}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["batch:1"]["result"] == ">50K"
+    assert body["batch:0"]["result"] == "<=50K"
+    assert body["other"]["status"] == states.PENDING
@@ -0,0 +1,83 @@
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import StatusCode
+
+from app.core import telemetry
+
+
+def test_disabled_without_sdk():
+    assert not telemetry.enabled()
+    with telemetry.measure(telemetry.SERIALIZATION_DURATION, "parse") as span:
+        assert span is None
+    chunks = telemetry.measure_iter(
+        telemetry.SERIALIZATION_DURATION, "parse", iter([1, 2, 3])
+    )
+    assert list(chunks) == [1, 2, 3]
+
+
+@pytest.fixture
+def sdk(monkeypatch):
+    """Module instruments backed by an SDK, without installing it globally"""
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter("test")
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    monkeypatch.setattr(telemetry, "_enabled", True)
+    monkeypatch.setattr(telemetry, "tracer", tracer_provider.get_tracer("test"))
+    monkeypatch.setattr(telemetry, "ERRORS", meter.create_counter("errors"))
+    histogram = meter.create_histogram("duration")
+    return histogram, reader, exporter
+
+
+def _points(reader: InMemoryMetricReader, name: str):
+    data = reader.get_metrics_data()
+    return [
+        point
+        for resource in data.resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+        if metric.name == name
+        for point in metric.data.data_points
+    ]
+
+
+def test_measure_iter_records_one_sample_per_item(sdk):
+    histogram, reader, exporter = sdk
+
+    chunks = telemetry.measure_iter(histogram, "parse", iter([1, 2, 3]), format="csv")
+    assert list(chunks) == [1, 2, 3]
+
+    (point,) = _points(reader, "duration")
+    assert point.count == 3
+    assert point.attributes == {"format": "csv"}
+    spans = exporter.get_finished_spans()
+    assert [span.name for span in spans] == ["parse"] * 3
+    assert all(span.status.is_ok for span in spans)
+    assert not _points(reader, "errors")
+
+
+def test_measure_iter_records_failed_item(sdk):
+    histogram, reader, exporter = sdk
+
+    def items():
+        yield 1
+        raise ValueError("broken")
+
+    chunks = telemetry.measure_iter(histogram, "parse", items())
+    assert next(chunks) == 1
+    with pytest.raises(ValueError):
+        next(chunks)
+
+    assert _points(reader, "duration")[0].count == 2
+    failed = exporter.get_finished_spans()[-1]
+    assert failed.status.status_code == StatusCode.ERROR
+    assert failed.events[0].name == "exception"
+    (error,) = _points(reader, "errors")
+    assert error.value == 1
+    assert error.attributes == {"operation": "parse", "error.type": "ValueError"}
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from celery import Celery, states
+
+from app.core.admission import TRAINING, AdmissionController
+from app.core.celery_client import CeleryClient
+from app.core.training_registry import TrainingRegistry, TrainingRun
+
+
+@pytest.fixture
+def registry(monkeypatch) -> TrainingRegistry:
+    """The registry kept per process, with orchestrators answering right away"""
+    registry = TrainingRegistry()
+    monkeypatch.setattr(registry, "_backend", None)
+    monkeypatch.setattr(registry, "_runs", {})
+
+    async def wait_for(workflow, timeout=None):
+        return {"result_task_id": workflow.id.replace("workflow", "training")}
+
+    celery_client = CeleryClient()
+    monkeypatch.setattr(celery_client, "wait_for", wait_for)
+    monkeypatch.setattr(
+        celery_client,
+        "admission",
+        AdmissionController(celery_client.get_app(), {TRAINING: "training"}),
+    )
+    return registry
+
+
+def test_concurrent_requests_start_one_run(registry, monkeypatch):
+    async def reusable(key, run):
+        return True
+
+    monkeypatch.setattr(registry, "_reusable", reusable)
+    started = []
+
+    async def start():
+        await asyncio.sleep(0.01)
+        started.append(f"workflow-{len(started)}")
+        return started[-1]
+
+    async def requests():
+        key = registry.key(True, False, "md5")
+        return await asyncio.gather(
+            *(registry.get_or_start(key, start) for _ in range(3))
+        )
+
+    runs = asyncio.run(requests())
+    assert started == ["workflow-0"]
+    assert {run.workflow_id for run, _ in runs} == {"workflow-0"}
+    assert [reused for _, reused in runs] == [False, True, True]
+    # Nobody waits for the key anymore
+    assert registry.stats()["locked_keys"] == 0
+
+
+def test_admission_follows_the_training_task(registry):
+    admission = CeleryClient().admission
+
+    async def start():
+        admission.dispatched(TRAINING, admission.admit(TRAINING), "workflow-0")
+        return "workflow-0"
+
+    async def request():
+        key = registry.key(False, False, "md5")
+        run, _ = await registry.get_or_start(key, start)
+        return await registry.resolve(key, run)
+
+    assert asyncio.run(request()) == "training-0"
+    assert list(admission.lanes[TRAINING].inflight) == ["training-0"]
+    assert registry.stats()["following"] == 0
+
+
+@pytest.mark.parametrize(
+    "workflow, training, age, reusable",
+    [
+        (states.PENDING, None, 10, True),
+        # The workflow never ran, or its result expired
+        (states.PENDING, None, 3600, False),
+        (states.SUCCESS, states.PENDING, 3600, False),
+        (states.SUCCESS, states.STARTED, 3600, True),
+        (states.SUCCESS, states.STARTED, 2 * 86400, False),
+        (states.SUCCESS, states.FAILURE, 10, False),
+    ],
+)
+def test_unknown_runs_are_reused_briefly(
+    registry, monkeypatch, workflow, training, age, reusable
+):
+    celery_client = CeleryClient()
+    monkeypatch.setattr(registry, "pending_ttl", 600)
+    monkeypatch.setattr(registry, "max_runtime", 86400)
+
+    async def get_state(task_id):
+        assert task_id == "workflow"
+        return workflow, {"result_task_id": "training"}
+
+    async def get_status(task_id):
+        assert task_id == "training"
+        return training
+
+    monkeypatch.setattr(celery_client, "get_state_async", get_state)
+    monkeypatch.setattr(celery_client, "get_status_async", get_status)
+
+    run = TrainingRun("workflow", None, time.time() - age)
+    assert asyncio.run(registry._reusable("key", run)) is reusable
+
+
+def test_runs_stored_in_result_database(monkeypatch, tmp_path):
+    registry = TrainingRegistry()
+    backend = Celery("test", backend=f"db+sqlite:///{tmp_path}/results.db").backend
+    monkeypatch.setattr(registry, "_backend", backend)
+    monkeypatch.setattr(registry, "_table_ready", False)
+    key = registry.key(False, True, "md5+manifest")
+
+    session = registry._claim(key)
+    assert registry._load(session, key) is None
+    registry._save(session, key, TrainingRun("workflow", None, 1.0))
+    registry._release(session, commit=True)
+    registry._update(key, TrainingRun("workflow", "training", 1.0))
+
+    session = registry._claim(key)
+    assert registry._load(session, key) == TrainingRun("workflow", "training", 1.0)
+    registry._release(session, commit=False)
+
+
+@pytest.mark.parametrize("reply", [None, {"error": "failed"}, "result-id"])
+def test_unexpected_workflow_replies_are_not_reused(registry, monkeypatch, reply):
+    async def get_state(task_id):
+        return states.SUCCESS, reply
+
+    monkeypatch.setattr(CeleryClient(), "get_state_async", get_state)
+
+    run = TrainingRun("workflow", None, time.time())
+    assert asyncio.run(registry._reusable("key", run)) is False
+    assert run.task_id is None
+
+
+def test_claim_of_cancelled_request_is_released(registry, monkeypatch):
+    claimed, released = threading.Event(), []
+    session = object()
+
+    def claim(key):
+        claimed.wait(timeout=5)
+        return session
+
+    monkeypatch.setattr(registry, "_claim", claim)
+    monkeypatch.setattr(
+        registry, "_release", lambda session, commit: released.append(commit)
+    )
+
+    async def request():
+        async def start():
+            return "workflow-0"
+
+        task = asyncio.create_task(registry.get_or_start("key", start))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The database answers only after the request was cancelled
+        claimed.set()
+        for _ in range(100):
+            if released:
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(request())
+    assert released == [False]
+    assert registry.stats()["locked_keys"] == 0
@@ -0,0 +1,81 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.core.data_factory import DataFactory
+from app.core.validation import ColumnarValidator, DatasetValidationError
+from app.schemas import UserInputRequest
+
+
+ROW = {
+    "age": 30,
+    "workclass": "Private",
+    "fnlwgt": 200000,
+    "education": "Bachelors",
+    "educational-num": 13,
+    "marital-status": "Never-married",
+    "occupation": "Sales",
+    "relationship": "Not-in-family",
+    "race": "White",
+    "gender": "Female",
+    "capital-gain": 0,
+    "capital-loss": 0,
+    "hours-per-week": 40,
+    "native-country": "Germany",
+}
+
+
+def test_validate_counts_violations_per_column():
+    df = pd.DataFrame([ROW, {**ROW, "age": 95, "gender": "?"}, {**ROW, "race": None}])
+    report = ColumnarValidator.from_model(UserInputRequest).validate(df)
+
+    assert report.violations == {"age": 1, "gender": 1, "race": 1}
+    assert report.row_indices == [1, 2]
+    assert not report.valid
+
+
+def test_iter_validated_stops_at_invalid_chunk():
+    chunks = [
+        pa.Table.from_pylist([ROW, ROW]),
+        pa.Table.from_pylist([ROW, {**ROW, "hours-per-week": 40.5}]),
+    ]
+    validated = ColumnarValidator.from_model(UserInputRequest).iter_validated(chunks)
+
+    assert len(next(validated)) == 2
+    with pytest.raises(DatasetValidationError) as e:
+        next(validated)
+    assert e.value.report.row_indices == [3]
+
+
+def csv(*rows):
+    return pd.DataFrame(rows).to_csv(index=False).encode()
+
+
+def test_text_in_numeric_csv_column_is_a_violation():
+    data = csv(ROW, {**ROW, "age": "thirty"}, {**ROW, "hours-per-week": "40h"})
+    validator = ColumnarValidator.from_model(UserInputRequest)
+
+    df = DataFactory.from_bytes("data.csv", data, schema=validator.schema)
+    report = validator.validate(df)
+    assert report.violations == {"age": 1, "hours-per-week": 1}
+    assert report.row_indices == [1, 2]
+
+    chunks = DataFactory.iter_chunks(
+        "data.csv", io.BytesIO(data), schema=validator.schema, as_arrow=True
+    )
+    with pytest.raises(DatasetValidationError) as e:
+        list(validator.iter_validated(chunks))
+    assert e.value.report.violations == {"age": 1, "hours-per-week": 1}
+
+
+def test_upload_reports_unparsable_values(dvc_client, api):
+    data = csv(ROW, {**ROW, "age": "thirty"})
+
+    response = api.post(
+        "/api/data-management/upload/file", files={"file": ("data.csv", data)}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"]["violations"] == {"age": 1}
+    assert response.json()["detail"]["row_indices"] == [1]